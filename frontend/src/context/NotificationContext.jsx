@@ -1,5 +1,6 @@
 import React, { createContext, useContext, useReducer, useEffect } from 'react';
 import toast from 'react-hot-toast';
+import { connectNotificationHub } from '../lib/notificationHub';
 
 // Notification Context
 const NotificationContext = createContext();
@@ -33,6 +34,10 @@ function notificationReducer(state, action) {
       };
 
     case NOTIFICATION_ACTIONS.ADD_NOTIFICATION:
+      // Reconnect snapshots replay a few notifications the client may already have
+      if (state.notifications.some(notif => notif.id === action.payload.id)) {
+        return state;
+      }
       return {
         ...state,
         notifications: [action.payload, ...state.notifications],
@@ -94,105 +99,79 @@ export function NotificationProvider({ children }) {
   const [state, dispatch] = useReducer(notificationReducer, initialState);
   const [token, setToken] = React.useState(localStorage.getItem('token'));
 
-  // Initialize WebSocket connection
+  // Connect to the notification hub; tabs share one socket via a SharedWorker
   useEffect(() => {
     if (!token) return;
 
-    let ws = null;
-    let reconnectInterval = null;
-
-    const connectWebSocket = () => {
-      try {
-        // Use WebSocket with token authentication
-        ws = new WebSocket(`ws://127.0.0.1:8000/ws/notifications/?token=${token}`);
-        
-        ws.onopen = () => {
-          console.log('WebSocket connected');
-          dispatch({
-            type: NOTIFICATION_ACTIONS.SET_CONNECTED,
-            payload: { connected: true, socket: ws }
-          });
-          
-          // Clear any reconnect interval
-          if (reconnectInterval) {
-            clearInterval(reconnectInterval);
-            reconnectInterval = null;
-          }
-        };
-
-        ws.onmessage = (event) => {
-          const data = JSON.parse(event.data);
-          
-          switch (data.type) {
-            case 'notification':
-              dispatch({
+    const hub = connectNotificationHub({
+      token,
+      onStatus: (connected) => {
+        dispatch({
+          type: NOTIFICATION_ACTIONS.SET_CONNECTED,
+          payload: { connected, socket: connected ? hub : null }
+        });
+      },
+      onMessage: (data) => {
+        switch (data.type) {
+          case 'connection_snapshot':
+            if (data.since) {
+              // Reconnected: only what was missed, oldest first
+              data.notifications.forEach(notification => dispatch({
                 type: NOTIFICATION_ACTIONS.ADD_NOTIFICATION,
-                payload: data.notification
-              });
-              
-              // Show toast notification
-              toast.success(data.notification.title, {
-                duration: 5000,
-                position: 'top-right',
-              });
-              break;
-
-            case 'unread_count':
+                payload: notification
+              }));
+            } else {
               dispatch({
-                type: NOTIFICATION_ACTIONS.SET_UNREAD_COUNT,
-                payload: data.count
+                type: NOTIFICATION_ACTIONS.SET_NOTIFICATIONS,
+                payload: data.notifications
               });
-              break;
+            }
+            dispatch({
+              type: NOTIFICATION_ACTIONS.SET_UNREAD_COUNT,
+              payload: data.unread_count
+            });
+            break;
+
+          case 'new_notification':
+          case 'system_announcement': {
+            const notification = data.notification || data.announcement;
+            dispatch({
+              type: NOTIFICATION_ACTIONS.ADD_NOTIFICATION,
+              payload: notification
+            });
+            
+            // Show toast notification
+            toast.success(notification.title, {
+              duration: 5000,
+              position: 'top-right',
+            });
+            break;
+          }
 
-            case 'notification_read':
+          case 'unread_count':
+            dispatch({
+              type: NOTIFICATION_ACTIONS.SET_UNREAD_COUNT,
+              payload: data.count
+            });
+            break;
+
+          case 'mark_as_read_response':
+            if (data.success) {
               dispatch({
                 type: NOTIFICATION_ACTIONS.MARK_AS_READ,
                 payload: { id: data.notification_id }
               });
-              break;
+            }
+            break;
 
-            default:
-              console.log('Unknown message type:', data.type);
-          }
-        };
-
-        ws.onclose = () => {
-          console.log('WebSocket disconnected');
-          dispatch({
-            type: NOTIFICATION_ACTIONS.SET_CONNECTED,
-            payload: { connected: false, socket: null }
-          });
-          
-          // Attempt to reconnect after 3 seconds
-          if (!reconnectInterval) {
-            reconnectInterval = setInterval(() => {
-              console.log('Attempting to reconnect...');
-              connectWebSocket();
-            }, 3000);
-          }
-        };
-
-        ws.onerror = (error) => {
-          console.error('WebSocket error:', error);
-        };
-
-      } catch (error) {
-        console.error('Failed to connect WebSocket:', error);
-      }
-    };
-
-    // Initial connection
-    connectWebSocket();
+          default:
+            break;
+        }
+      },
+    });
 
     // Cleanup on unmount or token change
-    return () => {
-      if (ws) {
-        ws.close();
-      }
-      if (reconnectInterval) {
-        clearInterval(reconnectInterval);
-      }
-    };
+    return () => hub.close();
   }, [token]);
 
   // Listen for token changes
@@ -0,0 +1,37 @@
+// Client for the notification hub. Tabs share one socket through a
+// SharedWorker where the browser supports it, otherwise each tab opens its own.
+import { createHubSocket } from './notificationHubSocket';
+
+export const DEFAULT_TOPICS = ['notifications', 'announcements'];
+
+export function connectNotificationHub({ token, topics = DEFAULT_TOPICS, onMessage, onStatus }) {
+  if (typeof SharedWorker === 'undefined') {
+    return createHubSocket({ token, topics, onMessage, onStatus });
+  }
+
+  const worker = new SharedWorker(new URL('./notificationHub.worker.js', import.meta.url), {
+    type: 'module',
+    name: 'notification-hub',
+  });
+  const { port } = worker;
+  port.onmessage = ({ data }) => {
+    if (data.type === 'status') onStatus(data.connected);
+    else onMessage(data);
+  };
+  port.start();
+  port.postMessage({ type: 'connect', token, topics });
+
+  const disconnect = () => port.postMessage({ type: 'disconnect' });
+  window.addEventListener('pagehide', disconnect);
+
+  return {
+    send(message) {
+      port.postMessage({ type: 'send', message });
+    },
+    close() {
+      window.removeEventListener('pagehide', disconnect);
+      disconnect();
+      port.close();
+    },
+  };
+}
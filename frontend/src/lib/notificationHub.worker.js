@@ -0,0 +1,65 @@
+// Shared worker: every tab of the origin talks to the notification hub through
+// one WebSocket held here, instead of one socket per tab.
+//
+// Tabs post {type: 'connect', token, topics}, {type: 'send', message} and
+// {type: 'disconnect'}; the worker posts back {type: 'status', connected} and
+// every frame from the hub.
+import { createHubSocket } from './notificationHubSocket';
+
+const ports = new Set();
+let socket = null;
+let socketToken = null;
+let connected = false;
+const topics = new Set();
+
+const broadcast = (message) => ports.forEach((port) => port.postMessage(message));
+
+function connect(port, token, requested) {
+  if (socket && socketToken !== token) {
+    socket.close();
+    socket = null;
+    topics.clear();
+  }
+  const added = requested.filter((topic) => !topics.has(topic));
+  added.forEach((topic) => topics.add(topic));
+
+  if (!socket) {
+    socketToken = token;
+    socket = createHubSocket({
+      token,
+      topics: [...topics],
+      onMessage: broadcast,
+      onStatus: (status) => {
+        connected = status;
+        broadcast({ type: 'status', connected });
+      },
+    });
+    return;
+  }
+
+  port.postMessage({ type: 'status', connected });
+  if (added.length) socket.send({ type: 'subscribe', topics: added });
+  // The new tab needs the current unread count and latest notifications
+  socket.send({ type: 'sync' });
+}
+
+self.onconnect = (event) => {
+  const port = event.ports[0];
+  ports.add(port);
+
+  port.onmessage = ({ data }) => {
+    if (data.type === 'connect') {
+      connect(port, data.token, data.topics);
+    } else if (data.type === 'send' && socket) {
+      socket.send(data.message);
+    } else if (data.type === 'disconnect') {
+      ports.delete(port);
+      if (!ports.size && socket) {
+        socket.close();
+        socket = null;
+        topics.clear();
+      }
+    }
+  };
+  port.start();
+};
@@ -0,0 +1,69 @@
+// One reconnecting connection to the notification hub (ws/hub/).
+// Used directly by a tab when SharedWorker is unavailable, and by the shared
+// worker to serve every tab of the origin from a single socket.
+
+export const HUB_URL = 'ws://127.0.0.1:8000/ws/hub/';
+// Pings keep the server's presence entry fresh (REALTIME_PRESENCE_TTL is 90s)
+const HEARTBEAT_MS = 30000;
+
+export function createHubSocket({ token, topics, onMessage, onStatus }) {
+  let ws = null;
+  let closed = false;
+  let retry = null;
+  let heartbeat = null;
+  let delay = 1000;
+  // "<created_at>|<id>" of the newest notification seen, so a reconnect only
+  // replays what was missed (plus a short overlap the context dedupes by id)
+  let cursor = null;
+  const queue = [];
+
+  const open = () => {
+    // ack=1 opts in to acknowledged delivery of real-time notifications
+    const params = new URLSearchParams({ token, topics: topics.join(','), ack: '1' });
+    if (cursor) params.set('since', cursor);
+    ws = new WebSocket(`${HUB_URL}?${params}`);
+
+    ws.onopen = () => {
+      delay = 1000;
+      onStatus(true);
+      while (queue.length) ws.send(queue.shift());
+      heartbeat = setInterval(() => ws.send(JSON.stringify({ type: 'ping' })), HEARTBEAT_MS);
+    };
+
+    ws.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.type === 'connection_snapshot') {
+        cursor = data.cursor;
+      } else if (data.type === 'new_notification' && data.notification.created_at) {
+        cursor = `${data.notification.created_at}|${data.notification.id}`;
+      }
+      // Delivery receipt; the server redelivers what is never acked
+      if (data.ack) ws.send(JSON.stringify({ type: 'ack', ids: [data.notification.id] }));
+      onMessage(data);
+    };
+
+    ws.onclose = () => {
+      clearInterval(heartbeat);
+      onStatus(false);
+      if (!closed) {
+        retry = setTimeout(open, delay);
+        delay = Math.min(delay * 2, 30000);
+      }
+    };
+  };
+
+  open();
+
+  return {
+    send(message) {
+      const text = JSON.stringify(message);
+      if (ws && ws.readyState === WebSocket.OPEN) ws.send(text);
+      else queue.push(text);
+    },
+    close() {
+      closed = true;
+      clearTimeout(retry);
+      if (ws) ws.close();
+    },
+  };
+}
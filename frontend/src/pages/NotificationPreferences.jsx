@@ -50,10 +50,10 @@ const NotificationPreferences = () => {
     }
   };
 
-  const updatePreference = (id, field, value) => {
+  const updatePreference = (typeId, field, value) => {
     setPreferences(prev => 
       prev.map(pref => 
-        pref.id === id ? { ...pref, [field]: value } : pref
+        pref.notification_type.id === typeId ? { ...pref, [field]: value } : pref
       )
     );
   };
@@ -71,6 +71,7 @@ const NotificationPreferences = () => {
         body: JSON.stringify({
           preferences: preferences.map(pref => ({
             id: pref.id,
+            notification_type_id: pref.notification_type.id,
             email_enabled: pref.email_enabled,
             push_enabled: pref.push_enabled,
             in_app_enabled: pref.in_app_enabled,
@@ -226,7 +227,7 @@ const NotificationPreferences = () => {
 
               <div className="space-y-4">
                 {categoryPrefs.map((pref) => (
-                  <div key={pref.id} className="bg-white rounded-xl p-6 border border-gray-200">
+                  <div key={pref.notification_type.id} className="bg-white rounded-xl p-6 border border-gray-200">
                     <div className="flex items-start justify-between">
                       <div className="flex-1">
                         <h3 className="text-lg font-medium text-gray-900 mb-2">
@@ -242,7 +243,7 @@ const NotificationPreferences = () => {
                             <input
                               type="checkbox"
                               checked={pref.email_enabled}
-                              onChange={(e) => updatePreference(pref.id, 'email_enabled', e.target.checked)}
+                              onChange={(e) => updatePreference(pref.notification_type.id, 'email_enabled', e.target.checked)}
                               className="w-4 h-4 text-purple-600 border-gray-300 rounded focus:ring-purple-500"
                             />
                             <div className="flex items-center space-x-2">
@@ -255,7 +256,7 @@ const NotificationPreferences = () => {
                             <input
                               type="checkbox"
                               checked={pref.push_enabled}
-                              onChange={(e) => updatePreference(pref.id, 'push_enabled', e.target.checked)}
+                              onChange={(e) => updatePreference(pref.notification_type.id, 'push_enabled', e.target.checked)}
                               className="w-4 h-4 text-purple-600 border-gray-300 rounded focus:ring-purple-500"
                             />
                             <div className="flex items-center space-x-2">
@@ -268,7 +269,7 @@ const NotificationPreferences = () => {
                             <input
                               type="checkbox"
                               checked={pref.in_app_enabled}
-                              onChange={(e) => updatePreference(pref.id, 'in_app_enabled', e.target.checked)}
+                              onChange={(e) => updatePreference(pref.notification_type.id, 'in_app_enabled', e.target.checked)}
                               className="w-4 h-4 text-purple-600 border-gray-300 rounded focus:ring-purple-500"
                             />
                             <div className="flex items-center space-x-2">
@@ -285,7 +286,7 @@ const NotificationPreferences = () => {
                           </label>
                           <select
                             value={pref.frequency}
-                            onChange={(e) => updatePreference(pref.id, 'frequency', e.target.value)}
+                            onChange={(e) => updatePreference(pref.notification_type.id, 'frequency', e.target.value)}
                             className="flex-1 max-w-xs px-3 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-purple-500 focus:border-purple-500 text-sm"
                           >
                             {frequencyOptions.map((option) => (
@@ -0,0 +1,4 @@
+"""
+Load-test suite: local Paystack/ZeptoMail stubs, fixture preparation and
+throughput scenarios run against a live server. See loadtests/README.md.
+"""
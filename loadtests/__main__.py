@@ -0,0 +1,181 @@
+"""
+Command-line entry point::
+
+    python -m loadtests stubs --port 8765
+    python -m loadtests prepare --users 10000 --uploaders 200 --out loadtest-fixture.json
+    python -m loadtests run uploads webhooks admin websockets --base-url http://127.0.0.1:8000
+    python -m loadtests compare baseline.json results.json
+    python -m loadtests bench templates --iterations 10000
+    python -m loadtests soak --hosts redis://127.0.0.1:6379,redis://127.0.0.1:6380 --duration 60
+    python -m loadtests cleanup
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from . import benchmarks, fixtures, scenarios, soak
+from .stats import compare_summaries, format_summaries, read_results, write_results
+from .stubs import start_stubs
+
+
+def _cmd_stubs(args):
+    server = start_stubs(args.host, args.port, latency=args.latency / 1000, error_rate=args.error_rate)
+    print(f'Stub server listening on {server.base_url}')
+    print(f'  PAYSTACK_BASE_URL={server.base_url}/paystack')
+    print(f'  ZEPTOMAIL_API_URL={server.base_url}/zeptomail/v1.1/email')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def _cmd_prepare(args):
+    fixture = fixtures.prepare(
+        users=args.users, uploaders=args.uploaders, credits=args.credits,
+        webhook_transactions=args.webhooks,
+    )
+    with open(args.out, 'w') as handle:
+        json.dump(fixture, handle)
+    print(f'Wrote {args.out}')
+
+
+def _cmd_cleanup(args):
+    fixtures.cleanup()
+
+
+def _scenario_kwargs(name, args):
+    if name == 'uploads':
+        return {'requests': args.requests or 200, 'concurrency': args.concurrency or 20}
+    if name == 'webhooks':
+        secret = args.webhook_secret or os.environ.get('PAYSTACK_WEBHOOK_SECRET')
+        if not secret:
+            raise SystemExit('webhooks needs --webhook-secret or PAYSTACK_WEBHOOK_SECRET (the server\'s value)')
+        return {'webhook_secret': secret, 'requests': args.requests or 2000, 'concurrency': args.concurrency or 50}
+    if name == 'admin':
+        return {'requests': args.requests or 500, 'concurrency': args.concurrency or 10}
+    return {'connections': args.connections, 'broadcasts': args.broadcasts}
+
+
+def _cmd_run(args):
+    with open(args.fixture) as handle:
+        fixture = json.load(handle)
+    base_url = args.base_url.rstrip('/')
+
+    summaries = []
+    for name in args.scenarios:
+        print(f'Running {name}...', flush=True)
+        recorders = asyncio.run(scenarios.SCENARIOS[name](base_url, fixture, **_scenario_kwargs(name, args)))
+        summaries.extend(recorder.summary() for recorder in recorders)
+
+    print(format_summaries(summaries))
+    if args.output:
+        write_results(summaries, args.output)
+        print(f'Wrote {args.output}')
+
+
+def _cmd_bench(args):
+    fixtures.setup_django()
+    summaries = []
+    for name in args.benchmarks:
+        print(f'Running {name}...', flush=True)
+        summaries.extend(recorder.summary() for recorder in benchmarks.BENCHMARKS[name](args.iterations))
+
+    print(format_summaries(summaries))
+    if args.output:
+        write_results(summaries, args.output)
+        print(f'Wrote {args.output}')
+
+
+def _cmd_soak(args):
+    hosts = [host.strip() for host in args.hosts.split(',') if host.strip()]
+    recorders = soak.channel_layer_soak(
+        hosts, mode=args.mode, workers=args.workers or len(hosts), groups=args.groups,
+        concurrency=args.concurrency, duration=args.duration,
+    )
+    summaries = [recorder.summary() for recorder in recorders]
+
+    print(format_summaries(summaries))
+    if args.output:
+        write_results(summaries, args.output)
+        print(f'Wrote {args.output}')
+
+
+def _cmd_compare(args):
+    rows = compare_summaries(read_results(args.baseline), read_results(args.current))
+    print(f"{'scenario':<22}{'throughput':>14}{'p50':>10}{'p95':>10}{'p99':>10}   (% change)")
+    for row in rows:
+        cells = [row['throughput_rps'], row['p50_ms'], row['p95_ms'], row['p99_ms']]
+        print(f"{row['scenario']:<22}" + ''.join(
+            f'{"n/a" if cell is None else f"{cell:+.1f}":>{width}}'
+            for cell, width in zip(cells, (14, 10, 10, 10))
+        ))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m loadtests')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stubs = commands.add_parser('stubs', help='Serve the Paystack/ZeptoMail stubs')
+    stubs.add_argument('--host', default='127.0.0.1')
+    stubs.add_argument('--port', type=int, default=8765)
+    stubs.add_argument('--latency', type=float, default=0, help='Added latency per request in ms')
+    stubs.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with 500')
+    stubs.set_defaults(func=_cmd_stubs)
+
+    prepare = commands.add_parser('prepare', help='Create load-test users and rows')
+    prepare.add_argument('--users', type=int, default=1000)
+    prepare.add_argument('--uploaders', type=int, default=100)
+    prepare.add_argument('--credits', type=int, default=1000)
+    prepare.add_argument('--webhooks', type=int, default=2000)
+    prepare.add_argument('--out', default='loadtest-fixture.json')
+    prepare.set_defaults(func=_cmd_prepare)
+
+    cleanup = commands.add_parser('cleanup', help='Delete everything prepare created')
+    cleanup.set_defaults(func=_cmd_cleanup)
+
+    run = commands.add_parser('run', help='Run scenarios against a live server')
+    run.add_argument('scenarios', nargs='+', choices=sorted(scenarios.SCENARIOS))
+    run.add_argument('--base-url', default='http://127.0.0.1:8000')
+    run.add_argument('--fixture', default='loadtest-fixture.json')
+    run.add_argument('--requests', type=int, help='Total requests per HTTP scenario')
+    run.add_argument('--concurrency', type=int, help='Concurrent workers per HTTP scenario')
+    run.add_argument('--connections', type=int, default=10000)
+    run.add_argument('--broadcasts', type=int, default=3)
+    run.add_argument('--webhook-secret')
+    run.add_argument('--output', help='Write the summaries as JSON for later comparison')
+    run.set_defaults(func=_cmd_run)
+
+    bench = commands.add_parser('bench', help='Run in-process microbenchmarks')
+    bench.add_argument('benchmarks', nargs='+', choices=sorted(benchmarks.BENCHMARKS))
+    bench.add_argument('--iterations', type=int, default=10000)
+    bench.add_argument('--output', help='Write the summaries as JSON for later comparison')
+    bench.set_defaults(func=_cmd_bench)
+
+    soaker = commands.add_parser('soak', help='Channel-layer throughput per number of Redis shards')
+    soaker.add_argument('--hosts', required=True, help='Comma-separated Redis URLs, one per shard')
+    soaker.add_argument('--mode', choices=['core', 'pubsub'], default='core')
+    soaker.add_argument('--workers', type=int, help='Processes per run (default: one per host)')
+    soaker.add_argument('--groups', type=int, default=1000, help='Groups per process')
+    soaker.add_argument('--concurrency', type=int, default=100, help='Send loops per process')
+    soaker.add_argument('--duration', type=float, default=60, help='Seconds per shard count')
+    soaker.add_argument('--output', help='Write the summaries as JSON for later comparison')
+    soaker.set_defaults(func=_cmd_soak)
+
+    compare = commands.add_parser('compare', help='Percent change between two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.set_defaults(func=_cmd_compare)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
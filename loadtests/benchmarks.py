@@ -0,0 +1,65 @@
+"""
+In-process microbenchmarks. Unlike the scenarios these need no server, only
+Django settings; each returns ``LatencyRecorder`` objects so the results print
+and compare like scenario runs.
+"""
+import time
+
+from .stats import LatencyRecorder
+
+# A realistic bulk-notification template: plain variables in the title, a tag
+# in the message
+TITLE = 'New contact message from {{ contact.name }}'
+MESSAGE = '{{ contact.category }}: {{ contact.subject }}{% if urgent %} (urgent){% endif %}'
+ACTION_URL = '/admin/support/contactmessage/{{ contact.id }}/'
+
+
+def _measure(name, iterations, render):
+    recorder = LatencyRecorder(name)
+    recorder.start()
+    for index in range(iterations):
+        started = time.perf_counter()
+        render(index)
+        recorder.record(time.perf_counter() - started)
+    recorder.stop()
+    return recorder
+
+
+def template_rendering(iterations=10000):
+    """
+    NotificationTemplate.render as it was (three Template parses per call)
+    against the cached render, for one recipient context per iteration
+    """
+    from django.template import Context, Template
+    from django.utils import timezone
+
+    from src.apps.notifications.cache import clear_caches
+    from src.apps.realtime_notifications.models import NotificationTemplate
+
+    template = NotificationTemplate(
+        pk=1, name='bench', notification_type='contact_received', title_template=TITLE,
+        message_template=MESSAGE, action_url_template=ACTION_URL, updated_at=timezone.now(),
+    )
+
+    def context(index):
+        return {
+            'contact': {'name': f'User {index}', 'category': 'Support', 'subject': 'Payout question', 'id': index},
+            'urgent': index % 2,
+        }
+
+    def uncached(index):
+        values = context(index)
+        Template(TITLE).render(Context(values))
+        Template(MESSAGE).render(Context(values))
+        Template(ACTION_URL).render(Context(values))
+
+    clear_caches()
+    return [
+        _measure('render_uncached', iterations, uncached),
+        _measure('render_cached', iterations, lambda index: template.render(context(index))),
+    ]
+
+
+BENCHMARKS = {
+    'templates': template_rendering,
+}
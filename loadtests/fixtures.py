@@ -0,0 +1,112 @@
+"""
+Prepare the accounts and rows the scenarios need, and write the
+credentials to a JSON file the runner reads.
+
+This talks to the same database as the server under test, so run it with the
+server's settings/environment. Everything it creates uses the
+``@loadtest.local`` email domain and can be removed with ``cleanup()``.
+"""
+import os
+import uuid
+from decimal import Decimal
+
+EMAIL_DOMAIN = 'loadtest.local'
+BATCH_SIZE = 1000
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_distribution_backend.settings')
+    import django
+    django.setup()
+
+
+def _access_token(user):
+    # Same claims as a real login, so WebSocket connects need no user lookup
+    from src.apps.users.serializers import CustomTokenObtainPairSerializer
+
+    return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def prepare(users=1000, uploaders=100, credits=1000, webhook_transactions=2000, log=print):
+    """
+    Create load-test accounts and return the fixture dict.
+
+    ``users`` get a JWT access token (REST and WebSocket), the first
+    ``uploaders`` of them a pay-per-song subscription with ``credits`` upload
+    credits, and ``webhook_transactions`` pending transactions are created
+    for the webhook storm.
+    """
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from src.apps.payments.models import Subscription, Transaction
+
+    User = get_user_model()
+    run_id = uuid.uuid4().hex[:8]
+    password = make_password(None)
+
+    # bulk_create skips the welcome-notification signals, which would
+    # otherwise dominate preparation time.
+    admin = User(
+        email=f'admin-{run_id}@{EMAIL_DOMAIN}', username=f'lt_admin_{run_id}',
+        first_name='Load', last_name='Admin', password=password,
+        is_staff=True, is_superuser=True, role='admin',
+    )
+    User.objects.bulk_create([admin])
+    admin = User.objects.get(email=admin.email)
+
+    User.objects.bulk_create([
+        User(
+            email=f'user{i}-{run_id}@{EMAIL_DOMAIN}', username=f'lt_{run_id}_{i}',
+            first_name='Load', last_name=f'User{i}', password=password,
+            role='artist' if i < uploaders else 'user',
+        )
+        for i in range(users)
+    ], batch_size=BATCH_SIZE)
+    accounts = list(
+        User.objects.filter(email__endswith=f'-{run_id}@{EMAIL_DOMAIN}', is_staff=False).order_by('date_joined', 'pk')
+    )
+    log(f'Created {len(accounts)} users')
+
+    Subscription.objects.bulk_create([
+        Subscription(
+            user=user, subscription_type='pay_per_song', status='active',
+            amount=Decimal('5000.00') * credits, song_credits=credits,
+        )
+        for user in accounts[:uploaders]
+    ], batch_size=BATCH_SIZE)
+
+    references = [f'lt_{run_id}_{i}' for i in range(webhook_transactions)]
+    Transaction.objects.bulk_create([
+        Transaction(
+            user=accounts[i % len(accounts)], transaction_type='credit_purchase',
+            amount=Decimal('5000.00'), paystack_reference=reference,
+            metadata={'credits': 1},
+        )
+        for i, reference in enumerate(references)
+    ], batch_size=BATCH_SIZE)
+    log(f'Created {uploaders} uploader subscriptions and {len(references)} pending transactions')
+
+    fixture = {
+        'run_id': run_id,
+        'admin': {'id': str(admin.pk), 'token': _access_token(admin)},
+        'users': [],
+        'references': references,
+    }
+    for index, user in enumerate(accounts):
+        fixture['users'].append({
+            'id': str(user.pk),
+            'token': _access_token(user),
+            'uploader': index < uploaders,
+        })
+    log(f'Issued {len(accounts)} tokens')
+    return fixture
+
+
+def cleanup(log=print):
+    """Delete every load-test account and everything cascading from it."""
+    setup_django()
+    from django.contrib.auth import get_user_model
+
+    deleted, _ = get_user_model().objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+    log(f'Deleted {deleted} rows')
@@ -0,0 +1,229 @@
+"""
+Load-test scenarios. Each one drives a running server over HTTP/WebSocket
+and returns one or more ``LatencyRecorder`` objects.
+
+Scenarios are closed-loop: ``concurrency`` workers each issue their next
+request as soon as the previous one completes, until ``requests`` have been
+sent in total.
+"""
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import time
+from urllib.parse import urlparse
+
+import httpx
+
+from .stats import LatencyRecorder
+
+ADMIN_DASHBOARD_PATHS = [
+    '/api/admin/dashboard/stats/',
+    '/api/admin/dashboard/revenue_analytics/',
+    '/api/admin/dashboard/user_growth/',
+    '/api/admin/dashboard/content_stats/',
+    '/api/admin/dashboard/pending_songs_list/',
+    '/api/admin/users/',
+]
+
+
+def _cover_png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), color=(30, 30, 30)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+async def run_closed_loop(recorder, total, concurrency, operation):
+    """Run ``operation(index, client)`` ``total`` times over ``concurrency`` workers."""
+    counter = iter(range(total))
+
+    async def worker(client):
+        for index in counter:
+            started = time.perf_counter()
+            try:
+                error = await operation(index, client)
+            except httpx.HTTPError as exc:
+                error = type(exc).__name__
+            recorder.record(time.perf_counter() - started, error)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        recorder.start()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        recorder.stop()
+    return recorder
+
+
+def _status_error(response, expected):
+    return None if response.status_code in expected else f'HTTP {response.status_code}'
+
+
+async def song_uploads(base_url, fixture, requests=200, concurrency=20, audio_kb=256):
+    """Concurrent multipart uploads, each consuming a pay-per-song credit."""
+    uploaders = [user for user in fixture['users'] if user['uploader']]
+    if not uploaders:
+        raise ValueError('Fixture has no uploaders; run prepare with --uploaders > 0')
+    audio = b'ID3' + b'\x00' * (audio_kb * 1024)
+    cover = _cover_png()
+
+    async def upload(index, client):
+        user = uploaders[index % len(uploaders)]
+        response = await client.post(
+            f'{base_url}/api/songs/songs/',
+            headers={'Authorization': f"Bearer {user['token']}"},
+            data={'title': f'Load test {index}', 'release_type': 'single'},
+            files={
+                'audio_file': (f'track{index}.mp3', audio, 'audio/mpeg'),
+                'cover_image': (f'cover{index}.png', cover, 'image/png'),
+            },
+        )
+        return _status_error(response, (201,))
+
+    return [await run_closed_loop(LatencyRecorder('song_uploads'), requests, concurrency, upload)]
+
+
+async def webhook_storm(base_url, fixture, webhook_secret, requests=2000, concurrency=50):
+    """
+    Signed ``charge.success`` webhooks. When ``requests`` exceeds the prepared
+    references the extras are redeliveries, as Paystack retries would be.
+    """
+    references = fixture['references']
+    if not references:
+        raise ValueError('Fixture has no pending transactions; run prepare with --webhooks > 0')
+    key = webhook_secret.encode('utf-8')
+
+    async def deliver(index, client):
+        reference = references[index % len(references)]
+        body = json.dumps({
+            'event': 'charge.success',
+            'data': {'reference': reference, 'status': 'success', 'amount': 500000},
+        }).encode('utf-8')
+        response = await client.post(
+            f'{base_url}/api/payments/webhook/',
+            content=body,
+            headers={
+                'Content-Type': 'application/json',
+                'X-Paystack-Signature': hmac.new(key, body, hashlib.sha512).hexdigest(),
+            },
+        )
+        return _status_error(response, (200,))
+
+    return [await run_closed_loop(LatencyRecorder('webhook_storm'), requests, concurrency, deliver)]
+
+
+async def admin_dashboard(base_url, fixture, requests=500, concurrency=10):
+    """Admins refreshing the dashboard: the stats endpoints round-robin."""
+    headers = {'Authorization': f"Bearer {fixture['admin']['token']}"}
+
+    async def refresh(index, client):
+        path = ADMIN_DASHBOARD_PATHS[index % len(ADMIN_DASHBOARD_PATHS)]
+        response = await client.get(f'{base_url}{path}', headers=headers)
+        return _status_error(response, (200,))
+
+    return [await run_closed_loop(LatencyRecorder('admin_dashboard'), requests, concurrency, refresh)]
+
+
+async def websocket_fanout(base_url, fixture, connections=10000, broadcasts=3,
+                           connect_concurrency=500, timeout=120):
+    """
+    Open ``connections`` sockets to ``RealtimeNotificationConsumer`` and time
+    how long each broadcast takes to reach every socket.
+
+    A broadcast is one admin ``send_notification`` call addressed to every
+    connected user; fan-out latency is measured from the start of that
+    request to the frame arriving on each socket.
+    """
+    import websockets
+
+    users = fixture['users'][:connections]
+    parsed = urlparse(base_url)
+    ws_url = f"{'wss' if parsed.scheme == 'https' else 'ws'}://{parsed.netloc}/ws/realtime-notifications/"
+
+    connect_recorder = LatencyRecorder('ws_connect')
+    fanout_recorder = LatencyRecorder('ws_fanout')
+    broadcast_started = {}
+    pending = {}
+    sockets = []
+    gate = asyncio.Semaphore(connect_concurrency)
+
+    async def open_socket(user):
+        async with gate:
+            started = time.perf_counter()
+            try:
+                socket = await websockets.connect(
+                    f"{ws_url}?token={user['token']}",
+                    origin=f'{parsed.scheme}://{parsed.netloc}',
+                    open_timeout=timeout,
+                    max_queue=None,
+                )
+                # The consumer sends its connection snapshot as a single frame.
+                await asyncio.wait_for(socket.recv(), timeout)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as exc:
+                connect_recorder.record(time.perf_counter() - started, type(exc).__name__)
+                return None
+            connect_recorder.record(time.perf_counter() - started)
+            return socket
+
+    async def read_frames(socket):
+        try:
+            async for raw in socket:
+                frame = json.loads(raw)
+                if frame.get('type') != 'new_notification':
+                    continue
+                title = frame.get('notification', {}).get('title', '')
+                marker = title.rsplit('#', 1)[-1]
+                if marker in broadcast_started:
+                    fanout_recorder.record(time.perf_counter() - broadcast_started[marker])
+                    pending[marker] -= 1
+        except websockets.ConnectionClosed:
+            pass
+
+    connect_recorder.start()
+    opened = await asyncio.gather(*(open_socket(user) for user in users))
+    connect_recorder.stop()
+    connected_ids = [user['id'] for user, socket in zip(users, opened) if socket is not None]
+    sockets = [socket for socket in opened if socket is not None]
+    readers = [asyncio.create_task(read_frames(socket)) for socket in sockets]
+
+    headers = {'Authorization': f"Bearer {fixture['admin']['token']}"}
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        fanout_recorder.start()
+        for number in range(broadcasts):
+            marker = str(number)
+            pending[marker] = len(sockets)
+            broadcast_started[marker] = time.perf_counter()
+            response = await client.post(
+                f'{base_url}/api/realtime/admin/send_notification/',
+                headers=headers,
+                json={
+                    'recipient_ids': connected_ids,
+                    'notification_type': 'admin_alert',
+                    'title': f'Load test broadcast #{marker}',
+                    'message': 'Fan-out measurement',
+                },
+            )
+            if response.status_code != 200:
+                fanout_recorder.record(0, f'broadcast HTTP {response.status_code}')
+                continue
+            deadline = time.perf_counter() + timeout
+            while pending[marker] > 0 and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+            for _ in range(pending[marker]):
+                fanout_recorder.record(0, 'not delivered before timeout')
+        fanout_recorder.stop()
+
+    for socket in sockets:
+        await socket.close()
+    await asyncio.gather(*readers, return_exceptions=True)
+    return [connect_recorder, fanout_recorder]
+
+
+SCENARIOS = {
+    'uploads': song_uploads,
+    'webhooks': webhook_storm,
+    'admin': admin_dashboard,
+    'websockets': websocket_fanout,
+}
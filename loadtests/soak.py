@@ -0,0 +1,83 @@
+"""
+Channel-layer soak: group_send throughput as Redis shards are added.
+
+For each shard count from 1 to ``len(hosts)``, ``workers`` processes each open
+a channel layer on the first n hosts (as CHANNEL_REDIS_HOSTS would), put one
+channel in each of ``groups`` groups and run ``concurrency`` loops of
+group_send -> receive for ``duration`` seconds. Latency is send to receive.
+
+A process's channels all live on one shard and groups are spread by name
+over the hash ring in src/apps/realtime_notifications/layers.py, so run at
+least as many workers as hosts; with the workers on enough cores, throughput should grow roughly linearly with the shard count.
+Only Redis is needed, not the server or the database.
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .stats import LatencyRecorder
+
+
+def make_layer(hosts, mode='core', capacity=100, expiry=60, group_expiry=86400):
+    from src.apps.realtime_notifications.layers import ShardedRedisChannelLayer, ShardedRedisPubSubChannelLayer
+
+    if mode == 'pubsub':
+        return ShardedRedisPubSubChannelLayer(hosts=hosts)
+    return ShardedRedisChannelLayer(hosts=hosts, capacity=capacity, expiry=expiry, group_expiry=group_expiry)
+
+
+async def drive(layer, recorder, groups=1000, concurrency=100, duration=60, prefix='soak'):
+    """Closed-loop group_send -> receive over ``groups`` single-channel groups"""
+    concurrency = min(concurrency, groups)
+    pairs = []
+    for index in range(groups):
+        channel = await layer.new_channel()
+        await layer.group_add(f'{prefix}_{index}', channel)
+        pairs.append((f'{prefix}_{index}', channel))
+
+    deadline = time.perf_counter() + duration
+
+    async def loop(offset):
+        # Each loop owns every ``concurrency``-th group, so receives never cross
+        mine = pairs[offset::concurrency]
+        sent = 0
+        while time.perf_counter() < deadline:
+            group, channel = mine[sent % len(mine)]
+            sent += 1
+            started = time.perf_counter()
+            try:
+                await layer.group_send(group, {'type': 'soak.message', 'sent': started})
+                await asyncio.wait_for(layer.receive(channel), timeout=5)
+            except Exception as exc:
+                recorder.record(time.perf_counter() - started, type(exc).__name__)
+            else:
+                recorder.record(time.perf_counter() - started)
+
+    recorder.start()
+    await asyncio.gather(*(loop(offset) for offset in range(concurrency)))
+    recorder.stop()
+
+    for group, channel in pairs:
+        await layer.group_discard(group, channel)
+    return recorder
+
+
+def _worker(hosts, mode, groups, concurrency, duration, prefix):
+    recorder = LatencyRecorder(prefix)
+    asyncio.run(drive(make_layer(hosts, mode), recorder, groups, concurrency, duration, prefix))
+    return recorder
+
+
+def channel_layer_soak(hosts, mode='core', workers=4, groups=1000, concurrency=100, duration=60):
+    """One combined recorder per shard count, named ``<mode>_<n>_shards``"""
+    recorders = []
+    for shards in range(1, len(hosts) + 1):
+        name = f'{mode}_{shards}_shards'
+        print(f'Soaking {name}...', flush=True)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_worker, hosts[:shards], mode, groups, concurrency, duration, f'{name}_{worker}')
+                for worker in range(workers)
+            ]
+            recorders.append(LatencyRecorder.combine(name, [future.result() for future in futures]))
+    return recorders
@@ -0,0 +1,116 @@
+"""
+Latency and throughput aggregation for load-test scenarios.
+"""
+import json
+import math
+import time
+from collections import Counter
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """
+    Collects per-operation latencies for one scenario.
+
+    ``start()``/``stop()`` bracket the measured window so throughput is
+    operations per wall-clock second, not per summed latency.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = Counter()
+        self.started_at = None
+        self.finished_at = None
+
+    @classmethod
+    def combine(cls, name, recorders):
+        """Merge recorders that ran side by side (e.g. one per process) over the longest window."""
+        combined = cls(name)
+        for recorder in recorders:
+            combined.latencies.extend(recorder.latencies)
+            combined.errors.update(recorder.errors)
+        combined.started_at = 0.0
+        combined.finished_at = max((recorder.elapsed for recorder in recorders), default=0.0)
+        return combined
+
+    def start(self):
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.finished_at = time.perf_counter()
+
+    def record(self, seconds, error=None):
+        if error is None:
+            self.latencies.append(seconds)
+        else:
+            self.errors[str(error)] += 1
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def summary(self):
+        values = sorted(self.latencies)
+        elapsed = self.elapsed
+        return {
+            'scenario': self.name,
+            'ok': len(values),
+            'errors': sum(self.errors.values()),
+            'error_breakdown': dict(self.errors.most_common(5)),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+        }
+
+
+COLUMNS = ('ok', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+
+
+def format_summaries(summaries):
+    header = f"{'scenario':<22}" + ''.join(f'{column:>16}' for column in COLUMNS)
+    lines = [header, '-' * len(header)]
+    for summary in summaries:
+        lines.append(f"{summary['scenario']:<22}" + ''.join(f'{summary[c]:>16}' for c in COLUMNS))
+        for error, count in summary['error_breakdown'].items():
+            lines.append(f"  {count:>6} x {error}")
+    return '\n'.join(lines)
+
+
+def compare_summaries(baseline, current):
+    """Per-scenario deltas between two result files, in percent."""
+    by_name = {summary['scenario']: summary for summary in baseline}
+    rows = []
+    for summary in current:
+        before = by_name.get(summary['scenario'])
+        if not before:
+            continue
+        row = {'scenario': summary['scenario']}
+        for column in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = before[column], summary[column]
+            row[column] = round((new - old) / old * 100, 1) if old else None
+        rows.append(row)
+    return rows
+
+
+def write_results(summaries, path):
+    with open(path, 'w') as handle:
+        json.dump(summaries, handle, indent=2)
+
+
+def read_results(path):
+    with open(path) as handle:
+        return json.load(handle)
@@ -0,0 +1,310 @@
+"""
+Local stand-ins for the Paystack and ZeptoMail HTTP APIs.
+
+Point the server under test at the stub with::
+
+    PAYSTACK_BASE_URL=http://127.0.0.1:8765/paystack
+    ZEPTOMAIL_API_URL=http://127.0.0.1:8765/zeptomail/v1.1/email
+
+Responses mirror the shape of the real APIs closely enough for
+``PaymentService`` and the ZeptoMail backend to parse them. ``latency``
+adds a fixed delay per request and ``error_rate`` fails that fraction of
+requests with a 500 so failover paths can be exercised. Tests can also set
+``throttle_next`` (answer that many requests with 429) and ``fail_addresses``
+(reject ZeptoMail sends to those recipients), and inspect ``received``,
+``connections`` and ``max_in_flight``.
+"""
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_AMOUNT_KOBO = 500000
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def paystack_transaction(reference, amount=DEFAULT_AMOUNT_KOBO, status='success'):
+    """A verify payload shaped like Paystack's ``/transaction/verify`` data."""
+    return {
+        'id': random.randint(10 ** 9, 10 ** 10),
+        'domain': 'test',
+        'status': status,
+        'reference': reference,
+        'amount': amount,
+        'message': None,
+        'gateway_response': 'Successful' if status == 'success' else 'Declined',
+        'paid_at': _now(),
+        'created_at': _now(),
+        'channel': 'card',
+        'currency': 'NGN',
+        'ip_address': '127.0.0.1',
+        'metadata': '',
+        'fees': int(amount * 0.015),
+        'customer': {
+            'id': 1,
+            'first_name': 'Load',
+            'last_name': 'Test',
+            'email': 'loadtest@example.com',
+            'customer_code': 'CUS_loadtest',
+            'phone': None,
+            'metadata': None,
+            'risk_action': 'default',
+        },
+        'authorization': {
+            'authorization_code': f'AUTH_{reference[-10:]}',
+            'bin': '408408',
+            'last4': '4081',
+            'exp_month': '12',
+            'exp_year': '2030',
+            'channel': 'card',
+            'card_type': 'visa ',
+            'bank': 'TEST BANK',
+            'country_code': 'NG',
+            'brand': 'visa',
+            'reusable': False,
+            'signature': 'SIG_loadtest',
+            'account_name': None,
+        },
+        'plan': None,
+        'requested_amount': amount,
+    }
+
+
+class StubState:
+    """Counters and knobs shared by all handler threads."""
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hits = Counter()
+        self.amounts = {}
+        self.emails_sent = 0
+        self.throttle_next = 0
+        self.fail_addresses = set()
+        self.received = deque(maxlen=1000)
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def hit(self, route, payload):
+        with self.lock:
+            self.hits[route] += 1
+            self.received.append((route, payload))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def take_throttle(self):
+        with self.lock:
+            if self.throttle_next > 0:
+                self.throttle_next -= 1
+                return True
+            return False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    routes = [
+        ('POST', re.compile(r'^/paystack/transaction/initialize/?$'), 'paystack_initialize'),
+        ('GET', re.compile(r'^/paystack/transaction/verify/(?P<reference>[^/?]+)'), 'paystack_verify'),
+        ('POST', re.compile(r'^/paystack/transaction/charge_authorization/?$'), 'paystack_charge'),
+        ('POST', re.compile(r'^/paystack/customer/?$'), 'paystack_customer'),
+        ('GET', re.compile(r'^/paystack/bank'), 'paystack_banks'),
+        ('POST', re.compile(r'^/zeptomail/v1\.1/email/?$'), 'zeptomail_send'),
+        ('POST', re.compile(r'^/zeptomail/v1\.1/email/batch/?$'), 'zeptomail_batch'),
+        ('GET', re.compile(r'^/__stats__/?$'), 'stats'),
+    ]
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle
+        # plus delayed ACKs add ~40ms to every keep-alive request.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.state.lock:
+            self.state.connections += 1
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            payload = {}
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(self.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._json(404, {'status': False, 'message': f'No stub for {method} {self.path}'})
+
+        if name == 'stats':
+            return self._json(*self.stats(payload))
+        self.state.hit(name, payload)
+        try:
+            if self.state.latency:
+                time.sleep(self.state.latency)
+            if self.state.take_throttle():
+                return self._json(429, {'message': 'Too many requests'}, {'Retry-After': '0'})
+            if self.state.error_rate and random.random() < self.state.error_rate:
+                return self._json(500, {'status': False, 'message': 'Injected stub failure'})
+            status, data = getattr(self, name)(payload, **match.groupdict())
+            self._json(status, data)
+        finally:
+            self.state.done()
+
+    def _json(self, status, data, headers=None):
+        raw = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    # Paystack
+
+    def paystack_initialize(self, payload):
+        reference = payload.get('reference') or f'stub_{uuid.uuid4().hex[:12]}'
+        with self.state.lock:
+            self.state.amounts[reference] = int(payload.get('amount') or DEFAULT_AMOUNT_KOBO)
+        return 200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f'https://checkout.paystack.com/{reference}',
+                'access_code': f'ac_{reference[-12:]}',
+                'reference': reference,
+            },
+        }
+
+    def paystack_verify(self, payload, reference):
+        amount = self.state.amounts.get(reference, DEFAULT_AMOUNT_KOBO)
+        return 200, {
+            'status': True,
+            'message': 'Verification successful',
+            'data': paystack_transaction(reference, amount),
+        }
+
+    def paystack_charge(self, payload):
+        reference = payload.get('reference') or f'stub_{uuid.uuid4().hex[:12]}'
+        return 200, {
+            'status': True,
+            'message': 'Charge attempted',
+            'data': paystack_transaction(reference, int(payload.get('amount') or DEFAULT_AMOUNT_KOBO)),
+        }
+
+    def paystack_customer(self, payload):
+        return 200, {
+            'status': True,
+            'message': 'Customer created',
+            'data': {
+                'id': random.randint(1, 10 ** 6),
+                'email': payload.get('email'),
+                'customer_code': f'CUS_{uuid.uuid4().hex[:12]}',
+                'integration': 100032,
+                'domain': 'test',
+                'identified': False,
+            },
+        }
+
+    def paystack_banks(self, payload):
+        return 200, {
+            'status': True,
+            'message': 'Banks retrieved',
+            'data': [
+                {'id': 1, 'name': 'Test Bank', 'slug': 'test-bank', 'code': '001',
+                 'longcode': '001', 'gateway': None, 'pay_with_bank': False, 'supports_transfer': True,
+                 'country': 'Nigeria', 'currency': 'NGN', 'type': 'nuban', 'active': True,
+                 'is_deleted': False, 'createdAt': '2024-01-01T00:00:00.000Z',
+                 'updatedAt': '2024-01-01T00:00:00.000Z'},
+            ],
+        }
+
+    # ZeptoMail
+
+    def _zeptomail_accepted(self, count):
+        with self.state.lock:
+            self.state.emails_sent += count
+        return 201, {
+            'data': [
+                {'code': 'EM_104', 'additional_info': [], 'message': 'Email request received'}
+                for _ in range(count)
+            ],
+            'message': 'OK',
+            'object': 'email',
+            'request_id': uuid.uuid4().hex,
+        }
+
+    def zeptomail_send(self, payload):
+        addresses = {entry.get('email_address', {}).get('address') for entry in payload.get('to') or []}
+        if addresses & self.state.fail_addresses:
+            return 400, {'error': {'code': 'TM_3201', 'message': 'Invalid recipient', 'details': []}}
+        return self._zeptomail_accepted(1)
+
+    def zeptomail_batch(self, payload):
+        return self._zeptomail_accepted(max(1, len(payload.get('to') or [])))
+
+    def stats(self, payload):
+        with self.state.lock:
+            return 200, {
+                'hits': dict(self.state.hits),
+                'emails_sent': self.state.emails_sent,
+                'connections': self.state.connections,
+                'max_in_flight': self.state.max_in_flight,
+            }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, error_rate=0.0):
+        super().__init__(address, StubHandler)
+        self.state = StubState(latency=latency, error_rate=error_rate)
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up before the reply is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_stubs(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+    """Start the stub server on a background thread and return it."""
+    server = StubServer((host, port), latency=latency, error_rate=error_rate)
+    thread = threading.Thread(target=server.serve_forever, name='loadtest-stubs', daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,108 @@
+import requests
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.core import mail
+from django.test import SimpleTestCase, override_settings
+
+from src.apps.payments.gateway import extract_gateway_fields
+from src.apps.payments.services import PaymentService
+
+from .benchmarks import template_rendering
+from .soak import drive
+from .stats import LatencyRecorder, compare_summaries, percentile
+from .stubs import start_stubs
+
+
+class StatsTests(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_summary_separates_errors(self):
+        recorder = LatencyRecorder('demo')
+        recorder.start()
+        for seconds in (0.01, 0.02, 0.03):
+            recorder.record(seconds)
+        recorder.record(0.5, 'HTTP 500')
+        recorder.stop()
+
+        summary = recorder.summary()
+        self.assertEqual(summary['ok'], 3)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['p50_ms'], 20.0)
+        self.assertEqual(summary['error_breakdown'], {'HTTP 500': 1})
+
+    def test_compare_reports_percent_change(self):
+        before = [{'scenario': 'admin', 'throughput_rps': 100, 'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 40}]
+        after = [{'scenario': 'admin', 'throughput_rps': 150, 'p50_ms': 5, 'p95_ms': 20, 'p99_ms': 0}]
+        row = compare_summaries(before, after)[0]
+        self.assertEqual(row['throughput_rps'], 50.0)
+        self.assertEqual(row['p50_ms'], -50.0)
+        self.assertEqual(row['p95_ms'], 0.0)
+
+
+class BenchmarkTests(SimpleTestCase):
+    def test_template_benchmark_renders_both_paths(self):
+        summaries = [recorder.summary() for recorder in template_rendering(iterations=5)]
+        self.assertEqual([s['scenario'] for s in summaries], ['render_uncached', 'render_cached'])
+        self.assertEqual([s['ok'] for s in summaries], [5, 5])
+
+
+class SoakTests(SimpleTestCase):
+    def test_drive_round_trips_and_combines(self):
+        recorders = [
+            async_to_sync(drive)(InMemoryChannelLayer(), LatencyRecorder(f'run{n}'), groups=4, concurrency=2, duration=0.05)
+            for n in range(2)
+        ]
+        self.assertTrue(all(recorder.latencies and not recorder.errors for recorder in recorders))
+
+        combined = LatencyRecorder.combine('core_1_shards', recorders).summary()
+        self.assertEqual(combined['ok'], sum(len(recorder.latencies) for recorder in recorders))
+        self.assertEqual(combined['elapsed_s'], round(max(recorder.elapsed for recorder in recorders), 3))
+
+
+class StubContractTests(SimpleTestCase):
+    """The stubs must keep parsing through the real clients, or load numbers lie."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_stubs()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_payment_service_verifies_against_stub(self):
+        with override_settings(PAYSTACK_SECRET_KEY='sk_test_stub',
+                               PAYSTACK_BASE_URL=f'{self.server.base_url}/paystack'):
+            success, data = PaymentService().verify_payment('mdp_stub_ref')
+
+        self.assertTrue(success)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['reference'], 'mdp_stub_ref')
+        self.assertEqual(extract_gateway_fields(data)['card_last_four'], '4081')
+
+    def test_payment_service_lists_banks_from_stub(self):
+        with override_settings(PAYSTACK_SECRET_KEY='sk_test_stub',
+                               PAYSTACK_BASE_URL=f'{self.server.base_url}/paystack'):
+            success, banks = PaymentService().get_banks()
+
+        self.assertTrue(success)
+        self.assertEqual(banks[0]['code'], '001')
+
+    def test_zeptomail_backend_sends_to_stub(self):
+        with override_settings(
+            EMAIL_BACKEND='src.apps.notifications.email_backends.ZeptoMailAPIBackend',
+            ZEPTOMAIL_API_KEY='stub-key',
+            ZEPTOMAIL_API_URL=f'{self.server.base_url}/zeptomail/v1.1/email',
+        ):
+            sent = mail.send_mail('Hello', 'Body', 'noreply@example.com', ['artist@example.com'])
+
+        self.assertEqual(sent, 1)
+        stats = requests.get(f'{self.server.base_url}/__stats__', timeout=5).json()
+        self.assertEqual(stats['hits']['zeptomail_send'], 1)
@@ -10,10 +10,7 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
-from src.apps.notifications.routing import websocket_urlpatterns
-from src.apps.realtime_notifications.routing import realtime_websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_distribution_backend.settings')
 
@@ -21,13 +18,17 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'music_distribution_backend.sett
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+from src.apps.notifications.routing import websocket_urlpatterns
+from src.apps.realtime_notifications.routing import realtime_websocket_urlpatterns
+from src.apps.users.websocket_auth import JWTAuthMiddlewareStack
+
 # Combine all WebSocket URL patterns
 all_websocket_urlpatterns = websocket_urlpatterns + realtime_websocket_urlpatterns
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
+        JWTAuthMiddlewareStack(
             URLRouter(
                 all_websocket_urlpatterns
             )
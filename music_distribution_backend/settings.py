@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import config, Csv
 import dj_database_url
 from datetime import timedelta
 
@@ -61,6 +61,7 @@ INSTALLED_APPS = [
     'src.apps.support',
     'src.apps.realtime_notifications',
     'src.apps.referrals',
+    'src.apps.metrics',
     # 'src.apps.artists',
     # 'src.apps.analytics',
     # 'src.apps.admin_panel',
@@ -69,6 +70,7 @@ INSTALLED_APPS = [
 # Cloudinary support removed; using S3 or local storage only
 
 MIDDLEWARE = [
+    'src.apps.metrics.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,15 +110,61 @@ TEMPLATES = [
 WSGI_APPLICATION = 'music_distribution_backend.wsgi.application'
 ASGI_APPLICATION = 'music_distribution_backend.asgi.application'
 
+# WebSocket connections authenticate with a JWT access token (src/apps/users/websocket_auth.py);
+# token-less connections fall back to the session while this is on
+WEBSOCKET_SESSION_AUTH = config('WEBSOCKET_SESSION_AUTH', default=True, cast=bool)
+# Most notifications replayed to a client reconnecting with ?since=<cursor>
+REALTIME_SNAPSHOT_LIMIT = config('REALTIME_SNAPSHOT_LIMIT', default=50, cast=int)
+# Seconds before the cursor replayed on reconnect, for rows that committed late
+REALTIME_RESUME_OVERLAP = config('REALTIME_RESUME_OVERLAP', default=5, cast=float)
+# Fan-out publishing (src/apps/realtime_notifications/publisher.py)
+REALTIME_PUBLISH_BATCH_SIZE = config('REALTIME_PUBLISH_BATCH_SIZE', default=1000, cast=int)  # recipients per insert
+REALTIME_PUBLISH_CONCURRENCY = config('REALTIME_PUBLISH_CONCURRENCY', default=200, cast=int)  # group_sends in flight
+REALTIME_UNREAD_COUNT_WINDOW = config('REALTIME_UNREAD_COUNT_WINDOW', default=0.25, cast=float)  # seconds
+# Who has a socket open (src/apps/realtime_notifications/presence.py); empty for the in-process backend
+REALTIME_PRESENCE_URL = config('REALTIME_PRESENCE_URL', default='redis://127.0.0.1:6379/0')
+REALTIME_PRESENCE_TTL = config('REALTIME_PRESENCE_TTL', default=90, cast=int)  # seconds without a refresh
+# Client acks and redelivery (src/apps/realtime_notifications/delivery.py)
+REALTIME_ACK_FLUSH_INTERVAL = config('REALTIME_ACK_FLUSH_INTERVAL', default=0.5, cast=float)  # seconds between ack UPDATEs
+REALTIME_ACK_BATCH_SIZE = config('REALTIME_ACK_BATCH_SIZE', default=500, cast=int)  # flush early at this many acks
+REALTIME_REDELIVERY_BACKOFF = config('REALTIME_REDELIVERY_BACKOFF', default=30, cast=int)  # seconds, doubled per retry
+REALTIME_INFLIGHT_WINDOW = config('REALTIME_INFLIGHT_WINDOW', default=100, cast=int)  # unacked per user
+
 # Channels Layer Configuration
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
-        'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+# Channels and groups are spread over CHANNEL_REDIS_HOSTS by a consistent-hash ring over their
+# name (src/apps/realtime_notifications/layers.py), so each extra Redis takes its share of group
+# membership and fan-out. Every ASGI node must list the same hosts; adding or removing one of n
+# hosts remaps about 1/n of the groups, whose sockets pick them up again when they re-join
+CHANNEL_REDIS_HOSTS = config('CHANNEL_REDIS_HOSTS', default='redis://127.0.0.1:6379/0', cast=Csv())
+# 'core' queues messages per channel in Redis; 'pubsub' pushes them straight to subscribed
+# consumers with no queue, which suits broadcast-heavy traffic but drops messages for a
+# consumer that isn't connected and ignores the capacity and expiry settings below
+CHANNEL_LAYER_MODE = config('CHANNEL_LAYER_MODE', default='core')
+CHANNEL_CAPACITY = config('CHANNEL_CAPACITY', default=100, cast=int)  # queued messages per channel
+CHANNEL_EXPIRY = config('CHANNEL_EXPIRY', default=60, cast=int)  # seconds an undelivered message lives
+CHANNEL_GROUP_EXPIRY = config('CHANNEL_GROUP_EXPIRY', default=86400, cast=int)  # seconds a group membership lives
+
+if CHANNEL_LAYER_MODE == 'pubsub':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'src.apps.realtime_notifications.layers.ShardedRedisPubSubChannelLayer',
+            'CONFIG': {
+                "hosts": CHANNEL_REDIS_HOSTS,
+            },
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'src.apps.realtime_notifications.layers.ShardedRedisChannelLayer',
+            'CONFIG': {
+                "hosts": CHANNEL_REDIS_HOSTS,
+                "capacity": CHANNEL_CAPACITY,
+                "expiry": CHANNEL_EXPIRY,
+                "group_expiry": CHANNEL_GROUP_EXPIRY,
+            },
+        },
+    }
 
 
 # Database
@@ -191,6 +239,9 @@ STATICFILES_FINDERS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Clears the in-process notification caches between tests
+TEST_RUNNER = 'music_distribution_backend.test_runner.TestRunner'
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -340,6 +391,8 @@ AUTH_USER_MODEL = 'users.User'
 PAYSTACK_PUBLIC_KEY = config('PAYSTACK_PUBLIC_KEY', default='')
 PAYSTACK_SECRET_KEY = config('PAYSTACK_SECRET_KEY', default='')
 PAYSTACK_WEBHOOK_SECRET = config('PAYSTACK_WEBHOOK_SECRET', default='')
+# Override to point the client at a local stub (see loadtests/)
+PAYSTACK_BASE_URL = config('PAYSTACK_BASE_URL', default='')
 
 # Frontend URL for payment redirects
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:5173')
@@ -360,6 +413,10 @@ CACHES = {
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 # SESSION_CACHE_ALIAS = 'default'
 
+# Metrics endpoint (/metrics). Scrapers must send "Authorization: Bearer <token>"; when it is
+# empty the endpoint answers 403 unless DEBUG is on
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+
 # Celery configuration (commented out for development - requires Redis)
 # CELERY_BROKER_URL = REDIS_URL
 # CELERY_RESULT_BACKEND = REDIS_URL
@@ -369,6 +426,38 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 # CELERY_TIMEZONE = 'UTC'
 # CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Notification emails are delivered from an outbox by a dedicated worker pool:
+#   celery -A music_distribution_backend worker -Q notifications_email --concurrency 8
+NOTIFICATION_EMAIL_QUEUE = config('NOTIFICATION_EMAIL_QUEUE', default='notifications_email')
+CELERY_TASK_ROUTES = {
+    'src.apps.notifications.tasks.send_notification_email': {'queue': NOTIFICATION_EMAIL_QUEUE},
+}
+NOTIFICATION_EMAIL_MAX_RETRIES = config('NOTIFICATION_EMAIL_MAX_RETRIES', default=5, cast=int)
+NOTIFICATION_EMAIL_RETRY_BACKOFF_MAX = config('NOTIFICATION_EMAIL_RETRY_BACKOFF_MAX', default=600, cast=int)  # seconds
+# requeue_stale_notification_emails re-enqueues rows queued longer than this (seconds)
+NOTIFICATION_EMAIL_REQUEUE_AFTER = config('NOTIFICATION_EMAIL_REQUEUE_AFTER', default=900, cast=int)
+# Without a reachable broker, deliver in-process instead of leaving the email for the sweep
+NOTIFICATION_EMAIL_INLINE_FALLBACK = config('NOTIFICATION_EMAIL_INLINE_FALLBACK', default=DEBUG, cast=bool)
+
+# Digests (send_digest_notifications, run at least hourly)
+DIGEST_USER_CHUNK_SIZE = config('DIGEST_USER_CHUNK_SIZE', default=500, cast=int)  # users per notification scan
+DIGEST_SEND_BATCH_SIZE = config('DIGEST_SEND_BATCH_SIZE', default=100, cast=int)  # emails per send_messages call
+DIGEST_MAX_ITEMS = config('DIGEST_MAX_ITEMS', default=50, cast=int)  # newest items listed; the rest are counted
+DIGEST_SCHEDULE_SLACK = config('DIGEST_SCHEDULE_SLACK', default=300, cast=int)  # seconds a run may fire early
+
+# Newest broadcasts merged into a user's notification list and unread count
+BROADCAST_FEED_LIMIT = config('BROADCAST_FEED_LIMIT', default=20, cast=int)
+
+# Retention (prune_notifications task / management command, run daily)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=180, cast=int)  # NotificationType.retention_days overrides
+NOTIFICATION_LOG_RETENTION_DAYS = config('NOTIFICATION_LOG_RETENTION_DAYS', default=90, cast=int)
+REALTIME_NOTIFICATION_RETENTION_DAYS = config('REALTIME_NOTIFICATION_RETENTION_DAYS', default=30, cast=int)
+RETENTION_BATCH_SIZE = config('RETENTION_BATCH_SIZE', default=1000, cast=int)  # rows per DELETE
+RETENTION_BATCH_PAUSE = config('RETENTION_BATCH_PAUSE', default=0.1, cast=float)  # seconds between batches
+# Pruned rows are appended to <dir>/<table>/<table>-<timestamp>.ndjson.gz; blank disables archiving
+NOTIFICATION_ARCHIVE_DIR = config('NOTIFICATION_ARCHIVE_DIR', default='')
+NOTIFICATION_PARTITIONS_AHEAD = config('NOTIFICATION_PARTITIONS_AHEAD', default=2, cast=int)  # months, partitioned Postgres tables only
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -444,6 +533,14 @@ else:
 # ZeptoMail API Configuration
 ZEPTOMAIL_API_KEY = config('ZEPTOMAIL_API_KEY', default='')
 ZEPTOMAIL_API_URL = config('ZEPTOMAIL_API_URL', default='https://api.zeptomail.com/v1.1/email')
+ZEPTOMAIL_BATCH_API_URL = config('ZEPTOMAIL_BATCH_API_URL', default='')  # defaults to <API_URL>/batch
+ZEPTOMAIL_BATCH_SIZE = config('ZEPTOMAIL_BATCH_SIZE', default=500, cast=int)
+ZEPTOMAIL_MAX_CONCURRENCY = config('ZEPTOMAIL_MAX_CONCURRENCY', default=8, cast=int)
+ZEPTOMAIL_RATE_LIMIT = config('ZEPTOMAIL_RATE_LIMIT', default=10, cast=float)  # API calls per second
+ZEPTOMAIL_RATE_BURST = config('ZEPTOMAIL_RATE_BURST', default=20, cast=int)
+ZEPTOMAIL_MAX_RETRIES = config('ZEPTOMAIL_MAX_RETRIES', default=2, cast=int)
+ZEPTOMAIL_CONNECT_TIMEOUT = config('ZEPTOMAIL_CONNECT_TIMEOUT', default=3.05, cast=float)
+ZEPTOMAIL_TIMEOUT = config('ZEPTOMAIL_TIMEOUT', default=10, cast=float)
 
 # SMTP Configuration (for fallback or direct SMTP mode)
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.zeptomail.com')
@@ -452,6 +549,25 @@ EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_USE_SSL = config('EMAIL_USE_SSL', default=False, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+
+# Hybrid backend failover: skip a provider for EMAIL_FAILOVER_COOLDOWN seconds
+# after EMAIL_FAILOVER_THRESHOLD consecutive failures
+EMAIL_FAILOVER_THRESHOLD = config('EMAIL_FAILOVER_THRESHOLD', default=5, cast=int)
+EMAIL_FAILOVER_COOLDOWN = config('EMAIL_FAILOVER_COOLDOWN', default=60, cast=int)
+EMAIL_SMTP_IDLE_TIMEOUT = config('EMAIL_SMTP_IDLE_TIMEOUT', default=60, cast=int)  # reconnect after this many idle seconds
+
+# Per-process caches for DB-stored EmailTemplate rendering (notifications/cache.py)
+COMPILED_TEMPLATE_CACHE_SIZE = config('COMPILED_TEMPLATE_CACHE_SIZE', default=512, cast=int)
+EMAIL_TEMPLATE_CACHE_TTL = config('EMAIL_TEMPLATE_CACHE_TTL', default=300, cast=int)  # seconds
+
+# Admin bulk notifications are fanned out in Celery tasks of this many recipients
+BULK_NOTIFICATION_CHUNK_SIZE = config('BULK_NOTIFICATION_CHUNK_SIZE', default=2000, cast=int)
+ADMIN_AUDIENCE_CACHE_TTL = config('ADMIN_AUDIENCE_CACHE_TTL', default=300, cast=int)  # seconds the admin id list is cached
+NOTIFICATION_TYPE_CACHE_TTL = config('NOTIFICATION_TYPE_CACHE_TTL', default=300, cast=int)
+NOTIFICATION_TYPE_MISS_TTL = config('NOTIFICATION_TYPE_MISS_TTL', default=30, cast=int)  # seconds an unknown type name stays unknown
+PREFERENCE_CACHE_SIZE = config('PREFERENCE_CACHE_SIZE', default=10000, cast=int)  # users whose preferences are kept per process
+PREFERENCE_CACHE_TTL = config('PREFERENCE_CACHE_TTL', default=60, cast=int)
 
 # Email Settings
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@yourdomain.com')
@@ -0,0 +1,38 @@
+"""
+Test runner that empties the per-process notification caches before every test.
+
+TestCase rolls each test's writes back without sending post_delete, so a
+NotificationType, EmailTemplate or NotificationTemplate row cached during one
+test would otherwise be served to the next one after the row is gone.
+"""
+import unittest
+
+from django.test.runner import DiscoverRunner, ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+
+
+class CacheResetMixin:
+    def startTest(self, test):
+        from src.apps.notifications.cache import clear_caches
+
+        clear_caches()
+        super().startTest(test)
+
+
+class CacheResetRemoteTestResult(CacheResetMixin, RemoteTestResult):
+    pass
+
+
+class CacheResetRemoteTestRunner(RemoteTestRunner):
+    resultclass = CacheResetRemoteTestResult
+
+
+class CacheResetParallelTestSuite(ParallelTestSuite):
+    runner_class = CacheResetRemoteTestRunner
+
+
+class TestRunner(DiscoverRunner):
+    parallel_test_suite = CacheResetParallelTestSuite
+
+    def get_resultclass(self):
+        resultclass = super().get_resultclass() or unittest.TextTestResult
+        return type(f'CacheReset{resultclass.__name__}', (CacheResetMixin, resultclass), {})
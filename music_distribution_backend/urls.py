@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from src.apps.metrics.views import metrics
 from . import views
 
 
@@ -29,6 +30,9 @@ urlpatterns = [
     path('api/health/', views.api_health, name='api_health'),
     path('api/test-cors/', views.api_test_cors, name='api_test_cors'),
     
+    # Prometheus scrape endpoint
+    path('metrics', metrics, name='metrics'),
+    
     # API endpoints
     path('api/auth/', include('src.apps.users.urls')),
     path('api/songs/', include('src.apps.songs.urls')),
@@ -0,0 +1,4 @@
+"""
+Performance tooling: dataset seeding and the per-endpoint query-budget
+harness. See perf/README.md.
+"""
@@ -0,0 +1,190 @@
+"""
+Declared SQL query budgets for every route in ROOT_URLCONF.
+
+Each entry maps the full route string (as printed by ``perf.harness.iter_routes``)
+to a ``Budget``. Keyword arguments name the path parameters and point at a key
+in ``SeedData.sample_ids`` used to fill them.
+
+Budgets are measured at the harness's default scale with the seeded admin
+making a GET request; list endpoints render a full page. A well-behaved list
+costs a constant number of queries, so a budget that has to grow with the
+page size is an N+1 and should be fixed rather than raised.
+
+``status`` is the response the GET must get, so a route that starts failing
+can't pass on the few queries its error page costs. Write-only routes are
+declared with ``status=405``: only authentication is measured for them, and
+one that gains a GET handler fails until it gets a real budget.
+"""
+
+
+class Budget:
+    def __init__(self, queries, max_seconds=None, status=200, **kwargs):
+        self.queries = queries
+        self.max_seconds = max_seconds
+        self.status = status
+        self.kwargs = kwargs
+
+    def url_kwargs(self, sample_ids):
+        return {name: sample_ids[key] for name, key in self.kwargs.items()}
+
+
+# Routes the harness deliberately does not request.
+EXCLUDED_PREFIXES = (
+    'admin/',  # Django admin has its own query patterns
+    '^media/',  # DEBUG-only static file serving
+    '^static/',
+)
+
+
+BUDGETS = {
+    'api/health/': Budget(1),
+    'api/test-cors/': Budget(1),
+    'metrics': Budget(0, status=403),  # no METRICS_AUTH_TOKEN outside DEBUG
+    'api/auth/register/': Budget(1, status=405),
+    'api/auth/login/': Budget(0, status=405),
+    'api/auth/logout/': Budget(1, status=405),
+    'api/auth/token/refresh/': Budget(0, status=405),
+    'api/auth/profile/': Budget(1),
+    'api/auth/profile/details/': Budget(5),
+    'api/auth/profile/update/': Budget(1, status=405),
+    'api/auth/password/change/': Budget(1, status=405),
+    'api/auth/password/reset/': Budget(1, status=405),
+    'api/auth/password/reset/confirm/': Budget(1, status=405),
+    'api/auth/account/delete/': Budget(1, status=405),
+    'api/auth/dashboard/stats/': Budget(5),
+    'api/auth/check-email/': Budget(1, status=405),
+    'api/auth/check-username/': Budget(1, status=405),
+    'api/songs/^albums/$': Budget(5),
+    'api/songs/^albums/draft/$': Budget(4),
+    'api/songs/^albums/scheduled/$': Budget(4),
+    'api/songs/^albums/(?P<pk>[^/.]+)/$': Budget(5, pk='album'),
+    'api/songs/^albums/(?P<pk>[^/.]+)/add_track/$': Budget(2, pk='album', status=405),
+    'api/songs/^albums/(?P<pk>[^/.]+)/submit_for_review/$': Budget(2, pk='album', status=405),
+    'api/songs/^album-tracks/$': Budget(4),
+    'api/songs/^album-tracks/(?P<pk>[^/.]+)/$': Budget(3, pk='album_track'),
+    'api/songs/^$': Budget(1),
+    'api/songs/songs/': Budget(5),
+    'api/songs/songs/<uuid:pk>/': Budget(8, pk='song'),
+    'api/songs/songs/<uuid:song_id>/submit/': Budget(1, song_id='song', status=405),
+    'api/songs/songs/<uuid:song_id>/approve/': Budget(1, song_id='song', status=405),
+    'api/songs/songs/<uuid:song_id>/status/': Budget(1, song_id='song', status=405),
+    'api/songs/genres/': Budget(3),
+    'api/songs/platforms/': Budget(3),
+    'api/songs/stats/': Budget(5),
+    'api/payments/methods/': Budget(3),
+    'api/payments/methods/<uuid:pk>/': Budget(2, pk='payment_method'),
+    'api/payments/methods/<uuid:payment_method_id>/set-default/': Budget(1, payment_method_id='payment_method', status=405),
+    'api/payments/subscriptions/': Budget(3),
+    'api/payments/subscription/current/': Budget(2),
+    'api/payments/subscription/upgrade/': Budget(1, status=405),
+    'api/payments/subscription/cancel/': Budget(1, status=405),
+    'api/payments/subscription/consume-credit/': Budget(1, status=405),
+    'api/payments/transactions/': Budget(3),
+    'api/payments/export/': Budget(1),
+    'api/payments/initialize/': Budget(1, status=405),
+    'api/payments/verify/': Budget(1, status=405),
+    'api/payments/verify-pending/': Budget(1, status=405),
+    'api/payments/callback/': Budget(1, status=405),
+    'api/payments/charge/': Budget(1, status=405),
+    'api/payments/credits/purchase/': Budget(1, status=405),
+    'api/payments/banks/': Budget(1),
+    'api/payments/pricing/': Budget(1),
+    'api/payments/webhook/': Budget(0, status=405),
+    'api/payments/dev/set-role/': Budget(1, status=405),
+    'api/payments/dev/test-verify/': Budget(18),  # a full payment success against the Paystack stub
+    'api/notifications/^notifications/$': Budget(4),  # + visible broadcasts
+    'api/notifications/^notifications/broadcast/$': Budget(1, status=405),
+    'api/notifications/^notifications/mark_all_as_read/$': Budget(1, status=405),
+    'api/notifications/^notifications/send_to_user/$': Budget(1, status=405),
+    'api/notifications/^notifications/stats/$': Budget(8),
+    'api/notifications/^notifications/unread/$': Budget(3),  # + unread broadcasts
+    'api/notifications/^notifications/unread_count/$': Budget(3),
+    'api/notifications/^notifications/(?P<pk>[^/.]+)/$': Budget(2, pk='notification'),
+    'api/notifications/^notifications/(?P<pk>[^/.]+)/mark_as_read/$': Budget(1, pk='notification', status=405),
+    'api/notifications/^notification-types/$': Budget(3),
+    'api/notifications/^notification-types/(?P<pk>[^/.]+)/$': Budget(2, pk='notification_type'),
+    'api/notifications/^preferences/$': Budget(3),
+    'api/notifications/^preferences/bulk_update/$': Budget(1, status=405),
+    'api/notifications/^preferences/defaults/$': Budget(3),
+    'api/notifications/^preferences/(?P<pk>[^/.]+)/$': Budget(2, pk='preference'),
+    'api/notifications/^email-templates/$': Budget(3),
+    'api/notifications/^email-templates/(?P<pk>[^/.]+)/$': Budget(2, pk='email_template'),
+    'api/notifications/^email-templates/(?P<pk>[^/.]+)/preview/$': Budget(1, pk='email_template', status=405),
+    'api/notifications/^$': Budget(1),
+    'api/support/api/^tickets/$': Budget(4),
+    'api/support/api/^tickets/assigned_to_me/$': Budget(3),
+    'api/support/api/^tickets/my_tickets/$': Budget(3),
+    'api/support/api/^tickets/stats/$': Budget(2),
+    'api/support/api/^tickets/(?P<pk>[^/.]+)/$': Budget(5, pk='ticket'),
+    'api/support/api/^tickets/(?P<pk>[^/.]+)/add_response/$': Budget(1, pk='ticket', status=405),
+    'api/support/api/^tickets/(?P<pk>[^/.]+)/assign_to_me/$': Budget(1, pk='ticket', status=405),
+    'api/support/api/^tickets/(?P<pk>[^/.]+)/update_status/$': Budget(1, pk='ticket', status=405),
+    'api/support/api/^responses/$': Budget(4),
+    'api/support/api/^responses/(?P<pk>[^/.]+)/$': Budget(3, pk='ticket_response'),
+    'api/support/api/^attachments/$': Budget(3),
+    'api/support/api/^attachments/(?P<pk>[^/.]+)/$': Budget(2, pk='attachment'),
+    'api/support/api/^contact/$': Budget(3),
+    'api/support/api/^contact/stats/$': Budget(2),
+    'api/support/api/^contact/urgent/$': Budget(3),
+    'api/support/api/^contact/(?P<pk>[^/.]+)/$': Budget(2, pk='contact'),
+    'api/support/api/^contact/(?P<pk>[^/.]+)/convert_to_ticket/$': Budget(1, pk='contact', status=405),
+    'api/support/api/^contact/(?P<pk>[^/.]+)/mark_as_read/$': Budget(1, pk='contact', status=405),
+    'api/support/api/^contact/(?P<pk>[^/.]+)/mark_as_responded/$': Budget(1, pk='contact', status=405),
+    'api/support/api/^contact/(?P<pk>[^/.]+)/update_status/$': Budget(1, pk='contact', status=405),
+    'api/support/api/^$': Budget(1),
+    'api/referrals/^codes/$': Budget(3),
+    'api/referrals/^codes/my_code/$': Budget(2),
+    'api/referrals/^codes/referrals/$': Budget(3),
+    'api/referrals/^codes/stats/$': Budget(4),
+    'api/referrals/^codes/(?P<pk>[^/.]+)/$': Budget(2, pk='referral_code'),
+    'api/referrals/^credits/$': Budget(4),
+    'api/referrals/^credits/available/$': Budget(2),
+    'api/referrals/^credits/(?P<pk>[^/.]+)/$': Budget(3, pk='referral_credit'),
+    'api/referrals/^$': Budget(1),
+    'api/referrals/track/': Budget(1, status=405),
+    'api/referrals/validate/<str:code>/': Budget(3, code='referral_code_value'),
+    'api/referrals/link/': Budget(1, status=405),
+    'api/realtime/^notifications/$': Budget(3),
+    'api/realtime/^notifications/clear_read/$': Budget(1, status=405),
+    'api/realtime/^notifications/mark_all_as_read/$': Budget(1, status=405),
+    'api/realtime/^notifications/recent/$': Budget(2),
+    'api/realtime/^notifications/unread/$': Budget(2),
+    'api/realtime/^notifications/unread_count/$': Budget(2),
+    'api/realtime/^notifications/(?P<pk>[^/.]+)/$': Budget(2, pk='realtime_notification'),
+    'api/realtime/^notifications/(?P<pk>[^/.]+)/mark_as_read/$': Budget(1, pk='realtime_notification', status=405),
+    'api/realtime/^templates/$': Budget(3),
+    'api/realtime/^templates/(?P<pk>[^/.]+)/$': Budget(2, pk='realtime_template'),
+    'api/realtime/^templates/(?P<pk>[^/.]+)/render_preview/$': Budget(1, pk='realtime_template', status=405),
+    'api/realtime/^settings/$': Budget(4),
+    'api/realtime/^settings/my_settings/$': Budget(3),
+    'api/realtime/^settings/toggle_websocket/$': Budget(1, status=405),
+    'api/realtime/^settings/update_quiet_hours/$': Budget(1, status=405),
+    'api/realtime/^settings/update_settings/$': Budget(1, status=405),
+    'api/realtime/^settings/(?P<pk>[^/.]+)/$': Budget(3, pk='realtime_settings'),
+    'api/realtime/^admin/send_admin_alert/$': Budget(1, status=405),
+    'api/realtime/^admin/send_notification/$': Budget(1, status=405),
+    'api/realtime/^admin/system_announcement/$': Budget(1, status=405),
+    'api/realtime/^$': Budget(1),
+    'demo/realtime-notifications/': Budget(0),
+    'test/': Budget(0),
+    'api/admin/^dashboard/approve_pending_songs/$': Budget(1, status=405),
+    'api/admin/^dashboard/content_stats/$': Budget(5),
+    'api/admin/^dashboard/pending_songs_list/$': Budget(2),
+    'api/admin/^dashboard/revenue_analytics/$': Budget(6),
+    'api/admin/^dashboard/stats/$': Budget(12),
+    'api/admin/^dashboard/user_growth/$': Budget(3),
+    'api/admin/^users/$': Budget(3),
+    'api/admin/^users/(?P<pk>[^/.]+)/suspend_user/$': Budget(1, pk='user', status=405),
+    'api/admin/^users/(?P<pk>[^/.]+)/verify_artist/$': Budget(1, pk='user', status=405),
+    'api/admin/^content/$': Budget(3),
+    'api/admin/^content/(?P<pk>[^/.]+)/approve_song/$': Budget(1, pk='song', status=405),
+    'api/admin/^content/(?P<pk>[^/.]+)/reject_song/$': Budget(1, pk='song', status=405),
+    'api/admin/^settings/$': Budget(3),
+    'api/admin/^settings/(?P<pk>[^/.]+)/$': Budget(2, pk='system_setting'),
+    'api/admin/^actions/$': Budget(3),
+    'api/admin/^actions/(?P<pk>[^/.]+)/$': Budget(2, pk='admin_action'),
+    'api/admin/^notifications/$': Budget(3),
+    'api/admin/^notifications/(?P<pk>[^/.]+)/$': Budget(2, pk='bulk_notification'),
+    'api/admin/^notifications/(?P<pk>[^/.]+)/send_notification/$': Budget(1, pk='bulk_notification', status=405),
+    'api/admin/^$': Budget(1),
+}
@@ -0,0 +1,303 @@
+"""
+Bulk dataset generator for the query-budget harness.
+
+``seed(scale)`` builds a realistic platform-wide dataset. At ``scale=1.0``
+that is 10k users, 100k songs and 1M notifications; every other table is
+sized relative to those. Rows are produced in batches with ``bulk_create``
+so memory stays bounded and model signals (emails, WebSocket pushes) are
+not fired.
+
+One staff user (``SeedData.admin``) also owns a full page or more of every
+per-user resource, so user-scoped list endpoints are exercised with real
+rows rather than empty querysets.
+"""
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from src.apps.admin_dashboard.models import AdminAction, BulkNotification, SystemSettings
+from src.apps.notifications import counters
+from src.apps.notifications.cache import clear_caches as clear_notification_caches
+from src.apps.notifications.models import (
+    EmailTemplate, Notification, NotificationType, UserNotificationPreference
+)
+from src.apps.payments.models import PaymentMethod, Subscription, Transaction
+from src.apps.realtime_notifications.models import (
+    NotificationTemplate, RealtimeNotification, UserNotificationSettings
+)
+from src.apps.referrals.models import ReferralCode, ReferralCredit
+from src.apps.songs.models import Album, AlbumTrack, Genre, Platform, Song, SongDistribution
+from src.apps.support.models import ContactMessage, Ticket, TicketAttachment, TicketResponse
+
+User = get_user_model()
+
+FULL_SCALE = {
+    'users': 10_000,
+    'songs': 100_000,
+    'notifications': 1_000_000,
+}
+BATCH_SIZE = 5000
+# Rows of each per-user resource owned by the admin; larger than PAGE_SIZE
+# so paginated endpoints render a full page.
+OWNED_ROWS = 25
+
+GENRES = ['Afrobeats', 'Hip Hop', 'Gospel', 'Highlife', 'R&B', 'Pop', 'Jazz', 'Amapiano']
+PLATFORMS = ['Spotify', 'Apple Music', 'Audiomack', 'Boomplay', 'YouTube Music', 'Deezer']
+
+
+@dataclass
+class SeedData:
+    admin: object
+    counts: dict = field(default_factory=dict)
+    sample_ids: dict = field(default_factory=dict)
+
+
+def _batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _bulk(model, rows):
+    total = 0
+    for chunk in _batched(rows):
+        model.objects.bulk_create(chunk)
+        total += len(chunk)
+    return total
+
+
+def _scaled(name, scale, minimum):
+    return max(minimum, int(FULL_SCALE[name] * scale))
+
+
+def seed(scale=1.0, seed_value=1234, log=None):
+    """Populate the database and return a ``SeedData`` describing it."""
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    log = log or (lambda message: None)
+    counts = {}
+
+    n_users = _scaled('users', scale, OWNED_ROWS * 2)
+    n_songs = _scaled('songs', scale, OWNED_ROWS * 4)
+    n_notifications = _scaled('notifications', scale, OWNED_ROWS * 8)
+
+    password = make_password('Perfpass123!')
+    # bulk_create skips the registration signals (welcome emails, admin alerts)
+    User.objects.bulk_create([User(
+        email='perf-admin@example.com', username='perf-admin', first_name='Perf', last_name='Admin',
+        password=password, is_staff=True, is_superuser=True, role='admin', is_verified=True,
+    )])
+    admin = User.objects.get(email='perf-admin@example.com')
+
+    log(f'Seeding {n_users} users')
+    roles = ['user', 'user', 'artist']
+    tiers = ['free', 'free', 'bronze', 'silver', 'gold', 'platinum']
+    counts['users'] = _bulk(User, (
+        User(
+            email=f'perf-user-{i}@example.com', username=f'perf-user-{i}',
+            first_name='Perf', last_name=f'User{i}', password=password,
+            role=rng.choice(roles), subscription=rng.choice(tiers),
+            is_artist_verified=rng.random() < 0.2,
+        )
+        for i in range(n_users - 1)
+    )) + 1
+    user_ids = list(User.objects.values_list('id', flat=True))
+    owners = [admin.id] * OWNED_ROWS + user_ids
+
+    def owner(i):
+        return owners[i] if i < len(owners) else rng.choice(user_ids)
+
+    genres = Genre.objects.bulk_create([Genre(name=name) for name in GENRES])
+    platforms = Platform.objects.bulk_create([Platform(name=name) for name in PLATFORMS])
+
+    log(f'Seeding {n_songs} songs')
+    statuses = ['draft', 'pending', 'approved', 'distributed', 'rejected']
+    counts['songs'] = _bulk(Song, (
+        Song(
+            title=f'Track {i}', artist_id=owner(i), genre=rng.choice(genres),
+            status=rng.choice(statuses), duration=rng.randint(90, 360),
+            total_streams=rng.randint(0, 100_000), total_revenue=Decimal(rng.randint(0, 50_000)),
+            release_date=(now + timedelta(days=rng.randint(-365, 60))).date(),
+        )
+        for i in range(n_songs)
+    ))
+    admin_songs = list(Song.objects.filter(artist=admin).values_list('id', flat=True)[:OWNED_ROWS])
+    counts['song_distributions'] = _bulk(SongDistribution, (
+        SongDistribution(song_id=song_id, platform=platform, status='live')
+        for song_id in admin_songs for platform in platforms[:3]
+    ))
+
+    albums = Album.objects.bulk_create([
+        Album(
+            title=f'Album {i}', artist_id=owner(i), release_type='album', number_of_tracks=8,
+            release_date=(now + timedelta(days=30 + i)).date(),
+            status='scheduled' if i % 3 == 0 else 'draft',
+        )
+        for i in range(max(OWNED_ROWS, n_users // 10))
+    ])
+    admin_albums = [album for album in albums if album.artist_id == admin.id]
+    counts['album_tracks'] = _bulk(AlbumTrack, (
+        AlbumTrack(album=album, song_id=song_id, track_number=n + 1)
+        for album in admin_albums[:5] for n, song_id in enumerate(admin_songs[:8])
+    ))
+
+    log(f'Seeding {n_notifications} notifications')
+    notification_types = NotificationType.objects.bulk_create([
+        NotificationType(name=f'perf_{category}', category=category)
+        for category in ('song', 'payment', 'admin', 'system', 'account')
+    ])
+    notification_statuses = ['pending', 'sent', 'sent', 'read']
+    counts['notifications'] = _bulk(Notification, (
+        Notification(
+            notification_type=notification_types[i % len(notification_types)],
+            recipient_id=owner(i % len(owners)) if i < OWNED_ROWS * 8 else rng.choice(user_ids),
+            title=f'Notification {i}', message='Your release status changed.',
+            status=rng.choice(notification_statuses),
+        )
+        for i in range(n_notifications)
+    ))
+    counts['realtime_notifications'] = _bulk(RealtimeNotification, (
+        RealtimeNotification(
+            recipient_id=owner(i), sender_id=admin.id, notification_type='system_announcement',
+            title=f'Realtime {i}', message='Heads up.', status=rng.choice(['sent', 'delivered', 'read']),
+        )
+        for i in range(max(OWNED_ROWS * 2, n_notifications // 10))
+    ))
+    UserNotificationPreference.objects.bulk_create([
+        UserNotificationPreference(user=admin, notification_type=notification_type)
+        for notification_type in notification_types
+    ])
+    # The type registry and preference caches are filled through signals
+    clear_notification_caches()
+    # Badge counters as a running site keeps them; bulk_create skipped the counting signals
+    for stream in (counters.NOTIFICATIONS, counters.REALTIME):
+        for chunk in _batched(user_ids, 500):
+            counters.recount_unread(chunk, stream)
+    UserNotificationSettings.objects.create(user=admin)
+    NotificationTemplate.objects.bulk_create([
+        NotificationTemplate(
+            name=f'perf_template_{i}', notification_type='system_announcement',
+            title_template='Hello {{ user.first_name }}', message_template='Update {{ n }}',
+        )
+        for i in range(OWNED_ROWS)
+    ])
+    EmailTemplate.objects.bulk_create([
+        EmailTemplate(
+            name=f'perf_email_{i}', template_type='transactional', subject_template='Hi {{ name }}',
+            html_template='<p>Hello {{ name }}</p>', text_template='Hello {{ name }}',
+        )
+        for i in range(OWNED_ROWS)
+    ])
+
+    log('Seeding payments and referrals')
+    methods = PaymentMethod.objects.bulk_create([
+        PaymentMethod(user_id=owner(i), payment_type='card', card_brand='visa', card_last_four='4081')
+        for i in range(max(OWNED_ROWS, n_users // 5))
+    ])
+    # The admin's subscriptions are yearly so the album endpoints (IsYearlySubscriber) let them in
+    subscriptions = _bulk(Subscription, (
+        Subscription(
+            user_id=owner(i), subscription_type='yearly' if owner(i) == admin.id else rng.choice(['pay_per_song', 'yearly']),
+            amount=Decimal('5000.00'), song_credits=rng.randint(0, 5),
+        )
+        for i in range(n_users)
+    ))
+    counts['subscriptions'] = subscriptions
+    counts['transactions'] = _bulk(Transaction, (
+        Transaction(
+            user_id=owner(i % len(owners)), transaction_type=rng.choice(['subscription', 'credit_purchase']),
+            status=rng.choice(['success', 'success', 'pending', 'failed']),
+            amount=Decimal('5000.00'), paystack_reference=f'perf-{uuid.uuid4().hex}',
+            payment_method=methods[0] if i < OWNED_ROWS else None, channel='card',
+        )
+        for i in range(n_users * 2)
+    ))
+    ReferralCode.objects.bulk_create([
+        ReferralCode(user_id=user_id, code=f'P{i:07d}') for i, user_id in enumerate(user_ids)
+    ])
+    counts['referral_credits'] = _bulk(ReferralCredit, (
+        ReferralCredit(user_id=owner(i), amount=1, status=rng.choice(['available', 'used']))
+        for i in range(max(OWNED_ROWS * 2, n_users // 2))
+    ))
+
+    log('Seeding support and admin data')
+    Ticket.objects.bulk_create([
+        Ticket(
+            ticket_id=f'TKT-P{i:05d}', title=f'Ticket {i}', description='Upload stuck',
+            author_id=owner(i), assignee=admin if i % 2 else None,
+        )
+        for i in range(max(OWNED_ROWS * 2, n_users // 10))
+    ])
+    admin_tickets = list(Ticket.objects.filter(author=admin)[:OWNED_ROWS])
+    TicketResponse.objects.bulk_create([
+        TicketResponse(ticket=ticket, author=admin, message='Looking into it')
+        for ticket in admin_tickets
+    ])
+    TicketAttachment.objects.bulk_create([
+        TicketAttachment(
+            ticket=ticket, file=f'ticket_files/perf-{ticket.pk}.pdf', filename=f'perf-{ticket.pk}.pdf',
+            file_size=1024, uploaded_by=admin,
+        )
+        for ticket in admin_tickets
+    ])
+    ContactMessage.objects.bulk_create([
+        ContactMessage(
+            name='Perf Contact', email=f'contact-{i}@example.com', subject=f'Question {i}',
+            message='How do payouts work?', priority='urgent' if i % 5 == 0 else 'medium',
+            user_id=owner(i) if i % 2 else None,
+        )
+        for i in range(max(OWNED_ROWS * 2, n_users // 10))
+    ])
+    AdminAction.objects.bulk_create([
+        AdminAction(
+            admin_user=admin, action_type='song_approve', target_model='Song',
+            target_id=str(admin_songs[i % len(admin_songs)]), description='Approved',
+        )
+        for i in range(OWNED_ROWS * 2)
+    ])
+    SystemSettings.objects.bulk_create([
+        SystemSettings(key=f'perf_setting_{i}', value='1', setting_type='upload_limit', created_by=admin)
+        for i in range(OWNED_ROWS)
+    ])
+    BulkNotification.objects.bulk_create([
+        BulkNotification(
+            title=f'Bulk {i}', message='Maintenance window', recipient_type='all', created_by=admin,
+        )
+        for i in range(OWNED_ROWS)
+    ])
+
+    sample_ids = {
+        'song': admin_songs[0],
+        'album': admin_albums[0].pk,
+        'album_track': AlbumTrack.objects.filter(album__artist=admin).values_list('pk', flat=True).first(),
+        'notification': Notification.objects.filter(recipient=admin).values_list('pk', flat=True).first(),
+        'notification_type': notification_types[0].pk,
+        'email_template': EmailTemplate.objects.values_list('pk', flat=True).first(),
+        'payment_method': methods[0].pk,
+        'ticket': admin_tickets[0].pk,
+        'ticket_response': TicketResponse.objects.filter(ticket=admin_tickets[0]).values_list('pk', flat=True).first(),
+        'preference': UserNotificationPreference.objects.filter(user=admin).values_list('pk', flat=True).first(),
+        'contact': ContactMessage.objects.values_list('pk', flat=True).first(),
+        'referral_code': ReferralCode.objects.get(user=admin).pk,
+        'referral_code_value': ReferralCode.objects.get(user=admin).code,
+        'referral_credit': ReferralCredit.objects.filter(user=admin).values_list('pk', flat=True).first(),
+        'realtime_notification': RealtimeNotification.objects.filter(recipient=admin).values_list('pk', flat=True).first(),
+        'realtime_template': NotificationTemplate.objects.values_list('pk', flat=True).first(),
+        'realtime_settings': UserNotificationSettings.objects.get(user=admin).pk,
+        'user': user_ids[-1],
+        'system_setting': SystemSettings.objects.values_list('pk', flat=True).first(),
+        'admin_action': AdminAction.objects.values_list('pk', flat=True).first(),
+        'bulk_notification': BulkNotification.objects.values_list('pk', flat=True).first(),
+        'attachment': TicketAttachment.objects.values_list('pk', flat=True).first(),
+    }
+    return SeedData(admin=admin, counts=counts, sample_ids=sample_ids)
@@ -0,0 +1,88 @@
+"""
+Query-budget harness.
+
+Walks every pattern in ROOT_URLCONF, fills path parameters from the seeded
+dataset, issues a GET as the seeded admin and records the number of SQL
+queries and the wall time of each request.
+"""
+import json
+import re
+import time
+from dataclasses import asdict, dataclass
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+
+_REGEX_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+_PATH_CONVERTER = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+@dataclass
+class Measurement:
+    route: str
+    url: str
+    status: int
+    queries: int
+    seconds: float
+    budget: int = None
+    max_seconds: float = None
+    expected_status: int = 200
+
+    @property
+    def over_budget(self):
+        if self.budget is not None and self.queries > self.budget:
+            return True
+        return self.max_seconds is not None and self.seconds > self.max_seconds
+
+    @property
+    def unexpected_status(self):
+        return self.status != self.expected_status
+
+
+def iter_routes(patterns=None, prefix=''):
+    """Yield the full route string of every URL pattern in the project."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for entry in patterns:
+        route = prefix + str(entry.pattern)
+        if isinstance(entry, URLResolver):
+            yield from iter_routes(entry.url_patterns, route)
+        elif isinstance(entry, URLPattern):
+            yield route
+
+
+def fill_route(route, kwargs):
+    """Turn a route string (path() or router regex) into a concrete URL."""
+    url = _REGEX_GROUP.sub(lambda m: str(kwargs[m.group(1)]), route)
+    url = _PATH_CONVERTER.sub(lambda m: str(kwargs[m.group(1)]), url)
+    return '/' + url.replace('^', '').replace('$', '')
+
+
+def measure(client, route, url):
+    with CaptureQueriesContext(connection) as ctx:
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - start
+    return Measurement(route=route, url=url, status=response.status_code, queries=len(ctx), seconds=elapsed)
+
+
+def write_report(measurements, path):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(
+            [dict(asdict(m), over_budget=m.over_budget, unexpected_status=m.unexpected_status) for m in measurements],
+            fh, indent=2,
+        )
+
+
+def format_table(measurements):
+    rows = [f"{'queries':>7} {'budget':>6} {'ms':>8}  {'status':>6}  route"]
+    for m in sorted(measurements, key=lambda m: -m.queries):
+        flag = '  OVER' if m.over_budget else ''
+        if m.unexpected_status:
+            flag += f'  expected {m.expected_status}'
+        rows.append(
+            f"{m.queries:>7} {m.budget if m.budget is not None else '-':>6} "
+            f"{m.seconds * 1000:>8.1f}  {m.status:>6}  {m.route}{flag}"
+        )
+    return '\n'.join(rows)
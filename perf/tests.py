@@ -0,0 +1,79 @@
+import os
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from loadtests.stubs import start_stubs
+
+from .budgets import BUDGETS, EXCLUDED_PREFIXES
+from .factories import seed
+from .harness import fill_route, format_table, iter_routes, measure, write_report
+
+# Fraction of the full dataset (10k users / 100k songs / 1M notifications).
+# CI runs a small slice; set PERF_SCALE=1 locally for the full dataset and
+# DATABASE_URL to run against Postgres.
+SCALE = float(os.environ.get('PERF_SCALE', '0.005'))
+REPORT_PATH = os.environ.get('PERF_REPORT')
+
+
+def harness_routes():
+    return [route for route in iter_routes() if not route.startswith(EXCLUDED_PREFIXES)
+            and '<format>' not in route and '(?P<format>' not in route]
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    PAYSTACK_SECRET_KEY='sk_test_perf',
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Paystack-backed GETs (the bank list) are answered by the load-test stub
+        cls.stubs = start_stubs()
+        cls.stub_settings = override_settings(PAYSTACK_BASE_URL=f'{cls.stubs.base_url}/paystack')
+        cls.stub_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.stub_settings.disable()
+        cls.stubs.shutdown()
+        cls.stubs.server_close()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed(scale=SCALE)
+
+    def setUp(self):
+        self.client = APIClient(raise_request_exception=False)
+        token = RefreshToken.for_user(self.data.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_every_route_has_a_budget(self):
+        missing = [route for route in harness_routes() if route not in BUDGETS]
+        self.assertEqual(missing, [], 'Declare a budget in perf/budgets.py for new routes')
+        stale = [route for route in BUDGETS if route not in harness_routes()]
+        self.assertEqual(stale, [], 'Remove budgets for routes that no longer exist')
+
+    def test_endpoints_within_query_budget(self):
+        measurements = []
+        for route in harness_routes():
+            budget = BUDGETS.get(route)
+            if budget is None:
+                continue
+            url = fill_route(route, budget.url_kwargs(self.data.sample_ids))
+            result = measure(self.client, route, url)
+            result.budget = budget.queries
+            result.max_seconds = budget.max_seconds
+            result.expected_status = budget.status
+            measurements.append(result)
+
+        if REPORT_PATH:
+            write_report(measurements, REPORT_PATH)
+        # An error page is cheap, so a budget only means something for the intended response
+        wrong_status = [m for m in measurements if m.unexpected_status]
+        self.assertEqual(wrong_status, [], '\n' + format_table(wrong_status))
+        over = [m for m in measurements if m.over_budget]
+        self.assertEqual(over, [], '\n' + format_table(over))
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Max, Sum, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 
@@ -28,10 +28,23 @@ class UserOverviewSerializer(serializers.ModelSerializer):
             'last_activity', 'date_joined', 'last_login'
         ]
     
+    @staticmethod
+    def annotate_queryset(queryset):
+        """Annotate the per-user song figures so listing users costs one query"""
+        return queryset.annotate(
+            song_count=Count('songs'),
+            song_revenue=Sum('songs__total_revenue'),
+            last_song_at=Max('songs__created_at'),
+        )
+    
     def get_total_songs(self, obj):
+        if hasattr(obj, 'song_count'):
+            return obj.song_count
         return obj.songs.count()
     
     def get_total_revenue(self, obj):
+        if hasattr(obj, 'song_revenue'):
+            return obj.song_revenue or 0
         return obj.songs.aggregate(
             total=Sum('total_revenue')
         )['total'] or 0
@@ -48,6 +61,8 @@ class UserOverviewSerializer(serializers.ModelSerializer):
     
     def get_last_activity(self, obj):
         # Get the most recent activity (song upload, login, etc.)
+        if hasattr(obj, 'last_song_at'):
+            return obj.last_song_at or obj.last_login
         last_song = obj.songs.order_by('-created_at').first()
         if last_song:
             return last_song.created_at
@@ -188,7 +203,8 @@ class RevenueAnalyticsSerializer(serializers.Serializer):
         
         # Top earning artists
         top_artists = User.objects.annotate(
-            total_earnings=Sum('songs__total_revenue')
+            total_earnings=Sum('songs__total_revenue'),
+            song_count=Count('songs')
         ).filter(total_earnings__gt=0).order_by('-total_earnings')[:10]
         
         top_earning_artists = [
@@ -197,20 +213,18 @@ class RevenueAnalyticsSerializer(serializers.Serializer):
                 'name': f"{artist.first_name} {artist.last_name}".strip() or artist.username,
                 'email': artist.email,
                 'total_earnings': float(artist.total_earnings or 0),
-                'song_count': artist.songs.count()
+                'song_count': artist.song_count
             }
             for artist in top_artists
         ]
         
         # Revenue by subscription plan
-        revenue_by_plan = {}
-        for plan in ['bronze', 'gold', 'platinum']:
-            plan_revenue = User.objects.filter(
-                subscription=plan
-            ).aggregate(
-                total=Sum('songs__total_revenue')
-            )['total'] or 0
-            revenue_by_plan[plan] = float(plan_revenue)
+        plans = ['bronze', 'gold', 'platinum']
+        plan_totals = User.objects.aggregate(**{
+            plan: Sum('songs__total_revenue', filter=Q(subscription=plan))
+            for plan in plans
+        })
+        revenue_by_plan = {plan: float(plan_totals[plan] or 0) for plan in plans}
         
         return {
             'total_revenue': total_revenue,
@@ -254,3 +268,25 @@ class BulkNotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = BulkNotification
         fields = '__all__'
+        read_only_fields = [
+            'status', 'sent_at', 'total_recipients', 'successful_sends', 'failed_sends', 'created_by'
+        ]
+    
+    def validate(self, data):
+        recipient_type = data.get('recipient_type', getattr(self.instance, 'recipient_type', None))
+        recipient_filter = data.get('recipient_filter', getattr(self.instance, 'recipient_filter', None)) or {}
+        
+        if recipient_type == 'specific_plan':
+            plans = recipient_filter.get('plans') or [recipient_filter.get('plan')]
+            valid_plans = {choice for choice, _ in User.SUBSCRIPTION_CHOICES}
+            if not all(plan in valid_plans for plan in plans):
+                raise serializers.ValidationError({
+                    'recipient_filter': f"'plan' or 'plans' must be one of: {', '.join(sorted(valid_plans))}"
+                })
+        elif recipient_type == 'custom':
+            if not (recipient_filter.get('user_ids') or recipient_filter.get('emails')):
+                raise serializers.ValidationError({
+                    'recipient_filter': "Custom recipients need 'user_ids' or 'emails'"
+                })
+        
+        return data
@@ -0,0 +1,195 @@
+"""
+Bulk notification fan-out.
+
+send_bulk_notification streams the recipient ids of a BulkNotification and
+queues one send_bulk_notification_chunk per BULK_NOTIFICATION_CHUNK_SIZE users.
+Each chunk bulk-creates its Notification rows, adds its count to the
+BulkNotification and pushes the rows over WebSocket in one pass. Whichever
+chunk brings successful_sends + failed_sends up to total_recipients marks the
+BulkNotification as sent. After each chunk the creator's sockets subscribed
+to the ``jobs`` topic get the progress so far.
+"""
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+
+from src.apps.notifications.counters import count_new_notifications
+from src.apps.notifications.models import Notification, NotificationType
+from src.apps.notifications.realtime import send_notifications_to_users
+from src.apps.realtime_notifications.publisher import publish_job_progress
+from .models import BulkNotification
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+ANNOUNCEMENT_TYPE = 'admin_announcement'
+
+
+def get_recipient_queryset(bulk_notification):
+    """Active users targeted by a BulkNotification's recipient_type and recipient_filter"""
+    users = User.objects.filter(is_active=True)
+    recipient_filter = bulk_notification.recipient_filter or {}
+    recipient_type = bulk_notification.recipient_type
+
+    if recipient_type == 'all':
+        return users
+    if recipient_type == 'artists':
+        return users.filter(role='artist')
+    if recipient_type == 'subscribers':
+        return users.exclude(subscription='free')
+    if recipient_type == 'free_users':
+        return users.filter(subscription='free')
+    if recipient_type == 'specific_plan':
+        plans = recipient_filter.get('plans') or [recipient_filter.get('plan')]
+        return users.filter(subscription__in=plans)
+    if recipient_type == 'custom':
+        return users.filter(
+            Q(pk__in=recipient_filter.get('user_ids') or [])
+            | Q(email__in=recipient_filter.get('emails') or [])
+        )
+    return users.none()
+
+
+def get_announcement_type():
+    notification_type, _ = NotificationType.objects.get_or_create(
+        name=ANNOUNCEMENT_TYPE,
+        defaults={
+            'category': 'system',
+            'description': 'Announcements sent from the admin dashboard',
+            'email_subject_template': '{{ title }}',
+        }
+    )
+    return notification_type
+
+
+def _mark_complete(bulk_id):
+    """Flip a sending BulkNotification to sent once every recipient is accounted for"""
+    return BulkNotification.objects.filter(
+        pk=bulk_id,
+        status='sending',
+        total_recipients__lte=F('successful_sends') + F('failed_sends'),
+    ).update(status='sent', sent_at=timezone.now())
+
+
+def _publish_progress(bulk_id):
+    """Push the bulk send's progress to the admin who created it (the hub's ``jobs`` topic)"""
+    progress = BulkNotification.objects.filter(pk=bulk_id).values(
+        'created_by_id', 'status', 'total_recipients', 'successful_sends', 'failed_sends'
+    ).first()
+    if progress and progress['created_by_id']:
+        publish_job_progress(
+            progress['created_by_id'],
+            str(bulk_id),
+            kind='bulk_notification',
+            status=progress['status'],
+            done=progress['successful_sends'] + progress['failed_sends'],
+            total=progress['total_recipients'],
+        )
+
+
+@shared_task
+def send_bulk_notification(bulk_id):
+    """
+    Resolve recipients and queue the chunk tasks. Only a draft or due
+    scheduled notification is claimed, so duplicate deliveries of this task
+    (ETA plus the scheduled sweep) send once.
+    """
+    now = timezone.now()
+    claimed = BulkNotification.objects.filter(
+        Q(scheduled_at__isnull=True) | Q(scheduled_at__lte=now),
+        pk=bulk_id,
+        status__in=['draft', 'scheduled'],
+    ).update(status='sending', successful_sends=0, failed_sends=0)
+    if not claimed:
+        logger.info(f"Bulk notification {bulk_id} is not due or already sent, skipping")
+        return 0
+
+    bulk_notification = BulkNotification.objects.get(pk=bulk_id)
+    recipients = get_recipient_queryset(bulk_notification)
+    total = recipients.count()
+    BulkNotification.objects.filter(pk=bulk_id).update(total_recipients=total)
+
+    chunk_size = settings.BULK_NOTIFICATION_CHUNK_SIZE
+    queued = 0
+    chunk = []
+    try:
+        for user_id in recipients.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) == chunk_size:
+                send_bulk_notification_chunk.delay(str(bulk_id), chunk)
+                queued += len(chunk)
+                chunk = []
+        if chunk:
+            send_bulk_notification_chunk.delay(str(bulk_id), chunk)
+            queued += len(chunk)
+    except Exception as exc:
+        logger.error(f"Failed to fan out bulk notification {bulk_id} after {queued} recipients: {str(exc)}")
+        BulkNotification.objects.filter(pk=bulk_id).update(status='failed', total_recipients=queued)
+        raise
+
+    # Users can join or leave between the count and the stream
+    if queued != total:
+        BulkNotification.objects.filter(pk=bulk_id).update(total_recipients=queued)
+    _mark_complete(bulk_id)
+
+    logger.info(f"Bulk notification {bulk_id} queued for {queued} recipients")
+    return queued
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def send_bulk_notification_chunk(self, bulk_id, user_ids):
+    """Create one chunk of a bulk notification and push it to connected users"""
+    bulk_notification = BulkNotification.objects.get(pk=bulk_id)
+    notification_type = get_announcement_type()
+    notifications = [
+        Notification(
+            notification_type=notification_type,
+            recipient_id=user_id,
+            title=bulk_notification.title,
+            message=bulk_notification.message,
+            context_data={'bulk_notification_id': str(bulk_id)},
+            send_email=bulk_notification.send_email,
+            send_push=bulk_notification.send_push,
+            send_in_app=bulk_notification.send_in_app,
+        )
+        for user_id in user_ids
+    ]
+
+    try:
+        # Rows and progress commit together, so a retried chunk never double counts
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+            count_new_notifications(notifications)
+            BulkNotification.objects.filter(pk=bulk_id).update(
+                successful_sends=F('successful_sends') + len(notifications)
+            )
+    except DatabaseError as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        logger.error(f"Bulk notification {bulk_id} chunk of {len(user_ids)} failed: {str(exc)}")
+        BulkNotification.objects.filter(pk=bulk_id).update(failed_sends=F('failed_sends') + len(user_ids))
+        _mark_complete(bulk_id)
+        _publish_progress(bulk_id)
+        return 0
+
+    if bulk_notification.send_in_app:
+        send_notifications_to_users(notifications, notification_type)
+    _mark_complete(bulk_id)
+    _publish_progress(bulk_id)
+    return len(notifications)
+
+
+@shared_task
+def send_scheduled_bulk_notifications():
+    """Periodic sweep for scheduled bulk notifications whose ETA task was lost"""
+    due_ids = BulkNotification.objects.filter(
+        status='scheduled',
+        scheduled_at__lte=timezone.now(),
+    ).values_list('pk', flat=True)
+    for bulk_id in due_ids:
+        send_bulk_notification.delay(str(bulk_id))
+    return len(due_ids)
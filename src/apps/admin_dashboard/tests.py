@@ -0,0 +1,121 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from music_distribution_backend.celery import app as celery_app
+from src.apps.admin_dashboard.models import BulkNotification
+from src.apps.admin_dashboard.tasks import send_scheduled_bulk_notifications
+from src.apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+@override_settings(
+    BULK_NOTIFICATION_CHUNK_SIZE=10,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class BulkNotificationFanOutTests(TestCase):
+    def setUp(self):
+        conf = celery_app.conf
+        self.addCleanup(conf.update, task_always_eager=conf.task_always_eager,
+                        task_eager_propagates=conf.task_eager_propagates)
+        conf.update(task_always_eager=True, task_eager_propagates=True)
+
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([
+            User(
+                email=f'fan{i}@example.com', username=f'fan{i}', first_name='Fan', last_name=str(i),
+                role='artist' if i % 3 == 0 else 'user', subscription='gold' if i % 5 == 0 else 'free',
+            )
+            for i in range(25)
+        ] + [
+            User(email='boss@example.com', username='boss', first_name='Boss', last_name='Admin',
+                 role='admin', is_staff=True),
+        ])
+        self.admin = User.objects.get(email='boss@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_bulk(self, **kwargs):
+        fields = {'title': 'Maintenance', 'message': 'Back soon', 'recipient_type': 'all', 'created_by': self.admin}
+        fields.update(kwargs)
+        return BulkNotification.objects.create(**fields)
+
+    def send(self, bulk):
+        return self.client.post(f'/api/admin/notifications/{bulk.pk}/send_notification/')
+
+    def test_all_users_fan_out_in_chunks(self):
+        bulk = self.create_bulk()
+
+        with mock.patch('src.apps.admin_dashboard.tasks.send_notifications_to_users') as push:
+            response = self.send(bulk)
+
+        self.assertEqual(response.status_code, 202)
+        bulk.refresh_from_db()
+        self.assertEqual(bulk.status, 'sent')
+        self.assertEqual(bulk.total_recipients, 26)
+        self.assertEqual(bulk.successful_sends, 26)
+        self.assertIsNotNone(bulk.sent_at)
+        self.assertEqual(Notification.objects.filter(context_data__bulk_notification_id=str(bulk.pk)).count(), 26)
+        self.assertEqual([len(call.args[0]) for call in push.call_args_list], [10, 10, 6])
+
+        self.assertEqual(self.send(bulk).status_code, 400)
+
+    def test_specific_plan_and_custom_recipients(self):
+        plan = self.create_bulk(recipient_type='specific_plan', recipient_filter={'plan': 'gold'})
+        custom = self.create_bulk(
+            recipient_type='custom', recipient_filter={'emails': ['fan1@example.com'], 'user_ids': [self.admin.pk]}
+        )
+
+        self.send(plan)
+        self.send(custom)
+
+        plan.refresh_from_db()
+        custom.refresh_from_db()
+        self.assertEqual(plan.successful_sends, 5)
+        self.assertEqual(custom.successful_sends, 2)
+
+    def test_invalid_plan_filter_is_rejected(self):
+        response = self.client.post('/api/admin/notifications/', {
+            'title': 'Upgrade', 'message': 'Hi', 'recipient_type': 'specific_plan', 'recipient_filter': {'plan': 'diamond'},
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipient_filter', response.data)
+
+    def test_scheduled_notification_waits_until_due(self):
+        bulk = self.create_bulk(recipient_type='artists', scheduled_at=timezone.now() + timedelta(hours=1))
+
+        response = self.send(bulk)
+
+        self.assertEqual(response.status_code, 202)
+        bulk.refresh_from_db()
+        self.assertEqual(bulk.status, 'scheduled')
+        self.assertFalse(Notification.objects.exists())
+
+        BulkNotification.objects.filter(pk=bulk.pk).update(scheduled_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(send_scheduled_bulk_notifications(), 1)
+
+        bulk.refresh_from_db()
+        self.assertEqual(bulk.status, 'sent')
+        self.assertEqual(bulk.successful_sends, 9)
+
+    def test_connected_users_receive_websocket_events(self):
+        recipient = User.objects.get(email='fan1@example.com')
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'notifications_{recipient.pk}', channel)
+        bulk = self.create_bulk(recipient_type='custom', recipient_filter={'user_ids': [recipient.pk]})
+
+        self.send(bulk)
+
+        event = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(event['type'], 'notification_message')
+        self.assertEqual(event['notification']['title'], 'Maintenance')
+        self.assertEqual(event['notification']['notification_type']['name'], 'admin_announcement')
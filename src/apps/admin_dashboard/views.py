@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.db.models import Q, Count, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import timedelta
 from django.http import JsonResponse
@@ -13,8 +14,10 @@ from .serializers import (
     RevenueAnalyticsSerializer, SystemSettingsSerializer, AdminActionSerializer,
     BulkNotificationSerializer
 )
+from .tasks import send_bulk_notification
 from src.apps.songs.models import Song
 from src.apps.notifications.models import Notification
+from src.apps.realtime_notifications.presence import get_presence
 
 User = get_user_model()
 
@@ -112,7 +115,9 @@ class AdminDashboardViewSet(viewsets.ViewSet):
                 'total_revenue': total_revenue,
                 'recent_uploads': recent_uploads,
                 'recent_registrations': new_users_today,
-                'open_tickets': 0  # Add this if you have a tickets model later
+                'open_tickets': 0,  # Add this if you have a tickets model later
+                # Users with a notification socket open; None if presence is unavailable
+                'online_users': get_presence().online_count(),
             })
             
         except Exception as e:
@@ -181,7 +186,7 @@ class AdminDashboardViewSet(viewsets.ViewSet):
     def pending_songs_list(self, request):
         """Get list of pending songs for approval"""
         try:
-            pending_songs = Song.objects.filter(status='pending').select_related('artist')
+            pending_songs = Song.objects.filter(status='pending').select_related('artist', 'genre')
             
             songs_data = []
             for song in pending_songs:
@@ -220,16 +225,27 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=days)
         
-        # Generate daily user counts
+        # One grouped query for the daily signups plus one for the baseline,
+        # instead of two counts per day
+        daily_counts = dict(
+            User.objects.filter(date_joined__date__gte=start_date, date_joined__date__lte=end_date)
+            .annotate(day=TruncDate('date_joined'))
+            .values('day')
+            .annotate(count=Count('id'))
+            .values_list('day', 'count')
+        )
+        running_total = User.objects.filter(date_joined__date__lt=start_date).count()
+        
         growth_data = []
         current_date = start_date
         
         while current_date <= end_date:
-            users_count = User.objects.filter(date_joined__date=current_date).count()
+            users_count = daily_counts.get(current_date, 0)
+            running_total += users_count
             growth_data.append({
                 'date': current_date.isoformat(),
                 'new_users': users_count,
-                'total_users': User.objects.filter(date_joined__date__lte=current_date).count()
+                'total_users': running_total
             })
             current_date += timedelta(days=1)
         
@@ -292,7 +308,7 @@ class UserManagementViewSet(viewsets.ViewSet):
         end = start + page_size
         
         total_count = queryset.count()
-        users = queryset[start:end]
+        users = UserOverviewSerializer.annotate_queryset(queryset)[start:end]
         
         serializer = UserOverviewSerializer(users, many=True)
         
@@ -463,7 +479,7 @@ class ContentManagementViewSet(viewsets.ViewSet):
 
 class SystemSettingsViewSet(viewsets.ModelViewSet):
     """System settings management"""
-    queryset = SystemSettings.objects.all()
+    queryset = SystemSettings.objects.select_related('created_by', 'updated_by')
     serializer_class = SystemSettingsSerializer
     permission_classes = [IsAdminOrStaff]
     
@@ -503,7 +519,7 @@ class AdminActionsViewSet(viewsets.ReadOnlyModelViewSet):
 
 class BulkNotificationViewSet(viewsets.ModelViewSet):
     """Bulk notification management"""
-    queryset = BulkNotification.objects.all()
+    queryset = BulkNotification.objects.select_related('created_by')
     serializer_class = BulkNotificationSerializer
     permission_classes = [IsAdminOrStaff]
     
@@ -512,54 +528,32 @@ class BulkNotificationViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def send_notification(self, request, pk=None):
-        """Send a bulk notification"""
-        try:
-            notification = self.get_object()
-            
-            # Calculate recipients based on type
-            if notification.recipient_type == 'all':
-                recipients = User.objects.filter(is_active=True)
-            elif notification.recipient_type == 'artists':
-                recipients = User.objects.filter(role='artist', is_active=True)
-            elif notification.recipient_type == 'subscribers':
-                recipients = User.objects.exclude(subscription='free').filter(is_active=True)
-            elif notification.recipient_type == 'free_users':
-                recipients = User.objects.filter(subscription='free', is_active=True)
-            else:
-                recipients = User.objects.none()
-            
-            notification.total_recipients = recipients.count()
-            notification.status = 'sending'
-            notification.save()
-            
-            # Create individual notifications
-            successful_sends = 0
-            failed_sends = 0
-            
-            for user in recipients:
-                try:
-                    Notification.objects.create(
-                        user=user,
-                        title=notification.title,
-                        message=notification.message,
-                        notification_type="admin_announcement"
-                    )
-                    successful_sends += 1
-                except:
-                    failed_sends += 1
-            
-            notification.successful_sends = successful_sends
-            notification.failed_sends = failed_sends
-            notification.status = 'sent'
-            notification.sent_at = timezone.now()
-            notification.save()
-            
+        """Queue a bulk notification; recipients are fanned out in Celery chunks"""
+        notification = self.get_object()
+        
+        if notification.status in ['sending', 'sent']:
+            return Response({'error': f'Notification is already {notification.status}'}, status=400)
+        
+        if notification.scheduled_at and notification.scheduled_at > timezone.now():
+            notification.status = 'scheduled'
+            notification.save(update_fields=['status', 'updated_at'])
+            send_bulk_notification.apply_async((str(notification.pk),), eta=notification.scheduled_at)
             return Response({
-                'message': 'Notification sent successfully',
-                'total_recipients': notification.total_recipients,
-                'successful_sends': successful_sends,
-                'failed_sends': failed_sends
-            })
-            
+                'message': 'Notification scheduled',
+                'status': notification.status,
+                'scheduled_at': notification.scheduled_at,
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        try:
+            send_bulk_notification.delay(str(notification.pk))
         except Exception as e:
             return Response({'error': str(e)}, status=400)
+        
+        notification.refresh_from_db()
+        return Response({
+            'message': 'Notification queued for sending',
+            'status': notification.status,
+            'total_recipients': notification.total_recipients,
+            'successful_sends': notification.successful_sends,
+            'failed_sends': notification.failed_sends,
+        }, status=status.HTTP_202_ACCEPTED)
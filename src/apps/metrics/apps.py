@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'src.apps.metrics'
+    verbose_name = 'Metrics'
+
+    def ready(self):
+        import src.apps.metrics.signals
@@ -0,0 +1,30 @@
+"""
+Instrumentation mixin for Channels consumers.
+"""
+from .instruments import WEBSOCKET_ACTIVE_CONNECTIONS, WEBSOCKET_CONNECTIONS, WEBSOCKET_MESSAGES
+
+
+class ConsumerMetricsMixin:
+    """
+    Count connects, open connections and received frames for a consumer.
+
+    Must come before the Channels consumer class in the bases so it wraps the
+    websocket_* dispatch handlers.
+    """
+
+    @property
+    def metrics_label(self):
+        return type(self).__name__
+
+    async def websocket_connect(self, message):
+        WEBSOCKET_CONNECTIONS.inc(consumer=self.metrics_label)
+        WEBSOCKET_ACTIVE_CONNECTIONS.inc(consumer=self.metrics_label)
+        await super().websocket_connect(message)
+
+    async def websocket_receive(self, message):
+        WEBSOCKET_MESSAGES.inc(consumer=self.metrics_label)
+        await super().websocket_receive(message)
+
+    async def websocket_disconnect(self, message):
+        WEBSOCKET_ACTIVE_CONNECTIONS.dec(consumer=self.metrics_label)
+        await super().websocket_disconnect(message)
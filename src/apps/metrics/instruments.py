@@ -0,0 +1,56 @@
+"""
+Metric definitions shared by the middleware, Celery hooks and consumers.
+"""
+from .registry import Counter, Gauge, Histogram
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by view',
+    ['view', 'method', 'status'],
+)
+HTTP_REQUEST_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries executed per request by view',
+    ['view', 'method'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in SQL per request by view',
+    ['view', 'method'],
+)
+
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Celery task run time',
+    ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+CELERY_TASK_RETRIES = Counter(
+    'celery_task_retries_total',
+    'Celery task retries',
+    ['task'],
+)
+CELERY_TASK_FAILURES = Counter(
+    'celery_task_failures_total',
+    'Celery tasks that raised',
+    ['task'],
+)
+
+WEBSOCKET_CONNECTIONS = Counter(
+    'websocket_connections_total',
+    'WebSocket connection attempts by consumer',
+    ['consumer'],
+)
+WEBSOCKET_ACTIVE_CONNECTIONS = Gauge(
+    'websocket_active_connections',
+    'Open WebSocket connections in this process',
+    ['consumer'],
+)
+WEBSOCKET_MESSAGES = Counter(
+    'websocket_messages_total',
+    'WebSocket frames received from clients by consumer',
+    ['consumer'],
+)
@@ -0,0 +1,53 @@
+"""
+Request instrumentation: latency per view plus SQL query count/time per
+request, collected with ``connection.execute_wrapper``.
+"""
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .instruments import HTTP_REQUEST_DB_DURATION, HTTP_REQUEST_DURATION, HTTP_REQUEST_QUERIES
+
+
+class QueryTimer:
+    """execute_wrapper callable that counts and times every SQL statement"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = _view_label(request)
+        HTTP_REQUEST_DURATION.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        HTTP_REQUEST_QUERIES.observe(timer.count, view=view, method=request.method)
+        HTTP_REQUEST_DB_DURATION.observe(timer.duration, view=view, method=request.method)
+        return response
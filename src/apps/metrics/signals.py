@@ -0,0 +1,39 @@
+"""
+Celery signal hooks recording task duration, retries and failures.
+"""
+import time
+
+from celery.signals import task_failure, task_postrun, task_prerun, task_retry
+
+from .instruments import CELERY_TASK_DURATION, CELERY_TASK_FAILURES, CELERY_TASK_RETRIES
+
+_task_started = {}
+
+
+def _task_name(sender=None, task=None):
+    task = task or sender
+    return getattr(task, 'name', None) or str(task)
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.observe(
+            time.perf_counter() - started, task=_task_name(task=task), state=state or 'UNKNOWN'
+        )
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    CELERY_TASK_RETRIES.inc(task=_task_name(sender=sender))
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    CELERY_TASK_FAILURES.inc(task=_task_name(sender=sender))
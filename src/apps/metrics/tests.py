@@ -0,0 +1,99 @@
+from asgiref.sync import async_to_sync
+from celery.signals import task_postrun, task_prerun, task_retry
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from src.apps.realtime_notifications.consumers import SystemAnnouncementConsumer
+from .instruments import (
+    CELERY_TASK_DURATION, CELERY_TASK_RETRIES, HTTP_REQUEST_DURATION, HTTP_REQUEST_QUERIES,
+    WEBSOCKET_ACTIVE_CONNECTIONS, WEBSOCKET_CONNECTIONS, WEBSOCKET_MESSAGES,
+)
+from .registry import Counter, Histogram, Registry
+
+
+class RegistryTests(SimpleTestCase):
+    def test_text_exposition_format(self):
+        registry = Registry()
+        requests = Counter('requests_total', 'Requests', ['view'], registry=registry)
+        latency = Histogram('latency_seconds', 'Latency', ['view'], buckets=(0.1, 1), registry=registry)
+        requests.inc(view='home')
+        requests.inc(2, view='home')
+        latency.observe(0.05, view='home')
+        latency.observe(0.5, view='home')
+
+        output = registry.render()
+        self.assertIn('# TYPE requests_total counter', output)
+        self.assertIn('requests_total{view="home"} 3', output)
+        self.assertIn('latency_seconds_bucket{view="home",le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{view="home",le="1"} 2', output)
+        self.assertIn('latency_seconds_bucket{view="home",le="+Inf"} 2', output)
+        self.assertIn('latency_seconds_count{view="home"} 2', output)
+
+    def test_label_mismatch_rejected(self):
+        counter = Counter('x_total', 'X', ['a'], registry=Registry())
+        with self.assertRaises(ValueError):
+            counter.inc(b='1')
+
+
+class MetricsMiddlewareTests(TestCase):
+    def test_request_latency_and_queries_recorded(self):
+        before = HTTP_REQUEST_DURATION.count(view='api_health', method='GET', status=200)
+        queries_before = HTTP_REQUEST_QUERIES.count(view='api_health', method='GET')
+        self.client.get('/api/health/')
+        self.assertEqual(HTTP_REQUEST_DURATION.count(view='api_health', method='GET', status=200), before + 1)
+        self.assertEqual(HTTP_REQUEST_QUERIES.count(view='api_health', method='GET'), queries_before + 1)
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint_renders(self):
+        self.client.get('/api/health/')
+        resp = self.client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket{view="api_health"', resp.content)
+
+    @override_settings(METRICS_AUTH_TOKEN='s3cret')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        resp = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(resp.status_code, 200)
+
+    @override_settings(METRICS_AUTH_TOKEN='', DEBUG=False)
+    def test_metrics_endpoint_needs_a_token_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+
+class CelerySignalTests(SimpleTestCase):
+    def test_task_duration_and_retries(self):
+        class FakeTask:
+            name = 'tests.fake_task'
+
+        task = FakeTask()
+        task_prerun.send(sender=task, task_id='abc', task=task)
+        task_postrun.send(sender=task, task_id='abc', task=task, state='SUCCESS')
+        task_retry.send(sender=task, request=None, reason='boom')
+
+        self.assertEqual(CELERY_TASK_DURATION.count(task='tests.fake_task', state='SUCCESS'), 1)
+        self.assertEqual(CELERY_TASK_RETRIES.value(task='tests.fake_task'), 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ConsumerMetricsTests(SimpleTestCase):
+    def test_connect_and_message_counters(self):
+        label = 'SystemAnnouncementConsumer'
+        connects = WEBSOCKET_CONNECTIONS.value(consumer=label)
+        messages = WEBSOCKET_MESSAGES.value(consumer=label)
+
+        async def run():
+            scope = {'type': 'websocket', 'path': '/ws/system-announcements/', 'headers': [], 'subprotocols': []}
+            communicator = ApplicationCommunicator(SystemAnnouncementConsumer.as_asgi(), scope)
+            await communicator.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await communicator.receive_output(1))['type'], 'websocket.accept')
+            self.assertEqual(WEBSOCKET_ACTIVE_CONNECTIONS.value(consumer=label), 1)
+            await communicator.send_input({'type': 'websocket.receive', 'text': '{}'})
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(1)
+
+        async_to_sync(run)()
+        self.assertEqual(WEBSOCKET_CONNECTIONS.value(consumer=label), connects + 1)
+        self.assertEqual(WEBSOCKET_MESSAGES.value(consumer=label), messages + 1)
+        self.assertEqual(WEBSOCKET_ACTIVE_CONNECTIONS.value(consumer=label), 0)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from .registry import REGISTRY
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics(request):
+    """
+    Expose collected metrics in the Prometheus text format. Scrapers need
+    METRICS_AUTH_TOKEN; without one the endpoint is only open when DEBUG is on
+    """
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden('Forbidden')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not constant_time_compare(supplied, token):
+            return HttpResponseForbidden('Forbidden')
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
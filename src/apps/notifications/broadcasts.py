@@ -0,0 +1,198 @@
+"""
+Platform-wide announcements.
+
+A broadcast is a single BroadcastNotification row and a single group_send to
+the ``system_announcements`` group that every notification consumer joins, so
+announcing to all users costs O(1) writes. Each user sees the broadcasts sent
+since they joined; a BroadcastReceipt is only written when they read one.
+
+Broadcasts are merged into the user's notification feed at read time:
+NotificationFeed pages the user's Notification rows and the newest
+BROADCAST_FEED_LIMIT visible broadcasts as one list ordered by
+``created_at``, and the unread count adds the unread broadcasts among those
+same BROADCAST_FEED_LIMIT to the counter.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from src.apps.realtime_notifications.publisher import ANNOUNCEMENTS_GROUP, publish
+from .models import BroadcastNotification, BroadcastReceipt, NotificationType
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+BROADCAST_TYPE = 'admin_broadcast'
+
+
+def get_broadcast_type():
+    notification_type, _ = NotificationType.objects.get_or_create(
+        name=BROADCAST_TYPE,
+        defaults={
+            'category': 'admin',
+            'description': 'Admin broadcast message',
+            'default_email_enabled': False,
+            'default_push_enabled': True,
+            'default_in_app_enabled': True,
+        }
+    )
+    return notification_type
+
+
+def serialize_broadcast(broadcast):
+    """WebSocket payload, shaped like notifications.realtime.serialize_notification"""
+    return {
+        'id': str(broadcast.id),
+        'title': broadcast.title,
+        'message': broadcast.message,
+        'priority': broadcast.priority,
+        'created_at': broadcast.created_at.isoformat(),
+        'notification_type': {
+            'name': broadcast.notification_type.name,
+            'category': broadcast.notification_type.category,
+        },
+        'is_broadcast': True,
+    }
+
+
+def create_broadcast(title, message, priority='normal', sender=None, notification_type=None,
+                     context_data=None, expires_at=None):
+    """Store one announcement and push it to every connected client once the transaction commits"""
+    broadcast = BroadcastNotification.objects.create(
+        notification_type=notification_type or get_broadcast_type(),
+        sender=sender,
+        title=title,
+        message=message,
+        priority=priority,
+        context_data=context_data or {},
+        expires_at=expires_at,
+    )
+    event = {'type': 'system_announcement', 'announcement': serialize_broadcast(broadcast)}
+    transaction.on_commit(lambda: publish([(ANNOUNCEMENTS_GROUP, event)]))
+    logger.info(f"Created broadcast {broadcast.id}")
+    return broadcast
+
+
+def visible_broadcasts(user):
+    """
+    Broadcasts ``user`` should see, annotated with their ``read_at`` (None when
+    unread). Only ``user.id`` is used, so token users work without a lookup
+    """
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user_id=user.id)
+    date_joined = User.objects.filter(pk=user.id).values('date_joined')
+    return BroadcastNotification.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        created_at__gte=Subquery(date_joined),
+    ).select_related('notification_type').annotate(
+        read_at=Subquery(receipts.values('read_at')[:1]),
+    ).order_by('-created_at')
+
+
+def unread_broadcasts(user):
+    read = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user_id=user.id, read_at__isnull=False)
+    return visible_broadcasts(user).filter(~Exists(read))
+
+
+def feed_limit():
+    return getattr(settings, 'BROADCAST_FEED_LIMIT', 20)
+
+
+def unread_broadcast_count(user):
+    """Unread broadcasts among the newest BROADCAST_FEED_LIMIT, the ones the feed can show"""
+    read_at = visible_broadcasts(user).values_list('read_at', flat=True)[:feed_limit()]
+    return sum(1 for value in read_at if value is None)
+
+
+def mark_broadcast_read(broadcast_id, user):
+    """Write the user's receipt; False if the broadcast isn't visible to them"""
+    try:
+        if not visible_broadcasts(user).filter(pk=broadcast_id).exists():
+            return False
+    except ValidationError:  # not a UUID
+        return False
+    BroadcastReceipt.objects.bulk_create(
+        [BroadcastReceipt(broadcast_id=broadcast_id, user_id=user.id, read_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['broadcast', 'user'],
+        update_fields=['read_at'],
+    )
+    return True
+
+
+def mark_all_broadcasts_read(user):
+    now = timezone.now()
+    receipts = [
+        BroadcastReceipt(broadcast_id=broadcast_id, user_id=user.id, read_at=now)
+        for broadcast_id in unread_broadcasts(user).values_list('pk', flat=True)
+    ]
+    BroadcastReceipt.objects.bulk_create(
+        receipts, update_conflicts=True, unique_fields=['broadcast', 'user'], update_fields=['read_at']
+    )
+    return len(receipts)
+
+
+class NotificationFeed:
+    """
+    A user's notifications and visible broadcasts as one sequence, newest
+    first, that Django's Paginator can slice. Only the newest ``limit``
+    broadcasts (BROADCAST_FEED_LIMIT) are merged, so they are loaded whole;
+    their positions come from a single aggregate over the notifications newer
+    than the oldest of them, and only the notifications that fall on the
+    requested page are fetched.
+    """
+
+    def __init__(self, notifications, broadcasts, limit=None):
+        limit = feed_limit() if limit is None else limit
+        self.notifications = notifications.order_by('-created_at')
+        self.broadcasts = list(broadcasts.order_by('-created_at')[:limit])
+        self._positions = None
+
+    def positions(self):
+        if self._positions is None:
+            newer = {}
+            if self.broadcasts:
+                # Notifications older than every merged broadcast never move one
+                window = self.notifications.filter(created_at__gt=self.broadcasts[-1].created_at)
+                newer = window.aggregate(**{
+                    f'b{index}': Count('pk', filter=Q(created_at__gt=broadcast.created_at))
+                    for index, broadcast in enumerate(self.broadcasts)
+                })
+            self._positions = [
+                (index + newer[f'b{index}'], broadcast) for index, broadcast in enumerate(self.broadcasts)
+            ]
+        return self._positions
+
+    def __len__(self):
+        return self.notifications.count() + len(self.broadcasts)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        positions = self.positions()
+        before = sum(1 for position, _ in positions if position < start)
+        on_page = [(position, broadcast) for position, broadcast in positions
+                   if position >= start and (stop is None or position < stop)]
+
+        offset = start - before
+        notifications = self.notifications[offset:] if stop is None else \
+            self.notifications[offset:offset + stop - start - len(on_page)]
+        notifications = iter(notifications)
+
+        items = []
+        position = start
+        while stop is None or position < stop:
+            if on_page and on_page[0][0] == position:
+                items.append(on_page.pop(0)[1])
+            else:
+                notification = next(notifications, None)
+                if notification is None:
+                    break
+                items.append(notification)
+            position += 1
+        return items
@@ -0,0 +1,255 @@
+"""
+Per-process caches for notification sending.
+
+Compiled templates are kept in an LRU keyed by ``(template id, field,
+version, updated_at)``, so editing an EmailTemplate produces a new key and the
+stale entry simply ages out. A source that only substitutes plain variables
+(``{{ user.first_name }}``, no tags or filters) compiles to a FormatTemplate,
+one ``str.format`` call per render; anything else is a Django Template.
+
+Active EmailTemplate and real-time NotificationTemplate rows (by name), the
+NotificationType registry and each user's preference overrides are cached
+with a TTL. A type name that is missing even after a reload is remembered
+for NOTIFICATION_TYPE_MISS_TTL seconds, so unknown names don't reload the
+registry on every send. Saves and deletes clear the matching entries in the saving process
+immediately (see signals.py); other processes pick the change up when their
+entry expires.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.template import Context, Template, TemplateSyntaxError, Variable, VariableDoesNotExist
+from django.template.base import render_value_in_context
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used mapping with hit/miss counters. With
+    ``ttl`` (seconds) entries also expire that long after they were set.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires_at, value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.data[key]
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def get_or_set(self, key, factory):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+
+compiled_templates = LRUCache(getattr(settings, 'COMPILED_TEMPLATE_CACHE_SIZE', 512))
+email_templates = LRUCache(256, ttl=getattr(settings, 'EMAIL_TEMPLATE_CACHE_TTL', 300))
+notification_templates = LRUCache(256, ttl=getattr(settings, 'EMAIL_TEMPLATE_CACHE_TTL', 300))
+# A single entry holding {name: NotificationType}
+notification_types = LRUCache(1, ttl=getattr(settings, 'NOTIFICATION_TYPE_CACHE_TTL', 300))
+# Names that were still missing after a reload
+missing_notification_types = LRUCache(256, ttl=getattr(settings, 'NOTIFICATION_TYPE_MISS_TTL', 30))
+# user id -> {notification type id: UserNotificationPreference}
+user_preferences = LRUCache(
+    getattr(settings, 'PREFERENCE_CACHE_SIZE', 10000), ttl=getattr(settings, 'PREFERENCE_CACHE_TTL', 60)
+)
+
+
+SIMPLE_VARIABLE = re.compile(r'{{\s*([\w.]+)\s*}}')
+# Only read for its autoescape/l10n/tz flags, never written to
+_DEFAULT_CONTEXT = Context()
+
+
+class FormatTemplate:
+    """
+    A template made only of text and ``{{ variable }}`` lookups, rendered with
+    one ``str.format`` call. Lookups, escaping and localization go through
+    Django's own Variable and render_value_in_context, so the output matches
+    ``Template(source).render(Context(context))``.
+    """
+
+    def __init__(self, source):
+        parts = SIMPLE_VARIABLE.split(source)
+        self.variables = [Variable(name) for name in parts[1::2]]
+        self.format = ''.join(
+            part.replace('{', '{{').replace('}', '}}') if index % 2 == 0 else f'{{{index // 2}}}'
+            for index, part in enumerate(parts)
+        )
+
+    def render(self, context):
+        """``context`` may be a dict or a Context"""
+        return self.format.format(*(self.resolve(variable, context) for variable in self.variables))
+
+    @staticmethod
+    def resolve(variable, context):
+        try:
+            value = variable.resolve(context)
+        except VariableDoesNotExist:
+            return ''
+        return render_value_in_context(value, context if isinstance(context, Context) else _DEFAULT_CONTEXT)
+
+
+def parse_template(source):
+    """FormatTemplate when ``source`` has no tags, comments or filters, otherwise a Template"""
+    rest = SIMPLE_VARIABLE.sub('', source)
+    if '{{' not in rest and '{%' not in rest and '{#' not in rest:
+        try:
+            return FormatTemplate(source)
+        except TemplateSyntaxError:  # e.g. {{ _private }}; let Template report it
+            pass
+    return Template(source)
+
+
+def compile_template(source, key=None):
+    """
+    Return a compiled template for ``source`` (see parse_template). ``key``
+    identifies the source's origin and revision; without one the source text
+    is the key.
+    """
+    return compiled_templates.get_or_set(key if key is not None else ('source', source), lambda: parse_template(source))
+
+
+def render_template_string(source, context, key=None):
+    return compile_template(source, key).render(Context(context))
+
+
+def render_email_template(template, field, context):
+    """Render one of an EmailTemplate's fields (``subject_template`` etc.)."""
+    source = getattr(template, field)
+    key = (template.pk, field, template.version, template.updated_at)
+    return render_template_string(source, context, key)
+
+
+def get_active_email_template(name):
+    """Cached ``EmailTemplate.objects.get(name=name, is_active=True)``; None when missing."""
+    from .models import EmailTemplate
+
+    def load():
+        try:
+            return EmailTemplate.objects.get(name=name, is_active=True)
+        except EmailTemplate.DoesNotExist:
+            return None
+
+    return email_templates.get_or_set(name, load)
+
+
+def invalidate_email_templates():
+    email_templates.clear()
+
+
+def get_active_notification_template(name):
+    """Cached active real-time NotificationTemplate by name; None when missing."""
+    from src.apps.realtime_notifications.models import NotificationTemplate
+
+    def load():
+        try:
+            return NotificationTemplate.objects.get(name=name, is_active=True)
+        except NotificationTemplate.DoesNotExist:
+            return None
+
+    return notification_templates.get_or_set(name, load)
+
+
+def invalidate_notification_templates():
+    notification_templates.clear()
+
+
+def load_notification_types():
+    from .models import NotificationType
+
+    return {nt.name: nt for nt in NotificationType.objects.all()}
+
+
+def get_notification_types():
+    """All NotificationTypes by name, loaded in one query per process and TTL."""
+    return notification_types.get_or_set('all', load_notification_types)
+
+
+def get_notification_type(name, active_only=True):
+    notification_type = get_notification_types().get(name)
+    if notification_type is None and missing_notification_types.get(name) is None:
+        # Types added without post_save (bulk_create, fixtures) are picked up on
+        # the first miss; a name that is still missing isn't reloaded for a while
+        types = load_notification_types()
+        notification_types.set('all', types)
+        notification_type = types.get(name)
+        if notification_type is None:
+            missing_notification_types.set(name, True)
+    if notification_type is None or (active_only and not notification_type.is_active):
+        return None
+    return notification_type
+
+
+def invalidate_notification_types():
+    notification_types.clear()
+    missing_notification_types.clear()
+
+
+def get_user_preferences(user_id):
+    """
+    A user's stored preference overrides keyed by notification type id. Types
+    without a row use the NotificationType defaults; see
+    NotificationService.get_effective_preference.
+    """
+    from .models import UserNotificationPreference
+
+    return user_preferences.get_or_set(user_id, lambda: {
+        pref.notification_type_id: pref
+        for pref in UserNotificationPreference.objects.filter(user_id=user_id)
+    })
+
+
+def invalidate_user_preferences(user_id):
+    user_preferences.delete(user_id)
+
+
+def clear_caches():
+    """Empty every cache above, e.g. after rows were written without signals."""
+    for cache in (
+        compiled_templates, email_templates, notification_templates,
+        notification_types, missing_notification_types, user_preferences,
+    ):
+        cache.clear()
@@ -1,131 +1,19 @@
-import json
-from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
-import logging
+"""
+``ws/notifications/``: the notification hub restricted to the Notification
+stream. See src/apps/realtime_notifications/consumers.py.
+"""
+from src.apps.notifications.counters import NOTIFICATIONS
+from src.apps.realtime_notifications.consumers import NotificationHubConsumer
 
-User = get_user_model()
-logger = logging.getLogger(__name__)
 
-
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(NotificationHubConsumer):
     """
     WebSocket consumer for real-time notifications
-    """
-    
-    async def connect(self):
-        self.user = self.scope["user"]
-        
-        if self.user.is_anonymous:
-            await self.close()
-            return
-        
-        # Create a group for this user
-        self.group_name = f"notifications_{self.user.id}"
-        
-        # Join the group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
-        
-        await self.accept()
-        logger.info(f"WebSocket connected for user {self.user.email}")
-        
-        # Send current unread count
-        unread_count = await self.get_unread_count()
-        await self.send(text_data=json.dumps({
-            'type': 'unread_count',
-            'count': unread_count
-        }))
-    
-    async def disconnect(self, close_code):
-        if hasattr(self, 'group_name'):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
-        logger.info(f"WebSocket disconnected for user {self.user.email if not self.user.is_anonymous else 'anonymous'}")
     
-    async def receive(self, text_data):
-        """
-        Receive message from WebSocket
-        """
-        try:
-            text_data_json = json.loads(text_data)
-            message_type = text_data_json.get('type')
-            
-            if message_type == 'mark_as_read':
-                notification_id = text_data_json.get('notification_id')
-                success = await self.mark_notification_as_read(notification_id)
-                
-                await self.send(text_data=json.dumps({
-                    'type': 'mark_as_read_response',
-                    'notification_id': notification_id,
-                    'success': success
-                }))
-                
-                if success:
-                    # Send updated unread count
-                    unread_count = await self.get_unread_count()
-                    await self.send(text_data=json.dumps({
-                        'type': 'unread_count',
-                        'count': unread_count
-                    }))
-            
-            elif message_type == 'get_unread_count':
-                unread_count = await self.get_unread_count()
-                await self.send(text_data=json.dumps({
-                    'type': 'unread_count',
-                    'count': unread_count
-                }))
-        
-        except json.JSONDecodeError:
-            logger.error("Invalid JSON received in WebSocket")
-        except Exception as e:
-            logger.error(f"Error in WebSocket receive: {str(e)}")
-    
-    async def notification_message(self, event):
-        """
-        Send notification to WebSocket
-        """
-        await self.send(text_data=json.dumps({
-            'type': 'new_notification',
-            'notification': event['notification']
-        }))
-    
-    async def unread_count_update(self, event):
-        """
-        Send unread count update to WebSocket
-        """
-        await self.send(text_data=json.dumps({
-            'type': 'unread_count',
-            'count': event['count']
-        }))
-    
-    @database_sync_to_async
-    def get_unread_count(self):
-        """
-        Get unread notification count for the user
-        """
-        from src.apps.notifications.models import Notification
-        return Notification.objects.filter(
-            recipient=self.user,
-            status__in=['pending', 'sent']
-        ).count()
+    Clients of this route expect an ``unread_count`` frame first, as they did
+    before the hub; ``sync`` still returns the hub's connection snapshot.
+    """
+    streams = (NOTIFICATIONS,)
     
-    @database_sync_to_async
-    def mark_notification_as_read(self, notification_id):
-        """
-        Mark a notification as read
-        """
-        try:
-            from src.apps.notifications.models import Notification
-            notification = Notification.objects.get(
-                id=notification_id,
-                recipient=self.user
-            )
-            notification.mark_as_read()
-            return True
-        except Notification.DoesNotExist:
-            return False
+    async def send_initial_state(self, since):
+        await self.send_unread_count()
@@ -0,0 +1,143 @@
+"""
+Unread badge counters.
+
+Each user has one UnreadCounter row per stream (``notifications`` for
+Notification, ``realtime`` for RealtimeNotification), so reading a badge is a
+single-row lookup however many notifications the user has. Counters move with
+atomic ``F()`` updates:
+
+* saves and deletes of single rows are tracked by the post_init/post_save/
+  post_delete receivers in each app's signals.py;
+* bulk_create and queryset ``update()`` call sites, and retention's batched
+  deletes, adjust or reset the counter themselves.
+
+A user without a counter row is recounted on first read, using the partial
+"unread" index on each table. Adjustments to a missing row are skipped, since
+the recount will include them. reconcile_unread_counters (a periodic task)
+recounts existing rows to correct any drift, e.g. from raw updates.
+"""
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import UnreadCounter
+
+NOTIFICATIONS = 'notifications'
+REALTIME = 'realtime'
+
+STREAMS = {
+    NOTIFICATIONS: ('notifications.Notification', ('pending', 'sent')),
+    REALTIME: ('realtime_notifications.RealtimeNotification', ('pending', 'sent', 'delivered')),
+}
+
+
+def stream_for(model):
+    """The stream counting ``model``'s rows, or None"""
+    return next((name for name, (label, _statuses) in STREAMS.items() if label == model._meta.label), None)
+
+
+def unread_statuses(stream):
+    return STREAMS[stream][1]
+
+
+def unread_queryset(stream):
+    model_label, statuses = STREAMS[stream]
+    return apps.get_model(model_label).objects.filter(status__in=statuses)
+
+
+def recount_unread(user_ids, stream=NOTIFICATIONS):
+    """Recount ``user_ids`` from the notification table and store the result"""
+    user_ids = list(user_ids)
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        unread_queryset(stream).filter(recipient_id__in=user_ids).order_by()
+        .values('recipient_id').annotate(unread=Count('pk')).values_list('recipient_id', 'unread')
+    )
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, stream=stream, count=count) for user_id, count in counts.items()],
+        update_conflicts=True,
+        unique_fields=['user', 'stream'],
+        update_fields=['count'],
+    )
+    return counts
+
+
+def get_unread_count(user_id, stream=NOTIFICATIONS):
+    count = UnreadCounter.objects.filter(user_id=user_id, stream=stream).values_list('count', flat=True).first()
+    if count is None:
+        count = recount_unread([user_id], stream)[user_id]
+    return count
+
+
+def adjust_unread_counts(deltas, stream=NOTIFICATIONS):
+    """Apply ``{user_id: delta}``; one UPDATE per distinct delta"""
+    users_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        UnreadCounter.objects.filter(user_id__in=user_ids, stream=stream).update(
+            count=Greatest(F('count') + delta, 0)
+        )
+
+
+def adjust_unread_count(user_id, delta, stream=NOTIFICATIONS):
+    adjust_unread_counts({user_id: delta}, stream)
+
+
+def count_new_notifications(notifications, stream=NOTIFICATIONS):
+    """Count freshly bulk-created rows, which skip post_save"""
+    statuses = unread_statuses(stream)
+    adjust_unread_counts(
+        Counter(notification.recipient_id for notification in notifications if notification.status in statuses),
+        stream,
+    )
+
+
+def reset_unread_count(user_id, stream=NOTIFICATIONS):
+    """After marking everything read"""
+    UnreadCounter.objects.bulk_create(
+        [UnreadCounter(user_id=user_id, stream=stream, count=0)],
+        update_conflicts=True,
+        unique_fields=['user', 'stream'],
+        update_fields=['count'],
+    )
+
+
+def remember_status(instance):
+    """post_init: note the loaded status, without loading it when deferred"""
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+def track_status_change(instance, stream, created=False, deleted=False):
+    """post_save/post_delete: move the counter when a row enters or leaves the unread set"""
+    statuses = unread_statuses(stream)
+    before = None if created else getattr(instance, '_loaded_status', None)
+    after = None if deleted else instance.__dict__.get('status')
+    delta = (after in statuses) - (before in statuses)
+    instance._loaded_status = after
+    if delta:
+        adjust_unread_count(instance.recipient_id, delta, stream)
+
+
+def reconcile_unread_counters(stream=None, chunk_size=1000):
+    """Recount every stored counter; returns the number of counters corrected"""
+    corrected = 0
+    for name in [stream] if stream else STREAMS:
+        stored = UnreadCounter.objects.filter(stream=name).order_by('user_id').values_list('user_id', 'count')
+        chunk = {}
+        for user_id, count in stored.iterator(chunk_size=chunk_size):
+            chunk[user_id] = count
+            if len(chunk) == chunk_size:
+                corrected += _reconcile_chunk(chunk, name)
+                chunk = {}
+        if chunk:
+            corrected += _reconcile_chunk(chunk, name)
+    return corrected
+
+
+def _reconcile_chunk(stored, stream):
+    actual = recount_unread(stored, stream)
+    return sum(1 for user_id, count in actual.items() if stored[user_id] != count)
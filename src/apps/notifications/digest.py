@@ -0,0 +1,159 @@
+"""
+Digest emails for users whose preferences ask for hourly, daily or weekly
+delivery.
+
+send_digests(frequency) loads that frequency's preferences and digest
+watermarks in bulk, then scans the due users' notifications with one query per
+chunk of users. The scan is ordered by (recipient, created_at), which walks the
+notifications (recipient, created_at) index and lets rows be grouped per user
+as they stream. Emails are rendered and handed to the email backend in batches
+over one connection; a user's watermark only moves once their digest was
+accepted, so a failed send is retried next run and nothing is sent twice.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Notification, NotificationDigestState, UserNotificationPreference
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+PERIODS = {
+    'hourly': (timedelta(hours=1), 'hour'),
+    'daily': (timedelta(days=1), 'day'),
+    'weekly': (timedelta(weeks=1), 'week'),
+}
+
+
+def build_digest_email(user, frequency, notifications, total):
+    """Render one user's digest; ``notifications`` is already capped at DIGEST_MAX_ITEMS"""
+    context = {
+        'user': user,
+        'recipient_name': user.get_full_name() or user.username,
+        'frequency': frequency,
+        'period_label': PERIODS[frequency][1],
+        'notifications': notifications,
+        'notification_count': total,
+        'overflow_count': total - len(notifications),
+        'site_name': getattr(settings, 'SITE_NAME', 'Music Distribution Platform'),
+        'frontend_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:5173'),
+    }
+    email = EmailMultiAlternatives(
+        subject=f"Your {frequency} music platform digest - {total} update{'s' if total != 1 else ''}",
+        body=render_to_string('notifications/digest_email.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+        reply_to=[settings.DEFAULT_FROM_EMAIL],
+    )
+    email.attach_alternative(render_to_string('notifications/digest_email.html', context), "text/html")
+    return email
+
+
+def _deliver(connection, batch):
+    """Send a batch of (user_id, message); return the user ids whose message was accepted"""
+    messages = [message for _, message in batch]
+    try:
+        if hasattr(connection, 'send_messages_detailed'):
+            results = connection.send_messages_detailed(messages)
+            return [user_id for (user_id, _), result in zip(batch, results) if result.success]
+        sent = connection.send_messages(messages)
+    except Exception as exc:
+        logger.error(f"Failed to send {len(batch)} digest emails: {str(exc)}")
+        return []
+    # Plain backends only report a count; treat a partial batch as failed so it is retried
+    return [user_id for user_id, _ in batch] if sent == len(batch) else []
+
+
+def _advance(frequency, user_ids, now, sent):
+    states = [
+        NotificationDigestState(user_id=user_id, frequency=frequency, watermark=now, last_sent_at=now if sent else None)
+        for user_id in user_ids
+    ]
+    NotificationDigestState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['user', 'frequency'],
+        update_fields=['watermark', 'last_sent_at'] if sent else ['watermark'],
+    )
+
+
+def send_digests(frequency, now=None):
+    """Send every due ``frequency`` digest; returns the number of emails accepted"""
+    now = now or timezone.now()
+    period = PERIODS[frequency][0]
+    # Runs that fire a little early (beat jitter) still count as the next period
+    due_before = now - period + timedelta(seconds=getattr(settings, 'DIGEST_SCHEDULE_SLACK', 300))
+    chunk_size = getattr(settings, 'DIGEST_USER_CHUNK_SIZE', 500)
+    batch_size = getattr(settings, 'DIGEST_SEND_BATCH_SIZE', 100)
+    max_items = getattr(settings, 'DIGEST_MAX_ITEMS', 50)
+
+    type_ids_by_user = defaultdict(set)
+    for user_id, type_id in UserNotificationPreference.objects.filter(
+        frequency=frequency
+    ).values_list('user_id', 'notification_type_id'):
+        type_ids_by_user[user_id].add(type_id)
+
+    watermarks = dict(NotificationDigestState.objects.filter(frequency=frequency).values_list('user_id', 'watermark'))
+    due_user_ids = sorted(
+        user_id for user_id in type_ids_by_user
+        if watermarks.get(user_id) is None or watermarks[user_id] <= due_before
+    )
+
+    connection = get_connection()
+    connection.open()
+    sent_count = 0
+    try:
+        for start in range(0, len(due_user_ids), chunk_size):
+            chunk = due_user_ids[start:start + chunk_size]
+            floors = {user_id: watermarks.get(user_id) or now - period for user_id in chunk}
+            users = User.objects.filter(pk__in=chunk, is_active=True).only(
+                'id', 'email', 'username', 'first_name', 'last_name'
+            ).in_bulk()
+
+            rows = Notification.objects.filter(
+                recipient_id__in=chunk,
+                notification_type_id__in=set().union(*(type_ids_by_user[user_id] for user_id in chunk)),
+                created_at__gt=min(floors.values()),
+                created_at__lte=now,
+            ).order_by('recipient_id', 'created_at').only(
+                'id', 'recipient_id', 'notification_type_id', 'title', 'message', 'created_at'
+            )
+
+            batch = []
+            empty = set(chunk)
+            for user_id, group in groupby(rows.iterator(chunk_size=2000), key=attrgetter('recipient_id')):
+                user = users.get(user_id)
+                items = [
+                    notification for notification in group
+                    if notification.created_at > floors[user_id]
+                    and notification.notification_type_id in type_ids_by_user[user_id]
+                ]
+                if not items or user is None or not user.email:
+                    continue
+                empty.discard(user_id)
+                batch.append((user_id, build_digest_email(user, frequency, items[-max_items:][::-1], len(items))))
+                if len(batch) >= batch_size:
+                    accepted = _deliver(connection, batch)
+                    _advance(frequency, accepted, now, sent=True)
+                    sent_count += len(accepted)
+                    batch = []
+            if batch:
+                accepted = _deliver(connection, batch)
+                _advance(frequency, accepted, now, sent=True)
+                sent_count += len(accepted)
+            # Nothing new for these users: move the watermark so the next scan starts here
+            _advance(frequency, empty, now, sent=False)
+    finally:
+        connection.close()
+
+    logger.info(f"Sent {sent_count} {frequency} digests to {len(due_user_ids)} due users")
+    return sent_count
@@ -1,25 +1,152 @@
+import base64
 import requests
 import logging
+import urllib3
 import json
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.message import EmailMessage
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 
+class ZeptoMailError(Exception):
+    """Raised when some messages could not be sent; ``results`` has the per-message outcomes"""
+    
+    def __init__(self, message, results=None):
+        super().__init__(message)
+        self.results = results or []
+
+
+@dataclass
+class SendResult:
+    """Outcome of sending one EmailMessage through a delivery provider"""
+    message: EmailMessage
+    success: bool
+    status_code: Optional[int] = None
+    request_id: Optional[str] = None
+    error: Optional[str] = None
+    batched: bool = False
+    provider: str = 'zeptomail'
+    # The request may have reached the provider, so it is not known whether
+    # the message went out; sending it again could deliver it twice
+    unknown: bool = False
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: ``rate`` tokens per second, holding at most
+    ``capacity``. ``acquire()`` blocks until a token is available.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def acquire(self, tokens=1):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# One pooled session and rate limiter per process, shared by every backend
+# instance. Django instantiates a backend per send_mail() call, so anything
+# kept on the instance would be thrown away after each email.
+_session = None
+_rate_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _shared_lock:
+        if _session is None:
+            pool_size = getattr(settings, 'ZEPTOMAIL_MAX_CONCURRENCY', 8)
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    with _shared_lock:
+        if _rate_limiter is None:
+            rate = getattr(settings, 'ZEPTOMAIL_RATE_LIMIT', 10)
+            _rate_limiter = TokenBucket(rate, getattr(settings, 'ZEPTOMAIL_RATE_BURST', rate))
+        return _rate_limiter
+
+
+def reset_shared_clients():
+    """Drop the pooled session and rate limiter so they pick up new settings"""
+    global _session, _rate_limiter
+    with _shared_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _rate_limiter = None
+
+
+def _never_sent(exc):
+    """True when ``exc`` proves the request never reached the server: the connection was never established"""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError):
+        return False
+    reason = exc.args[0] if exc.args else None
+    if isinstance(reason, urllib3.exceptions.MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
 class ZeptoMailAPIBackend(BaseEmailBackend):
     """
     Custom email backend using ZeptoMail REST API
+    
+    Messages are sent over a pooled keep-alive session with bounded
+    concurrency. Single-recipient messages with identical content are
+    grouped into calls to the batch endpoint, and every API call waits on a
+    shared token bucket so bursts stay under the account's rate limit.
     """
     
     def __init__(self, fail_silently=False, **kwargs):
         super().__init__(fail_silently=fail_silently, **kwargs)
         self.api_key = getattr(settings, 'ZEPTOMAIL_API_KEY', None)
         self.api_url = getattr(settings, 'ZEPTOMAIL_API_URL', 'https://api.zeptomail.com/v1.1/email')
+        self.batch_api_url = (
+            getattr(settings, 'ZEPTOMAIL_BATCH_API_URL', '') or f"{self.api_url.rstrip('/')}/batch"
+        )
         self.default_from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com')
         self.default_from_name = getattr(settings, 'DEFAULT_FROM_NAME', 'Music Distribution Platform')
+        self.batch_size = getattr(settings, 'ZEPTOMAIL_BATCH_SIZE', 500)
+        self.max_concurrency = getattr(settings, 'ZEPTOMAIL_MAX_CONCURRENCY', 8)
+        self.max_retries = getattr(settings, 'ZEPTOMAIL_MAX_RETRIES', 2)
+        self.timeout = (
+            getattr(settings, 'ZEPTOMAIL_CONNECT_TIMEOUT', 3.05),
+            getattr(settings, 'ZEPTOMAIL_TIMEOUT', 10),
+        )
         
         if not self.api_key:
             logger.error("ZEPTOMAIL_API_KEY not configured")
@@ -28,156 +155,428 @@ class ZeptoMailAPIBackend(BaseEmailBackend):
         """
         Send multiple email messages using ZeptoMail API
         """
+        results = self.send_messages_detailed(email_messages)
+        sent_count = sum(1 for result in results if result.success)
+        
+        failed = [result for result in results if not result.success]
+        if failed and not self.fail_silently:
+            raise ZeptoMailError(
+                f"ZeptoMail: {len(failed)}/{len(results)} emails failed: {failed[0].error}",
+                results=results
+            )
+        return sent_count
+    
+    def send_messages_detailed(self, email_messages: List[EmailMessage]) -> List[SendResult]:
+        """
+        Send the messages and return one SendResult per message, in order.
+        Never raises for delivery failures.
+        """
+        email_messages = list(email_messages or [])
+        if not email_messages:
+            return []
         if not self.api_key:
             logger.error("ZeptoMail API key not configured")
-            return 0
+            return [SendResult(message, False, error='ZEPTOMAIL_API_KEY not configured') for message in email_messages]
         
-        sent_count = 0
+        jobs = self._plan_requests(email_messages)
+        results = [None] * len(email_messages)
         
-        for message in email_messages:
-            if self._send_single_message(message):
-                sent_count += 1
+        workers = max(1, min(self.max_concurrency, len(jobs)))
+        if workers == 1:
+            outcomes = [self._run_job(job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zeptomail') as executor:
+                outcomes = list(executor.map(self._run_job, jobs))
         
-        logger.info(f"ZeptoMail: Sent {sent_count}/{len(email_messages)} emails")
-        return sent_count
+        for (indexes, url, _payload), (status_code, request_id, error, unknown) in zip(jobs, outcomes):
+            for index in indexes:
+                results[index] = SendResult(
+                    email_messages[index], error is None,
+                    status_code=status_code, request_id=request_id, error=error,
+                    batched=url == self.batch_api_url, unknown=unknown
+                )
+        
+        sent_count = sum(1 for result in results if result.success)
+        logger.info(f"ZeptoMail: Sent {sent_count}/{len(email_messages)} emails in {len(jobs)} API calls")
+        return results
     
-    def _send_single_message(self, message: EmailMessage) -> bool:
+    def _plan_requests(self, email_messages):
         """
-        Send a single email message via ZeptoMail API
+        Group messages into API calls: ``[(message_indexes, url, payload), ...]``.
+        
+        The batch endpoint delivers a separate copy to each ``to`` address, so
+        only messages with exactly one recipient and no cc/bcc/attachments are
+        batched, keyed on everything else in the payload.
         """
-        try:
-            # Prepare headers
-            headers = {
-                'accept': 'application/json',
-                'content-type': 'application/json',
-                'authorization': f'Zoho-enczapikey {self.api_key}'
-            }
-            
-            # Prepare email data for ZeptoMail API
-            email_data = {
-                'from': {
-                    'address': message.from_email or self.default_from_email,
-                    'name': self.default_from_name
-                },
-                'to': [
-                    {
-                        'email_address': {
-                            'address': recipient,
-                            'name': recipient.split('@')[0]  # Use part before @ as name
-                        }
-                    } for recipient in message.to
-                ],
-                'subject': message.subject,
-            }
-            
-            # Add content based on message type
-            if hasattr(message, 'content_subtype') and message.content_subtype == 'html':
-                email_data['htmlbody'] = message.body
+        jobs = []
+        groups = {}
+        
+        for index, message in enumerate(email_messages):
+            payload = self._build_payload(message)
+            if self.batch_size > 1 and self._is_batchable(message):
+                recipient = payload.pop('to')
+                key = json.dumps(payload, sort_keys=True)
+                group = groups.setdefault(key, {'payload': payload, 'indexes': [], 'to': []})
+                group['indexes'].append(index)
+                group['to'].extend(recipient)
             else:
-                email_data['textbody'] = message.body
-            
-            # Add CC and BCC if present
-            if message.cc:
-                email_data['cc'] = [
-                    {'email_address': {'address': cc, 'name': cc.split('@')[0]}}
-                    for cc in message.cc
-                ]
-            
-            if message.bcc:
-                email_data['bcc'] = [
-                    {'email_address': {'address': bcc, 'name': bcc.split('@')[0]}}
-                    for bcc in message.bcc
-                ]
-            
-            # Add attachments if present
-            if hasattr(message, 'attachments') and message.attachments:
-                email_data['attachments'] = []
-                for attachment in message.attachments:
-                    # Handle Django email attachments
-                    if hasattr(attachment, 'get_filename'):
-                        email_data['attachments'].append({
-                            'name': attachment.get_filename(),
-                            'content': attachment.get_content()
-                        })
-            
-            # Send request to ZeptoMail API
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=email_data,
-                timeout=30
-            )
+                jobs.append(([index], self.api_url, payload))
+        
+        for group in groups.values():
+            for start in range(0, len(group['indexes']), self.batch_size):
+                indexes = group['indexes'][start:start + self.batch_size]
+                to = group['to'][start:start + self.batch_size]
+                if len(indexes) == 1:
+                    jobs.append((indexes, self.api_url, dict(group['payload'], to=to)))
+                else:
+                    jobs.append((indexes, self.batch_api_url, dict(group['payload'], to=to)))
+        return jobs
+    
+    @staticmethod
+    def _is_batchable(message):
+        return (
+            len(message.to) == 1
+            and not message.cc
+            and not message.bcc
+            and not message.attachments
+        )
+    
+    def _run_job(self, job):
+        _indexes, url, payload = job
+        return self._post(url, payload)
+    
+    def _post(self, url, payload):
+        """
+        POST one API call; returns ``(status_code, request_id, error, unknown)``.
+        
+        Only errors raised before the request could have left this process are
+        retried. Anything else (read timeouts, connections dropped mid-request)
+        may have been accepted by ZeptoMail, so it is reported with
+        ``unknown=True`` instead of being sent again.
+        """
+        headers = {
+            'accept': 'application/json',
+            'content-type': 'application/json',
+            'authorization': f'Zoho-enczapikey {self.api_key}'
+        }
+        session = get_session()
+        limiter = get_rate_limiter()
+        
+        for attempt in range(self.max_retries + 1):
+            limiter.acquire()
+            try:
+                response = session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                if not _never_sent(e):
+                    logger.error(f"Delivery via ZeptoMail unknown after network error: {str(e)}")
+                    return None, None, f"Delivery unknown: {e}", True
+                if attempt < self.max_retries:
+                    continue
+                logger.error(f"Network error sending email via ZeptoMail: {str(e)}")
+                return None, None, f"Network error: {e}", False
             
             # ZeptoMail returns 200 or 201 for success
             if response.status_code in [200, 201]:
-                response_data = response.json()
-                logger.info(f"Email sent successfully via ZeptoMail: {message.subject}")
-                logger.debug(f"ZeptoMail response: {response_data}")
-                return True
-            else:
-                error_msg = f"ZeptoMail API error {response.status_code}: {response.text}"
-                logger.error(error_msg)
-                if not self.fail_silently:
-                    raise Exception(error_msg)
+                try:
+                    request_id = response.json().get('request_id')
+                except ValueError:
+                    request_id = None
+                logger.debug(f"ZeptoMail accepted {payload.get('subject')!r}, request_id={request_id}")
+                return response.status_code, request_id, None, False
+            
+            if response.status_code == 429 and attempt < self.max_retries:
+                retry_after = response.headers.get('Retry-After', '1')
+                try:
+                    delay = min(float(retry_after), 30.0)
+                except ValueError:
+                    delay = 1.0
+                logger.warning(f"ZeptoMail rate limited, retrying in {delay}s")
+                time.sleep(delay)
+                continue
+            
+            error_msg = f"ZeptoMail API error {response.status_code}: {response.text[:500]}"
+            logger.error(error_msg)
+            return response.status_code, None, error_msg, False
+        
+        return None, None, 'Retries exhausted', False
+    
+    def _build_payload(self, message: EmailMessage) -> Dict[str, Any]:
+        """
+        Prepare email data for ZeptoMail API
+        """
+        email_data = {
+            'from': {
+                'address': message.from_email or self.default_from_email,
+                'name': self.default_from_name
+            },
+            'to': [self._address(recipient) for recipient in message.to],
+            'subject': message.subject,
+        }
+        
+        # Add content based on message type; send_mail(html_message=...)
+        # arrives as an html alternative alongside the text body
+        html_body = None
+        if getattr(message, 'content_subtype', None) == 'html':
+            html_body = message.body
+        else:
+            email_data['textbody'] = message.body
+            for content, mimetype in getattr(message, 'alternatives', None) or []:
+                if mimetype == 'text/html':
+                    html_body = content
+        if html_body is not None:
+            email_data['htmlbody'] = html_body
+        
+        # Add CC and BCC if present
+        if message.cc:
+            email_data['cc'] = [self._address(cc) for cc in message.cc]
+        if message.bcc:
+            email_data['bcc'] = [self._address(bcc) for bcc in message.bcc]
+        if message.reply_to:
+            email_data['reply_to'] = [{'address': address} for address in message.reply_to]
+        
+        # Add attachments if present
+        if message.attachments:
+            email_data['attachments'] = [
+                attachment for attachment in map(self._attachment, message.attachments) if attachment
+            ]
+        
+        return email_data
+    
+    @staticmethod
+    def _address(address):
+        return {
+            'email_address': {
+                'address': address,
+                'name': address.split('@')[0]  # Use part before @ as name
+            }
+        }
+    
+    @staticmethod
+    def _attachment(attachment):
+        # Django stores attachments as (filename, content, mimetype) tuples,
+        # or as MIMEBase objects when attach() was given one
+        if isinstance(attachment, tuple):
+            filename, content, mimetype = attachment
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            return {
+                'name': filename,
+                'content': base64.b64encode(content).decode('ascii'),
+                'mime_type': mimetype or 'application/octet-stream',
+            }
+        if hasattr(attachment, 'get_filename'):
+            return {
+                'name': attachment.get_filename(),
+                'content': base64.b64encode(attachment.get_payload(decode=True) or b'').decode('ascii'),
+                'mime_type': attachment.get_content_type(),
+            }
+        return None
+
+
+class ProviderHealth:
+    """
+    Consecutive-failure circuit breaker for one delivery provider.
+    
+    After ``threshold`` failures in a row the provider is skipped for
+    ``cooldown`` seconds; the first send after that is a trial, and a single
+    success closes the circuit again.
+    """
+    
+    def __init__(self, name, threshold, cooldown):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+    
+    @property
+    def is_open(self):
+        with self.lock:
+            if self.opened_at is None:
                 return False
-                
-        except requests.RequestException as e:
-            logger.error(f"Network error sending email via ZeptoMail: {str(e)}")
-            if not self.fail_silently:
-                raise
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error sending email via ZeptoMail: {str(e)}")
-            if not self.fail_silently:
-                raise
-            return False
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half-open: let the next send through as a trial
+                return False
+            return True
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Email provider {self.name} unhealthy after {self.failures} failures, bypassing it")
+                self.opened_at = time.monotonic()
+
+
+_provider_health = {}
+_smtp_backend = None
+_smtp_last_used = 0.0
+_smtp_lock = threading.Lock()
+
+
+def get_provider_health(name):
+    with _shared_lock:
+        if name not in _provider_health:
+            _provider_health[name] = ProviderHealth(
+                name,
+                threshold=getattr(settings, 'EMAIL_FAILOVER_THRESHOLD', 5),
+                cooldown=getattr(settings, 'EMAIL_FAILOVER_COOLDOWN', 60),
+            )
+        return _provider_health[name]
+
+
+def reset_provider_health():
+    with _shared_lock:
+        _provider_health.clear()
+
+
+def _discard_smtp_backend():
+    global _smtp_backend
+    if _smtp_backend is not None:
+        try:
+            _smtp_backend.close()
+        except OSError:
+            pass
+    _smtp_backend = None
+
+
+def close_smtp_connection():
+    with _smtp_lock:
+        _discard_smtp_backend()
+
+
+def _is_provider_error(result):
+    """Transport errors, throttling and 5xx count against provider health; 4xx rejections do not"""
+    return result.status_code is None or result.status_code == 429 or result.status_code >= 500
 
 
 class HybridEmailBackend(BaseEmailBackend):
     """
     Hybrid backend that tries ZeptoMail API first, falls back to SMTP
+    
+    Each message is tracked individually: only the messages the API provably
+    did not deliver (it answered with an error, or was never reached) are
+    handed to SMTP, so nothing is sent twice. A message whose API call ended
+    without an answer is reported as ``unknown`` rather than resent. The SMTP connection
+    is kept open across calls (and reopened when stale), and a provider that
+    keeps failing is skipped for a cooldown instead of timing out on every
+    send.
     """
     
     def __init__(self, fail_silently=False, **kwargs):
         super().__init__(fail_silently=fail_silently, **kwargs)
         self.api_backend = ZeptoMailAPIBackend(fail_silently=True)
-        
-        # Import SMTP backend for fallback
-        from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
-        self.smtp_backend = SMTPBackend(fail_silently=fail_silently)
+        self.smtp_idle_timeout = getattr(settings, 'EMAIL_SMTP_IDLE_TIMEOUT', 60)
+        self.providers = [
+            ('zeptomail', self._send_via_api),
+            ('smtp', self._send_via_smtp),
+        ]
     
     def send_messages(self, email_messages: List[EmailMessage]) -> int:
         """
         Try ZeptoMail API first, fallback to SMTP if needed
         """
-        try:
-            # Try ZeptoMail API first
-            sent_count = self.api_backend.send_messages(email_messages)
-            if sent_count == len(email_messages):
-                logger.info(f"All {sent_count} emails sent via ZeptoMail API")
-                return sent_count
-            else:
-                logger.warning(f"Only {sent_count}/{len(email_messages)} sent via API, trying SMTP fallback")
-                
-                # Try to send remaining emails via SMTP
-                failed_messages = email_messages[sent_count:]
-                smtp_sent = self.smtp_backend.send_messages(failed_messages)
-                total_sent = sent_count + smtp_sent
-                logger.info(f"Total sent: {total_sent} (API: {sent_count}, SMTP: {smtp_sent})")
-                return total_sent
-                
-        except Exception as e:
-            logger.warning(f"ZeptoMail API failed, falling back to SMTP: {str(e)}")
-            # Fallback to SMTP for all messages
+        results = self.send_messages_detailed(email_messages)
+        sent_count = sum(1 for result in results if result.success)
+        
+        failed = [result for result in results if not result.success]
+        if failed and not self.fail_silently:
+            raise ZeptoMailError(
+                f"{len(failed)}/{len(results)} emails failed on every provider: {failed[0].error}",
+                results=results
+            )
+        return sent_count
+    
+    def send_messages_detailed(self, email_messages: List[EmailMessage]) -> List[SendResult]:
+        email_messages = list(email_messages or [])
+        results = [SendResult(message, False, error='Not attempted') for message in email_messages]
+        pending = list(range(len(email_messages)))
+        
+        # Skip unhealthy providers, unless every provider is unhealthy, in
+        # which case try them all rather than drop the mail.
+        healthy = [(name, send) for name, send in self.providers if not get_provider_health(name).is_open]
+        
+        for name, send in healthy or self.providers:
+            if not pending:
+                break
+            outcomes = send([email_messages[index] for index in pending])
+            still_pending = []
+            for index, outcome in zip(pending, outcomes):
+                outcome.provider = name
+                results[index] = outcome
+                if not outcome.success and not outcome.unknown:
+                    still_pending.append(index)
+            if still_pending and len(still_pending) < len(pending):
+                logger.warning(f"{len(still_pending)}/{len(pending)} emails failed via {name}, failing over")
+            pending = still_pending
+        
+        by_provider = {}
+        for result in results:
+            if result.success:
+                by_provider[result.provider] = by_provider.get(result.provider, 0) + 1
+        logger.info(f"Sent {sum(by_provider.values())}/{len(email_messages)} emails {by_provider}")
+        return results
+    
+    def _send_via_api(self, messages):
+        health = get_provider_health('zeptomail')
+        results = self.api_backend.send_messages_detailed(messages)
+        if any(result.success for result in results):
+            health.record_success()
+        elif any(_is_provider_error(result) for result in results):
+            health.record_failure()
+        return results
+    
+    def _get_smtp_backend(self):
+        """The process-wide SMTP backend, with its connection kept open between sends"""
+        global _smtp_backend, _smtp_last_used
+        from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+        
+        if _smtp_backend is None:
+            _smtp_backend = SMTPBackend(fail_silently=False)
+        elif _smtp_backend.connection is not None and time.monotonic() - _smtp_last_used > self.smtp_idle_timeout:
+            # Servers drop idle sessions; reconnect rather than fail the first send
+            _discard_smtp_backend()
+            _smtp_backend = SMTPBackend(fail_silently=False)
+        _smtp_backend.open()
+        _smtp_last_used = time.monotonic()
+        return _smtp_backend
+    
+    def _send_via_smtp(self, messages):
+        with _smtp_lock:
+            return [self._smtp_send_one(message) for message in messages]
+    
+    def _smtp_send_one(self, message):
+        health = get_provider_health('smtp')
+        error = None
+        
+        for attempt in range(2):
             try:
-                sent_count = self.smtp_backend.send_messages(email_messages)
-                logger.info(f"{sent_count} emails sent via SMTP fallback")
-                return sent_count
-            except Exception as smtp_error:
-                logger.error(f"Both API and SMTP failed: {str(smtp_error)}")
-                if not self.fail_silently:
-                    raise
-                return 0
+                sent = self._get_smtp_backend().send_messages([message])
+            except smtplib.SMTPException as e:
+                if not isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+                    # The server is up but refused this message
+                    health.record_success()
+                    return SendResult(message, False, error=f"SMTP error: {e}", provider='smtp')
+                error = f"SMTP connection error: {e}"
+            except OSError as e:
+                error = f"SMTP connection error: {e}"
+            else:
+                health.record_success()
+                if sent:
+                    return SendResult(message, True, provider='smtp')
+                return SendResult(message, False, error='SMTP server rejected the message', provider='smtp')
+            
+            # Likely a stale connection: drop it and retry once on a fresh one
+            _discard_smtp_backend()
+        
+        health.record_failure()
+        return SendResult(message, False, error=error, provider='smtp')
 
 
 class ConsoleZeptoMailBackend(BaseEmailBackend):
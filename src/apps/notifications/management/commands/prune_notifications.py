@@ -0,0 +1,21 @@
+"""
+Delete notifications, notification logs and realtime notifications past retention
+"""
+from django.core.management.base import BaseCommand
+
+from src.apps.notifications.retention import prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete (and optionally archive) notifications past their retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-dir', help='Write pruned rows as gzipped NDJSON under this directory')
+        parser.add_argument('--batch-size', type=int, help='Rows deleted per batch')
+
+    def handle(self, *args, **options):
+        deleted = prune_notifications(archive_dir=options['archive_dir'], batch_size=options['batch_size'])
+
+        for table, count in deleted.items():
+            self.stdout.write(f"{table}: {count} rows deleted")
+        self.stdout.write(self.style.SUCCESS('✅ Notification retention applied'))
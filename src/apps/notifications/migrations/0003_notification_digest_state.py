@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0002_notification_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDigestState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(max_length=20)),
+                ('watermark', models.DateTimeField()),
+                ('last_sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'notification_digest_states',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notificatio_recipie_2c3905_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationdigeststate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notificationdigeststate',
+            unique_together={('user', 'frequency')},
+        ),
+    ]
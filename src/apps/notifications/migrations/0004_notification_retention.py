@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_digest_state'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notificatio_notific_134aa2_idx',
+        ),
+        migrations.AddField(
+            model_name='notificationtype',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Days to keep notifications of this type; blank uses NOTIFICATION_RETENTION_DAYS', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['notification_type', 'created_at'], name='notificatio_notific_61eafe_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 import uuid
 
@@ -31,6 +32,11 @@ class NotificationType(models.Model):
     default_push_enabled = models.BooleanField(default=True)
     default_in_app_enabled = models.BooleanField(default=True)
     
+    # Retention; see retention.py
+    retention_days = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Days to keep notifications of this type; blank uses NOTIFICATION_RETENTION_DAYS"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -59,6 +65,15 @@ class Notification(models.Model):
         ('urgent', 'Urgent'),
     ]
     
+    # Email outbox state; blank when the email is left to digests or disabled
+    EMAIL_STATUS_CHOICES = [
+        ('', 'Not queued'),
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     notification_type = models.ForeignKey(NotificationType, on_delete=models.CASCADE)
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -87,13 +102,24 @@ class Notification(models.Model):
     read_at = models.DateTimeField(null=True, blank=True)
     scheduled_for = models.DateTimeField(null=True, blank=True)  # For scheduled notifications
     
+    # Email outbox
+    email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, blank=True, default='')
+    email_queued_at = models.DateTimeField(null=True, blank=True)
+    email_attempts = models.PositiveSmallIntegerField(default=0)
+    
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'status']),
-            models.Index(fields=['notification_type']),
+            models.Index(fields=['recipient', 'created_at']),  # digest scans
+            models.Index(fields=['notification_type', 'created_at']),  # retention
             models.Index(fields=['created_at']),
+            models.Index(fields=['email_status', 'email_queued_at']),
+            # Unread recounts; see counters.py
+            models.Index(
+                fields=['recipient'], name='notifications_unread_idx', condition=models.Q(status__in=['pending', 'sent'])
+            ),
         ]
     
     def __str__(self):
@@ -103,14 +129,14 @@ class Notification(models.Model):
         """Mark notification as read"""
         if self.status != 'read':
             self.status = 'read'
-            self.read_at = models.DateTimeField.now()
+            self.read_at = timezone.now()
             self.save(update_fields=['status', 'read_at'])
     
     def mark_as_sent(self):
         """Mark notification as sent"""
         if self.status == 'pending':
             self.status = 'sent'
-            self.sent_at = models.DateTimeField.now()
+            self.sent_at = timezone.now()
             self.save(update_fields=['status', 'sent_at'])
 
 
@@ -146,6 +172,80 @@ class UserNotificationPreference(models.Model):
         return f"{self.user.get_full_name()} - {self.notification_type.name}"
 
 
+class NotificationDigestState(models.Model):
+    """Per-user digest watermark: notifications up to ``watermark`` have been digested"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='digest_states')
+    frequency = models.CharField(max_length=20)
+    watermark = models.DateTimeField()
+    last_sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'notification_digest_states'
+        unique_together = ['user', 'frequency']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.frequency} digest through {self.watermark}"
+
+
+class UnreadCounter(models.Model):
+    """Denormalized unread badge count per user and notification stream; see counters.py"""
+    STREAM_CHOICES = [
+        ('notifications', 'Notifications'),
+        ('realtime', 'Real-time notifications'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='unread_counters')
+    stream = models.CharField(max_length=20, choices=STREAM_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'notification_unread_counters'
+        unique_together = ['user', 'stream']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.stream}: {self.count} unread"
+
+
+class BroadcastNotification(models.Model):
+    """
+    One announcement shown to every user who joined before it was sent.
+    Per-user read state lives in BroadcastReceipt rows, created on first read;
+    see broadcasts.py
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    notification_type = models.ForeignKey(NotificationType, on_delete=models.CASCADE)
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_broadcasts')
+    
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    context_data = models.JSONField(default=dict, blank=True)
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_CHOICES, default='normal')
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'notification_broadcasts'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Broadcast: {self.title}"
+
+
+class BroadcastReceipt(models.Model):
+    """A user's read state for one BroadcastNotification"""
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'notification_broadcast_receipts'
+        unique_together = ['broadcast', 'user']
+    
+    def __str__(self):
+        return f"{self.user_id} read {self.broadcast_id} at {self.read_at}"
+
+
 class EmailTemplate(models.Model):
     """Customizable email templates"""
     TEMPLATE_TYPE_CHOICES = [
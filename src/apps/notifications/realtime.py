@@ -0,0 +1,69 @@
+"""
+Batched WebSocket delivery for notifications created without post_save
+(bulk_create), using the notifications_<user id> groups the realtime
+consumer joins.
+"""
+import logging
+
+from .counters import NOTIFICATIONS
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_notification(notification, notification_type=None):
+    """
+    WebSocket payload for a notification. Pass ``notification_type`` when it is
+    shared by a batch so it isn't fetched per row
+    """
+    notification_type = notification_type or notification.notification_type
+    return {
+        'id': str(notification.id),
+        'title': notification.title,
+        'message': notification.message,
+        'priority': notification.priority,
+        'created_at': notification.created_at.isoformat(),
+        'notification_type': {
+            'name': notification_type.name,
+            'category': notification_type.category,
+        }
+    }
+
+
+def send_notifications_to_users(notifications, notification_type=None):
+    """
+    Push a batch of notifications over WebSocket in a single event loop pass.
+    Used for rows created with bulk_create, which skips post_save. Recipients
+    without an open socket are skipped; they load the rows on connect
+    """
+    if not notifications:
+        return 0
+    
+    try:
+        from channels.layers import get_channel_layer
+        from src.apps.realtime_notifications.presence import online_users
+        from src.apps.realtime_notifications.publisher import publish, user_group
+    except ImportError:
+        logger.debug("Channels not available, skipping WebSocket notifications")
+        return 0
+    
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return 0
+    
+    online = online_users([notification.recipient_id for notification in notifications])
+    errors = publish(
+        (
+            (
+                user_group(notification.recipient_id),
+                {
+                    'type': 'notification_message',
+                    'stream': NOTIFICATIONS,
+                    'notification': serialize_notification(notification, notification_type)
+                }
+            )
+            for notification in notifications
+            if notification.recipient_id in online
+        ),
+        channel_layer,
+    )
+    return sum(1 for error in errors if error is None)
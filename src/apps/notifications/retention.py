@@ -0,0 +1,249 @@
+"""
+Retention for the notifications, notification_logs and realtime_notifications
+tables.
+
+prune_notifications() applies the policy:
+
+* Notification rows older than their type's ``retention_days`` (or
+  NOTIFICATION_RETENTION_DAYS when the type leaves it blank), and broadcasts
+  (with their receipts) on the same terms.
+* NotificationLog rows older than NOTIFICATION_LOG_RETENTION_DAYS.
+* RealtimeNotification rows that expired, or are older than
+  REALTIME_NOTIFICATION_RETENTION_DAYS.
+
+Rows are deleted by primary key in batches of RETENTION_BATCH_SIZE, each batch
+in its own short transaction with RETENTION_BATCH_PAUSE seconds between them,
+so pruning never holds long locks or one huge DELETE. Batches of Notification
+and RealtimeNotification rows move the unread counters once per batch instead
+of loading every row for the per-row post_delete receivers. With
+NOTIFICATION_ARCHIVE_DIR set, every batch is first appended to a gzipped NDJSON
+file per table and run.
+
+On PostgreSQL a table can be converted to monthly range partitions on
+``created_at`` (the primary key has to include ``created_at``; that conversion
+is an operational step, not a migration). Once a table is partitioned, pruning
+also creates the upcoming months' partitions and drops whole partitions that
+are past retention instead of deleting their rows, and recent-notification and
+unread queries only touch the current months' partitions. On other databases
+and unpartitioned tables the partition helpers do nothing.
+"""
+from datetime import timedelta
+import gzip
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import counters
+
+logger = logging.getLogger(__name__)
+
+
+class NDJSONArchive:
+    """Appends rows to ``<directory>/<table>/<table>-<timestamp>.ndjson.gz``"""
+
+    def __init__(self, directory, table, now=None):
+        folder = os.path.join(directory, table)
+        os.makedirs(folder, exist_ok=True)
+        stamp = (now or timezone.now()).strftime('%Y%m%dT%H%M%S')
+        self.path = os.path.join(folder, f'{table}-{stamp}.ndjson.gz')
+        self.rows = 0
+
+    def write(self, rows):
+        with gzip.open(self.path, 'at', encoding='utf-8') as archive:
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                self.rows += 1
+
+
+def get_archive(table, now=None, directory=None):
+    directory = directory or getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', '')
+    return NDJSONArchive(directory, table, now) if directory else None
+
+
+def delete_in_batches(queryset, batch_size=None, pause=None, archive=None):
+    """
+    Delete ``queryset`` a batch of primary keys at a time; returns the number
+    of rows removed from its model (cascaded rows are not counted).
+    """
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 1000)
+    pause = getattr(settings, 'RETENTION_BATCH_PAUSE', 0.1) if pause is None else pause
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = model.objects.filter(pk__in=ids)
+        with transaction.atomic():
+            if archive is not None:
+                archive.write(batch.values())
+            if counters.stream_for(model) and _can_raw_delete(model):
+                deleted += _delete_counted(batch)
+            else:
+                deleted += batch.delete()[1].get(model._meta.label, 0)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def _can_raw_delete(model):
+    return not model._meta.many_to_many and all(
+        relation.on_delete is models.CASCADE for relation in model._meta.related_objects
+    )
+
+
+def _delete_counted(batch):
+    """
+    Delete a batch of rows that feed an unread counter. ``batch.delete()``
+    would load every row to send post_delete to the per-row counter
+    receivers; instead the counters move once for the batch from a
+    per-recipient aggregate, dependents are deleted with plain queryset
+    deletes and the rows themselves with one DELETE.
+    """
+    model = batch.model
+    stream = counters.stream_for(model)
+    unread = (
+        batch.filter(status__in=counters.unread_statuses(stream)).order_by()
+        .values('recipient_id').annotate(unread=Count('pk')).values_list('recipient_id', 'unread')
+    )
+    counters.adjust_unread_counts({user_id: -count for user_id, count in unread}, stream)
+    for relation in model._meta.related_objects:
+        relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': batch}).delete()
+    return batch._raw_delete(batch.db)
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def _month_start(moment, offset=0):
+    month = moment.year * 12 + moment.month - 1 + offset
+    return moment.replace(year=month // 12, month=month % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def ensure_partitions(table, now=None, months_ahead=None):
+    """Create this month's and the next ``months_ahead`` monthly partitions of a partitioned table"""
+    if not is_partitioned(table):
+        return []
+    now = now or timezone.now()
+    months_ahead = getattr(settings, 'NOTIFICATION_PARTITIONS_AHEAD', 2) if months_ahead is None else months_ahead
+    quote = connection.ops.quote_name
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            start, end = _month_start(now, offset), _month_start(now, offset + 1)
+            name = f'{table}_{start:%Y_%m}'
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            created.append(name)
+    return created
+
+
+def drop_partitions_before(table, cutoff, archive=None):
+    """
+    Detach and drop the monthly partitions of ``table`` that end on or before
+    ``cutoff``. Returns the dropped partition names.
+    """
+    if not is_partitioned(table):
+        return []
+    quote = connection.ops.quote_name
+    dropped = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s ORDER BY c.relname",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    for name in names:
+        try:
+            year, month = (int(part) for part in name[len(table) + 1:].split('_'))
+        except ValueError:
+            continue  # not one of ours
+        end = _month_start(cutoff.replace(year=year, month=month, day=1), 1)
+        if end > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            if archive is not None:
+                cursor.execute(f"SELECT row_to_json(t) FROM {quote(name)} t")
+                archive.write(row[0] for row in cursor.fetchall())
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            cursor.execute(f"DROP TABLE {quote(name)}")
+        dropped.append(name)
+    return dropped
+
+
+def prune_notifications(now=None, archive_dir=None, batch_size=None):
+    """
+    Apply the retention policy; returns the rows deleted per table.
+    ``archive_dir`` and ``batch_size`` override NOTIFICATION_ARCHIVE_DIR and
+    RETENTION_BATCH_SIZE.
+    """
+    from src.apps.realtime_notifications.models import RealtimeNotification
+    from .cache import get_notification_types
+    from .models import BroadcastNotification, Notification, NotificationLog
+
+    now = now or timezone.now()
+    default_days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180)
+    deleted = {}
+
+    cutoffs = {
+        notification_type.pk: now - timedelta(days=notification_type.retention_days or default_days)
+        for notification_type in get_notification_types().values()
+    }
+    table = Notification._meta.db_table
+    ensure_partitions(table, now)
+    archive = get_archive(table, now, archive_dir)
+    # Partitions older than every type's retention go whole; the rest row by row
+    drop_partitions_before(table, min(cutoffs.values(), default=now - timedelta(days=default_days)), archive)
+    deleted[table] = sum(
+        delete_in_batches(
+            Notification.objects.filter(notification_type_id=type_id, created_at__lt=cutoff),
+            batch_size, archive=archive,
+        )
+        for type_id, cutoff in cutoffs.items()
+    )
+    deleted[BroadcastNotification._meta.db_table] = sum(
+        delete_in_batches(
+            BroadcastNotification.objects.filter(notification_type_id=type_id, created_at__lt=cutoff), batch_size
+        )
+        for type_id, cutoff in cutoffs.items()
+    )
+
+    table = NotificationLog._meta.db_table
+    cutoff = now - timedelta(days=getattr(settings, 'NOTIFICATION_LOG_RETENTION_DAYS', 90))
+    ensure_partitions(table, now)
+    archive = get_archive(table, now, archive_dir)
+    drop_partitions_before(table, cutoff, archive)
+    deleted[table] = delete_in_batches(
+        NotificationLog.objects.filter(created_at__lt=cutoff), batch_size, archive=archive
+    )
+
+    table = RealtimeNotification._meta.db_table
+    cutoff = now - timedelta(days=getattr(settings, 'REALTIME_NOTIFICATION_RETENTION_DAYS', 30))
+    ensure_partitions(table, now)
+    archive = get_archive(table, now, archive_dir)
+    drop_partitions_before(table, cutoff, archive)
+    deleted[table] = delete_in_batches(
+        RealtimeNotification.objects.filter(created_at__lt=cutoff), batch_size, archive=archive
+    ) + delete_in_batches(RealtimeNotification.objects.filter(expires_at__lt=now), batch_size, archive=archive)
+
+    logger.info(f"Pruned notifications: {deleted}")
+    return deleted
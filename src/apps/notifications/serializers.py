@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Notification, NotificationType, UserNotificationPreference, EmailTemplate
+from .models import BroadcastNotification, Notification, NotificationType, UserNotificationPreference, EmailTemplate
 
 
 class NotificationTypeSerializer(serializers.ModelSerializer):
@@ -26,6 +26,37 @@ class NotificationSerializer(serializers.ModelSerializer):
         return timesince(obj.created_at, timezone.now())
 
 
+class BroadcastNotificationSerializer(serializers.ModelSerializer):
+    """
+    A broadcast in the user's feed, with the same fields as a notification.
+    Expects the ``read_at`` annotation from broadcasts.visible_broadcasts
+    """
+    notification_type = NotificationTypeSerializer(read_only=True)
+    status = serializers.SerializerMethodField()
+    sent_at = serializers.DateTimeField(source='created_at', read_only=True)
+    read_at = serializers.DateTimeField(read_only=True)
+    time_ago = serializers.SerializerMethodField()
+    is_broadcast = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = BroadcastNotification
+        fields = [
+            'id', 'notification_type', 'title', 'message', 'status', 'priority',
+            'created_at', 'sent_at', 'read_at', 'time_ago', 'context_data', 'is_broadcast'
+        ]
+    
+    def get_status(self, obj):
+        return 'read' if obj.read_at else 'sent'
+    
+    def get_time_ago(self, obj):
+        from django.utils import timezone
+        from django.utils.timesince import timesince
+        return timesince(obj.created_at, timezone.now())
+    
+    def get_is_broadcast(self, obj):
+        return True
+
+
 class UserNotificationPreferenceSerializer(serializers.ModelSerializer):
     notification_type = NotificationTypeSerializer(read_only=True)
     notification_type_id = serializers.UUIDField(write_only=True)
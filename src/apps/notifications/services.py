@@ -1,14 +1,21 @@
 from django.utils import timezone
+from . import counters
+from .cache import get_notification_type, get_user_preferences
 from .models import Notification, NotificationType, UserNotificationPreference
-from .tasks import send_notification_email, send_admin_notification_email
+from .tasks import enqueue_notification_email, send_admin_notification_email
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from functools import partial
 import logging
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+ADMIN_AUDIENCE_CACHE_KEY = 'notifications:admin_user_ids'
+
 
 class EmailService:
     """
@@ -121,37 +128,24 @@ class NotificationService:
         """
         Send notification to a specific user
         """
-        try:
-            # Get notification type
-            notification_type = NotificationType.objects.get(
-                name=notification_type_name,
-                is_active=True
-            )
-        except NotificationType.DoesNotExist:
+        # Get notification type from the per-process registry
+        notification_type = get_notification_type(notification_type_name)
+        if notification_type is None:
             logger.error(f"Notification type '{notification_type_name}' not found")
             return None
         
-        # Get user preferences
-        try:
-            preferences = UserNotificationPreference.objects.get(
-                user=user,
-                notification_type=notification_type
-            )
-        except UserNotificationPreference.DoesNotExist:
-            # Create default preferences
-            preferences = UserNotificationPreference.objects.create(
-                user=user,
-                notification_type=notification_type,
-                email_enabled=notification_type.default_email_enabled,
-                push_enabled=notification_type.default_push_enabled,
-                in_app_enabled=notification_type.default_in_app_enabled
-            )
+        # Get user preferences; types the user never changed use the type defaults
+        preferences = NotificationService.get_effective_preference(user, notification_type)
         
         # Check if notifications are enabled for this user and type
         if preferences.frequency == 'never':
             logger.info(f"Notifications disabled for user {user.email} and type {notification_type_name}")
             return None
         
+        # Immediate emails go through the outbox; the rest wait for the digest
+        send_now = preferences.frequency == 'immediate' or priority in ['high', 'urgent']
+        email_queued = send_now and preferences.email_enabled
+        
         # Create notification
         notification = Notification.objects.create(
             notification_type=notification_type,
@@ -165,50 +159,134 @@ class NotificationService:
             priority=priority,
             related_song=related_song,
             related_user=related_user,
-            scheduled_for=scheduled_for
+            scheduled_for=scheduled_for,
+            email_status='queued' if email_queued else '',
+            email_queued_at=timezone.now() if email_queued else None,
         )
         
-        # Send immediate notifications or schedule for digest
-        if preferences.frequency == 'immediate' or priority in ['high', 'urgent']:
-            # Send immediately using our ZeptoMail backend
-            if notification.send_email:
-                NotificationService._send_notification_email_direct(notification)
-        else:
-            # Will be sent as digest
+        if email_queued:
+            # Enqueued after commit so the worker sees the row and a rollback sends nothing
+            transaction.on_commit(partial(enqueue_notification_email, notification.id))
+        elif not send_now:
             logger.info(f"Notification {notification.id} scheduled for {preferences.frequency} digest")
         
         logger.info(f"Notification created: {title} for {user.email}")
         return notification
     
+    @staticmethod
+    def default_preference(user, notification_type):
+        """Unsaved preference carrying a type's defaults; rows are only stored once changed"""
+        return UserNotificationPreference(
+            user=user,
+            notification_type=notification_type,
+            email_enabled=notification_type.default_email_enabled,
+            push_enabled=notification_type.default_push_enabled,
+            in_app_enabled=notification_type.default_in_app_enabled,
+            frequency='immediate',
+        )
+    
+    @staticmethod
+    def get_effective_preference(user, notification_type):
+        """The user's stored preference for a type, or the type defaults"""
+        preference = get_user_preferences(user.pk).get(notification_type.pk)
+        if preference is None:
+            return NotificationService.default_preference(user, notification_type)
+        return preference
+    
+    @staticmethod
+    def get_admin_user_ids():
+        """
+        Ids of active admin users, cached in the shared cache and dropped when a
+        user's admin flags change (see signals.refresh_admin_audience)
+        """
+        from django.contrib.auth import get_user_model
+        from django.db.models import Q
+        
+        User = get_user_model()
+        return cache.get_or_set(
+            ADMIN_AUDIENCE_CACHE_KEY,
+            lambda: list(User.objects.filter(
+                Q(is_staff=True) | Q(is_superuser=True) | Q(role='admin'),
+                is_active=True,
+            ).order_by('pk').values_list('pk', flat=True)),
+            getattr(settings, 'ADMIN_AUDIENCE_CACHE_TTL', 300),
+        )
+    
+    @staticmethod
+    def invalidate_admin_audience():
+        cache.delete(ADMIN_AUDIENCE_CACHE_KEY)
+    
     @staticmethod
     def send_admin_notification(title, message, context_data=None):
         """
-        Send notification to all admin users
+        Send notification to all admin users: one query for admins and their
+        preferences, one bulk insert, and a single email task for everyone
+        who has admin emails enabled
         """
         try:
-            # Send email to admin immediately
-            send_admin_notification_email.delay(title, message, context_data)
-            
-            # Also create in-app notifications for admin users
             from django.contrib.auth import get_user_model
-            from django.db import models
+            from django.db.models import FilteredRelation, Q
+            from .realtime import send_notifications_to_users
             
             User = get_user_model()
-            admin_users = User.objects.filter(
-                models.Q(is_staff=True) | models.Q(is_superuser=True) | models.Q(role='admin')
-            )
+            notification_type = get_notification_type('admin_alert')
+            if notification_type is None:
+                logger.error("Notification type 'admin_alert' not found")
             
-            for admin_user in admin_users:
-                NotificationService.send_user_notification(
-                    user=admin_user,
-                    notification_type_name='admin_alert',
-                    title=title,
-                    message=message,
-                    context_data=context_data,
-                    priority='high'
+            notifications = []
+            email_recipients = []
+            admin_ids = NotificationService.get_admin_user_ids()
+            if notification_type and admin_ids:
+                admins = User.objects.filter(pk__in=admin_ids).annotate(
+                    admin_pref=FilteredRelation(
+                        'notification_preferences',
+                        condition=Q(notification_preferences__notification_type=notification_type),
+                    )
+                ).values_list(
+                    'pk', 'email', 'admin_pref__frequency', 'admin_pref__email_enabled',
+                    'admin_pref__push_enabled', 'admin_pref__in_app_enabled',
                 )
+                
+                for user_id, email, frequency, email_enabled, push_enabled, in_app_enabled in admins:
+                    if frequency == 'never':
+                        continue
+                    # No preference row yet: fall back to the type defaults
+                    if frequency is None:
+                        email_enabled = notification_type.default_email_enabled
+                        push_enabled = notification_type.default_push_enabled
+                        in_app_enabled = notification_type.default_in_app_enabled
+                    
+                    notifications.append(Notification(
+                        notification_type=notification_type,
+                        recipient_id=user_id,
+                        title=title,
+                        message=message,
+                        context_data=context_data or {},
+                        send_email=email_enabled,
+                        send_push=push_enabled,
+                        send_in_app=in_app_enabled,
+                        priority='high',
+                    ))
+                    if email_enabled and email:
+                        email_recipients.append(email)
+                
+                Notification.objects.bulk_create(notifications)
+                counters.count_new_notifications(notifications)
+                send_notifications_to_users(
+                    [notification for notification in notifications if notification.send_in_app],
+                    notification_type,
+                )
+            
+            # High priority, so email goes out immediately regardless of digest frequency;
+            # enqueued after commit so the worker sees the rows and a rollback sends nothing
+            transaction.on_commit(partial(
+                send_admin_notification_email.delay,
+                title, message, context_data,
+                recipient_emails=email_recipients,
+                notification_ids=[str(notification.id) for notification in notifications if notification.send_email],
+            ))
             
-            logger.info(f"Admin notification sent: {title}")
+            logger.info(f"Admin notification sent to {len(notifications)} admins: {title}")
             
         except Exception as e:
             logger.error(f"Failed to send admin notification: {str(e)}")
@@ -233,7 +311,7 @@ class NotificationService:
         """
         Get notifications for a user
         """
-        queryset = Notification.objects.filter(recipient=user)
+        queryset = Notification.objects.filter(recipient=user).select_related('notification_type')
         
         if unread_only:
             queryset = queryset.filter(status__in=['pending', 'sent'])
@@ -243,12 +321,10 @@ class NotificationService:
     @staticmethod
     def get_unread_count(user):
         """
-        Get count of unread notifications for a user
+        Get count of unread notifications for a user, broadcasts included
         """
-        return Notification.objects.filter(
-            recipient=user,
-            status__in=['pending', 'sent']
-        ).count()
+        from .broadcasts import unread_broadcast_count
+        return counters.get_unread_count(user.id) + unread_broadcast_count(user)
     
     @staticmethod
     def create_notification_types():
@@ -341,6 +417,13 @@ class NotificationService:
                 'email_subject_template': '[ADMIN] {{ title }}',
                 'email_template_name': 'admin_alert',
             },
+            {
+                'name': 'admin_announcement',
+                'category': 'system',
+                'description': 'Announcements sent from the admin dashboard',
+                'email_subject_template': '{{ title }}',
+                'email_template_name': '',
+            },
         ]
         
         created_count = 0
@@ -354,69 +437,3 @@ class NotificationService:
         
         logger.info(f"Created {created_count} notification types")
         return created_count
-
-    @staticmethod
-    def _send_notification_email_direct(notification):
-        """
-        Send notification email directly using Django's email backend (ZeptoMail)
-        """
-        from django.template.loader import render_to_string
-        from django.core.mail import EmailMessage
-        from django.conf import settings
-        
-        try:
-            # Get the email template name from notification type
-            template_name = notification.notification_type.email_template_name
-            if not template_name:
-                template_name = 'default_email'
-            
-            # Prepare context for template
-            context = {
-                'user': notification.recipient,
-                'notification': notification,
-                'site_name': getattr(settings, 'SITE_NAME', 'Music Distribution Platform'),
-                'frontend_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:5173'),
-                'support_email': getattr(settings, 'DEFAULT_FROM_EMAIL', 'support@zabug.com'),
-                'year': 2025,
-            }
-            
-            # Add context_data from notification
-            if notification.context_data:
-                context.update(notification.context_data)
-            
-            # Render HTML email
-            html_content = render_to_string(
-                f'notifications/{template_name}.html',
-                context
-            )
-            
-            # Create email message
-            subject = notification.title
-            from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'support@zabug.com')
-            to_email = [notification.recipient.email]
-            
-            # Create HTML email
-            email = EmailMessage(
-                subject=subject,
-                body=html_content,
-                from_email=from_email,
-                to=to_email,
-            )
-            email.content_subtype = 'html'  # Set content type to HTML
-            
-            # Send email
-            email.send()
-            
-            # Update notification status
-            notification.status = 'sent'
-            notification.sent_at = timezone.now()
-            notification.save(update_fields=['status', 'sent_at'])
-            
-            logger.info(f"Email sent successfully for notification {notification.id}")
-            
-        except Exception as e:
-            # Mark as failed
-            notification.status = 'failed'
-            notification.save(update_fields=['status'])
-            logger.error(f"Failed to send email for notification {notification.id}: {str(e)}")
-            raise
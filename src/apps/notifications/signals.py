@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Notification, NotificationType, UserNotificationPreference
+from . import counters
+from .cache import invalidate_email_templates, invalidate_notification_types, invalidate_user_preferences
+from .models import EmailTemplate, Notification, NotificationType, UserNotificationPreference
 from .services import NotificationService
 import logging
 
@@ -10,26 +12,13 @@ logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=User)
-def create_user_notification_preferences(sender, instance, created, **kwargs):
+def send_welcome_notification(sender, instance, created, **kwargs):
     """
-    Create default notification preferences for new users
+    Welcome new users. Preferences are not created here: a user only gets a
+    UserNotificationPreference row once they change one, the rest follow the
+    NotificationType defaults
     """
     if created:
-        # Get all active notification types
-        notification_types = NotificationType.objects.filter(is_active=True)
-        
-        for nt in notification_types:
-            UserNotificationPreference.objects.get_or_create(
-                user=instance,
-                notification_type=nt,
-                defaults={
-                    'email_enabled': nt.default_email_enabled,
-                    'push_enabled': nt.default_push_enabled,
-                    'in_app_enabled': nt.default_in_app_enabled,
-                    'frequency': 'immediate',
-                }
-            )
-        
         # Send welcome notification with enhanced context
         try:
             from django.conf import settings
@@ -65,6 +54,29 @@ def create_user_notification_preferences(sender, instance, created, **kwargs):
             logger.error(f"Failed to send welcome notification to {instance.email}: {str(e)}")
 
 
+def _is_admin_audience(user):
+    return user.is_active and (user.is_staff or user.is_superuser or user.role == 'admin')
+
+
+@receiver(post_save, sender=User)
+def refresh_admin_audience(sender, instance, **kwargs):
+    """
+    Drop the cached admin id list when a save moves a user in or out of it
+    """
+    from django.core.cache import cache
+    from .services import ADMIN_AUDIENCE_CACHE_KEY
+    
+    admin_ids = cache.get(ADMIN_AUDIENCE_CACHE_KEY)
+    if admin_ids is not None and (instance.pk in admin_ids) != _is_admin_audience(instance):
+        NotificationService.invalidate_admin_audience()
+
+
+@receiver(post_delete, sender=User)
+def drop_deleted_admin(sender, instance, **kwargs):
+    if _is_admin_audience(instance):
+        NotificationService.invalidate_admin_audience()
+
+
 @receiver(post_save, sender='songs.Song')
 def handle_song_status_change(sender, instance, created, **kwargs):
     """
@@ -296,3 +308,40 @@ def handle_payment_notification(sender, instance, created, **kwargs):
                     },
                     priority='urgent'
                 )
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def invalidate_email_template_cache(sender, instance, **kwargs):
+    """
+    Drop cached EmailTemplate lookups; compiled templates are keyed by
+    updated_at so edited rows never hit a stale entry
+    """
+    invalidate_email_templates()
+
+
+@receiver(post_save, sender=NotificationType)
+@receiver(post_delete, sender=NotificationType)
+def invalidate_notification_type_registry(sender, instance, **kwargs):
+    invalidate_notification_types()
+
+
+@receiver(post_save, sender=UserNotificationPreference)
+@receiver(post_delete, sender=UserNotificationPreference)
+def invalidate_preference_cache(sender, instance, **kwargs):
+    invalidate_user_preferences(instance.user_id)
+
+
+@receiver(post_init, sender=Notification)
+def remember_notification_status(sender, instance, **kwargs):
+    counters.remember_status(instance)
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    counters.track_status_change(instance, counters.NOTIFICATIONS, created=created)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    counters.track_status_change(instance, counters.NOTIFICATIONS, deleted=True)
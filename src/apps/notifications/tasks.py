@@ -1,131 +1,182 @@
 from celery import shared_task
+from kombu.exceptions import OperationalError
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.template.loader import render_to_string, select_template
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F
 from django.utils import timezone
-from .models import Notification, NotificationLog, EmailTemplate
+from datetime import timedelta
+from . import counters
+from .cache import get_active_email_template, render_email_template, render_template_string
+from .models import Notification, NotificationLog
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, retry_backoff=True, max_retries=3)
-def send_notification_email(self, notification_id):
+def build_notification_email(notification):
+    """
+    Render a notification's email: the active DB EmailTemplate named by its
+    type when there is one, otherwise notifications/<email_template_name>.html
+    (falling back to default_email.html)
+    """
+    user = notification.recipient
+    template_name = notification.notification_type.email_template_name
+    context = {
+        'notification': notification,
+        'user': user,
+        'recipient_name': user.get_full_name(),
+        'title': notification.title,
+        'message': notification.message,
+        'site_name': getattr(settings, 'SITE_NAME', 'Music Distribution Platform'),
+        'frontend_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:5173'),
+        'support_email': settings.DEFAULT_FROM_EMAIL,
+        'year': timezone.now().year,
+        **(notification.context_data or {})
+    }
+    
+    template = get_active_email_template(template_name) if template_name else None
+    if template:
+        subject = render_email_template(template, 'subject_template', context)
+        html_content = render_email_template(template, 'html_template', context)
+        text_content = render_email_template(template, 'text_template', context) if template.text_template else None
+    else:
+        subject = notification.title
+        html_content = select_template([
+            f'notifications/{template_name or "default_email"}.html',
+            'notifications/default_email.html',
+        ]).render(context)
+        text_content = notification.message
+    
+    email = EmailMultiAlternatives(
+        subject=subject.strip(),
+        body=text_content or notification.message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+        reply_to=[settings.DEFAULT_FROM_EMAIL],
+    )
+    if html_content:
+        email.attach_alternative(html_content, "text/html")
+    return email
+
+
+def enqueue_notification_email(notification_id):
     """
-    Send notification email asynchronously
+    Hand a queued notification to the email workers. Called on commit, so
+    the worker always finds the row; a broker failure leaves the row queued
+    for requeue_stale_notification_emails instead of failing the request.
     """
     try:
-        notification = Notification.objects.get(id=notification_id)
-        
-        if not notification.send_email:
-            logger.info(f"Email disabled for notification {notification_id}")
-            return
-        
-        # Get user's email preferences
-        user = notification.recipient
-        if not user.email or not user.profile.email_notifications:
-            logger.info(f"User {user.email} has email notifications disabled")
-            return
-        
-        # Get email template
-        template = None
-        if notification.notification_type.email_template_name:
-            try:
-                template = EmailTemplate.objects.get(
-                    name=notification.notification_type.email_template_name,
-                    is_active=True
-                )
-            except EmailTemplate.DoesNotExist:
-                pass
-        
-        # Prepare context data
-        context = {
-            'notification': notification,
-            'user': user,
-            'recipient_name': user.get_full_name(),
-            'title': notification.title,
-            'message': notification.message,
-            'site_name': 'Music Distribution Platform',
-            'frontend_url': settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173',
-            **notification.context_data
-        }
-        
-        # Render email content
-        if template:
-            subject = render_to_string_from_template(template.subject_template, context)
-            html_content = render_to_string_from_template(template.html_template, context)
-            text_content = render_to_string_from_template(template.text_template, context) if template.text_template else None
+        send_notification_email.apply_async((str(notification_id),), retry=False)
+    except OperationalError as exc:
+        if getattr(settings, 'NOTIFICATION_EMAIL_INLINE_FALLBACK', False):
+            logger.warning(f"Email queue unavailable ({exc}), sending notification {notification_id} inline")
+            send_notification_email.apply((str(notification_id),))
         else:
-            # Fallback to default template
-            subject = notification.title
-            html_content = render_to_string('notifications/default_email.html', context)
-            text_content = notification.message
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject.strip(),
-            body=text_content or notification.message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
-            reply_to=[settings.DEFAULT_FROM_EMAIL],
-        )
-        
-        if html_content:
-            email.attach_alternative(html_content, "text/html")
-        
-        email.send(fail_silently=False)
-        
-        # Log successful send
+            logger.error(f"Failed to enqueue email for notification {notification_id}: {str(exc)}")
+
+
+@shared_task(bind=True, acks_late=True, max_retries=getattr(settings, 'NOTIFICATION_EMAIL_MAX_RETRIES', 5))
+def send_notification_email(self, notification_id):
+    """
+    Deliver one queued notification email. The queued -> sending claim makes
+    duplicate deliveries (sweeper re-enqueue, redelivered messages) no-ops.
+    """
+    claimed = Notification.objects.filter(id=notification_id, email_status='queued').update(
+        email_status='sending',
+        email_attempts=F('email_attempts') + 1,
+    )
+    if not claimed:
+        logger.info(f"Email for notification {notification_id} is not queued, skipping")
+        return
+    
+    notification = Notification.objects.select_related('recipient', 'notification_type').get(id=notification_id)
+    user = notification.recipient
+    try:
+        email_notifications = user.profile.email_notifications
+    except ObjectDoesNotExist:
+        email_notifications = True
+    if not user.email or not email_notifications:
+        logger.info(f"User {user.email} has email notifications disabled")
+        Notification.objects.filter(id=notification_id).update(email_status='')
+        return
+    
+    try:
+        build_notification_email(notification).send(fail_silently=False)
+    except Exception as exc:
         NotificationLog.objects.create(
             notification=notification,
             channel='email',
-            status='sent'
+            status='failed',
+            error_message=str(exc)
         )
-        
-        # Update notification status
-        notification.mark_as_sent()
-        
-        logger.info(f"Email sent successfully for notification {notification_id}")
-        
-    except Notification.DoesNotExist:
-        logger.error(f"Notification {notification_id} not found")
-    except Exception as exc:
-        logger.error(f"Failed to send email for notification {notification_id}: {str(exc)}")
-        
-        # Log failed send
-        try:
-            notification = Notification.objects.get(id=notification_id)
-            NotificationLog.objects.create(
-                notification=notification,
-                channel='email',
-                status='failed',
-                error_message=str(exc)
+        # The provider may have delivered it; retrying could send a duplicate
+        delivery_unknown = any(result.unknown for result in getattr(exc, 'results', None) or [])
+        if self.request.retries < self.max_retries and not delivery_unknown:
+            Notification.objects.filter(id=notification_id).update(
+                email_status='queued', email_queued_at=timezone.now()
             )
-        except:
-            pass
+            backoff_max = getattr(settings, 'NOTIFICATION_EMAIL_RETRY_BACKOFF_MAX', 600)
+            countdown = min(backoff_max, 30 * 2 ** self.request.retries)
+            logger.warning(f"Email for notification {notification_id} failed, retrying in {countdown}s: {str(exc)}")
+            raise self.retry(exc=exc, countdown=countdown)
         
-        # Retry the task
-        raise self.retry(exc=exc, countdown=60)
+        logger.error(f"Failed to send email for notification {notification_id}: {str(exc)}")
+        Notification.objects.filter(id=notification_id).update(email_status='failed', status='failed')
+        if notification.status in counters.unread_statuses(counters.NOTIFICATIONS):
+            counters.adjust_unread_count(notification.recipient_id, -1)
+        return
+    
+    NotificationLog.objects.create(notification=notification, channel='email', status='sent')
+    Notification.objects.filter(id=notification_id).update(email_status='sent')
+    notification.mark_as_sent()
+    logger.info(f"Email sent successfully for notification {notification_id}")
+
+
+@shared_task
+def requeue_stale_notification_emails():
+    """
+    Periodic sweep: re-enqueue outbox rows that were never picked up (broker
+    down at commit time) or whose worker died mid-send
+    """
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'NOTIFICATION_EMAIL_REQUEUE_AFTER', 900))
+    stale = Notification.objects.filter(
+        email_status__in=['queued', 'sending'],
+        email_queued_at__lt=stale_before,
+    )
+    stale_ids = list(stale.values_list('id', flat=True)[:1000])
+    Notification.objects.filter(id__in=stale_ids).update(email_status='queued', email_queued_at=timezone.now())
+    for notification_id in stale_ids:
+        enqueue_notification_email(notification_id)
+    
+    if stale_ids:
+        logger.info(f"Re-enqueued {len(stale_ids)} stale notification emails")
+    return len(stale_ids)
 
 
 @shared_task
-def send_admin_notification_email(subject, message, context_data=None):
+def send_admin_notification_email(subject, message, context_data=None, recipient_emails=None, notification_ids=None):
     """
-    Send notification email to all admin users
+    Send one notification email to the admin audience. ``recipient_emails`` is
+    resolved by NotificationService.send_admin_notification; without it every
+    admin user is emailed. ``notification_ids`` are marked sent or failed.
     """
+    notification_ids = notification_ids or []
     try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
         # Get all admin emails
         admin_emails = list(settings.NOTIFICATION_EMAILS) if hasattr(settings, 'NOTIFICATION_EMAILS') else []
         
-        # Add admin users' emails
-        from django.db import models
-        admin_users = User.objects.filter(
-            models.Q(is_staff=True) | models.Q(is_superuser=True) | models.Q(role='admin')
-        ).values_list('email', flat=True)
-        admin_emails.extend(admin_users)
+        if recipient_emails is not None:
+            admin_emails.extend(recipient_emails)
+        else:
+            from django.contrib.auth import get_user_model
+            from django.db import models
+            User = get_user_model()
+            admin_users = User.objects.filter(
+                models.Q(is_staff=True) | models.Q(is_superuser=True) | models.Q(role='admin')
+            ).values_list('email', flat=True)
+            admin_emails.extend(admin_users)
         
         # Remove duplicates and empty emails
         admin_emails = list(set(filter(None, admin_emails)))
@@ -159,116 +210,50 @@ def send_admin_notification_email(subject, message, context_data=None):
         email.attach_alternative(html_content, "text/html")
         email.send(fail_silently=False)
         
+        Notification.objects.filter(id__in=notification_ids).update(status='sent', sent_at=timezone.now())
         logger.info(f"Admin notification sent to {len(admin_emails)} admins: {subject}")
         
     except Exception as exc:
+        failed = Notification.objects.filter(
+            id__in=notification_ids, status__in=counters.unread_statuses(counters.NOTIFICATIONS)
+        )
+        recipient_ids = list(failed.values_list('recipient_id', flat=True))
+        failed.update(status='failed')
+        counters.adjust_unread_counts({recipient_id: -1 for recipient_id in recipient_ids})
         logger.error(f"Failed to send admin notification: {str(exc)}")
 
 
 @shared_task
-def send_digest_notifications():
+def send_digest_notifications(frequency=None):
     """
-    Send digest notifications (hourly, daily, weekly)
+    Send hourly, daily and weekly digests; with ``frequency`` only that one.
+    Schedule it at least as often as the shortest period in use: each user's
+    digest goes out once their period has elapsed since the last one.
     """
-    from django.db import models
-    from .models import UserNotificationPreference
-    
-    # Get users who want digest notifications
-    digest_preferences = UserNotificationPreference.objects.filter(
-        frequency__in=['hourly', 'daily', 'weekly']
-    ).select_related('user', 'notification_type')
-    
-    # Group by user and frequency
-    user_digests = {}
-    for pref in digest_preferences:
-        user_id = pref.user.id
-        frequency = pref.frequency
-        
-        if user_id not in user_digests:
-            user_digests[user_id] = {}
-        if frequency not in user_digests[user_id]:
-            user_digests[user_id][frequency] = []
-        
-        user_digests[user_id][frequency].append(pref)
-    
-    # Send digest emails
-    for user_id, frequencies in user_digests.items():
-        for frequency, preferences in frequencies.items():
-            send_user_digest_email.delay(user_id, frequency, [p.id for p in preferences])
+    from .digest import PERIODS, send_digests
+
+    return {
+        name: send_digests(name)
+        for name in ([frequency] if frequency else PERIODS)
+    }
 
 
 @shared_task
-def send_user_digest_email(user_id, frequency, preference_ids):
-    """
-    Send digest email to a specific user
-    """
-    try:
-        from django.contrib.auth import get_user_model
-        from .models import UserNotificationPreference
-        User = get_user_model()
-        
-        user = User.objects.get(id=user_id)
-        
-        # Get recent notifications for this user and preferences
-        from datetime import timedelta
-        
-        time_ranges = {
-            'hourly': timedelta(hours=1),
-            'daily': timedelta(days=1),
-            'weekly': timedelta(weeks=1),
-        }
-        
-        since = timezone.now() - time_ranges[frequency]
-        
-        notifications = Notification.objects.filter(
-            recipient=user,
-            created_at__gte=since,
-            notification_type__id__in=[
-                pref.notification_type.id 
-                for pref in UserNotificationPreference.objects.filter(id__in=preference_ids)
-            ]
-        ).order_by('-created_at')
-        
-        if not notifications.exists():
-            return
-        
-        # Prepare context
-        context = {
-            'user': user,
-            'frequency': frequency,
-            'notifications': notifications,
-            'notification_count': notifications.count(),
-            'site_name': 'Music Distribution Platform',
-            'frontend_url': settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173',
-        }
-        
-        # Render email content
-        subject = f"Your {frequency} music platform digest - {notifications.count()} updates"
-        html_content = render_to_string('notifications/digest_email.html', context)
-        text_content = render_to_string('notifications/digest_email.txt', context)
-        
-        # Send email
-        email = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
-            reply_to=[settings.DEFAULT_FROM_EMAIL],
-        )
-        
-        email.attach_alternative(html_content, "text/html")
-        email.send(fail_silently=False)
-        
-        logger.info(f"Digest email sent to {user.email} ({frequency})")
-        
-    except Exception as exc:
-        logger.error(f"Failed to send digest email: {str(exc)}")
+def prune_notifications():
+    """Delete (and optionally archive) notifications past retention; see retention.py"""
+    from .retention import prune_notifications as prune
+
+    return prune()
+
+
+@shared_task
+def reconcile_unread_counters():
+    """Recount stored unread badge counters to correct drift; see counters.py"""
+    return counters.reconcile_unread_counters()
 
 
 def render_to_string_from_template(template_string, context):
     """
     Render a template string with context
     """
-    from django.template import Context, Template
-    template = Template(template_string)
-    return template.render(Context(context))
+    return render_template_string(template_string, context)
@@ -0,0 +1,976 @@
+import glob
+import gzip
+import json
+import os
+import smtplib
+import socket
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import requests
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core import mail
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from loadtests.stubs import StubState, start_stubs
+from music_distribution_backend.celery import app as celery_app
+from src.apps.notifications import broadcasts, counters
+from src.apps.notifications.cache import (
+    FormatTemplate, LRUCache, compiled_templates, get_active_email_template, get_notification_type,
+    get_user_preferences, invalidate_email_templates, parse_template, render_email_template,
+)
+from src.apps.notifications.digest import send_digests
+from src.apps.notifications.email_backends import (
+    HybridEmailBackend, SendResult, TokenBucket, ZeptoMailAPIBackend, ZeptoMailError, close_smtp_connection,
+    get_provider_health, reset_provider_health, reset_shared_clients,
+)
+from src.apps.notifications.models import (
+    BroadcastNotification, BroadcastReceipt, EmailTemplate, Notification, NotificationDigestState, NotificationLog, NotificationType,
+    UserNotificationPreference,
+)
+from src.apps.notifications.retention import delete_in_batches, prune_notifications
+from src.apps.notifications.services import ADMIN_AUDIENCE_CACHE_KEY, NotificationService
+from src.apps.notifications.tasks import requeue_stale_notification_emails, send_notification_email
+from src.apps.realtime_notifications.models import NotificationTemplate, RealtimeNotification
+from src.apps.realtime_notifications.services import RealtimeNotificationService
+
+User = get_user_model()
+
+
+class ZeptoMailStubMixin:
+    """Runs the loadtests ZeptoMail stub for the class and points the backend at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_stubs()
+        cls.settings_override = override_settings(
+            ZEPTOMAIL_API_KEY='stub-key',
+            ZEPTOMAIL_API_URL=f'{cls.server.base_url}/zeptomail/v1.1/email',
+            ZEPTOMAIL_BATCH_API_URL='',
+            ZEPTOMAIL_RATE_LIMIT=0,
+            ZEPTOMAIL_MAX_CONCURRENCY=4,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        reset_shared_clients()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.state = StubState()
+        reset_shared_clients()
+
+    def announcement(self, recipient, subject='Release day'):
+        return EmailMessage(subject, 'Your song is live', 'noreply@example.com', [recipient])
+
+
+class ZeptoMailBackendTests(ZeptoMailStubMixin, SimpleTestCase):
+    def test_identical_single_recipient_messages_are_batched(self):
+        messages = [self.announcement(f'artist{i}@example.com') for i in range(5)]
+        messages.append(EmailMessage('Release day', 'Your song is live', 'noreply@example.com',
+                                     ['label@example.com'], cc=['manager@example.com']))
+
+        results = ZeptoMailAPIBackend().send_messages_detailed(messages)
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual([result.message for result in results], messages)
+        self.assertEqual([result.batched for result in results], [True] * 5 + [False])
+        self.assertEqual(self.server.state.hits, {'zeptomail_batch': 1, 'zeptomail_send': 1})
+        batch_payload = next(payload for route, payload in self.server.state.received if route == 'zeptomail_batch')
+        self.assertEqual(len(batch_payload['to']), 5)
+
+    @override_settings(ZEPTOMAIL_BATCH_SIZE=2)
+    def test_batches_are_split_at_batch_size(self):
+        messages = [self.announcement(f'artist{i}@example.com') for i in range(5)]
+
+        sent = ZeptoMailAPIBackend().send_messages(messages)
+
+        self.assertEqual(sent, 5)
+        # 2 + 2 through the batch endpoint, the odd one out as a single send
+        self.assertEqual(self.server.state.hits, {'zeptomail_batch': 2, 'zeptomail_send': 1})
+
+    def test_per_message_outcomes(self):
+        self.server.state.fail_addresses = {'bounce@example.com'}
+        messages = [
+            self.announcement('ok@example.com', subject='One'),
+            self.announcement('bounce@example.com', subject='Two'),
+            self.announcement('fine@example.com', subject='Three'),
+        ]
+
+        results = ZeptoMailAPIBackend().send_messages_detailed(messages)
+
+        self.assertEqual([result.success for result in results], [True, False, True])
+        self.assertEqual(results[1].status_code, 400)
+        self.assertIn('Invalid recipient', results[1].error)
+        self.assertIsNotNone(results[0].request_id)
+
+        self.assertEqual(ZeptoMailAPIBackend(fail_silently=True).send_messages(messages), 2)
+        with self.assertRaises(ZeptoMailError) as raised:
+            ZeptoMailAPIBackend().send_messages(messages)
+        self.assertEqual(len(raised.exception.results), 3)
+
+    def test_rate_limited_requests_are_retried(self):
+        self.server.state.throttle_next = 1
+
+        results = ZeptoMailAPIBackend().send_messages_detailed([self.announcement('artist@example.com')])
+
+        self.assertTrue(results[0].success)
+        self.assertEqual(self.server.state.hits['zeptomail_send'], 2)
+
+    def test_refused_connections_are_retried(self):
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+
+        with override_settings(ZEPTOMAIL_API_URL=f'http://127.0.0.1:{port}/v1.1/email', ZEPTOMAIL_MAX_RETRIES=2), \
+                mock.patch('requests.Session.post', side_effect=requests.Session.post, autospec=True) as post:
+            results = ZeptoMailAPIBackend().send_messages_detailed([self.announcement('artist@example.com')])
+
+        self.assertFalse(results[0].success)
+        self.assertFalse(results[0].unknown)
+        self.assertEqual(post.call_count, 3)
+
+    @override_settings(ZEPTOMAIL_TIMEOUT=0.05)
+    def test_read_timeouts_are_unknown_and_not_retried(self):
+        self.server.state.latency = 0.3
+
+        results = ZeptoMailAPIBackend().send_messages_detailed([self.announcement('artist@example.com')])
+
+        self.assertFalse(results[0].success)
+        self.assertTrue(results[0].unknown)
+        self.assertIsNone(results[0].status_code)
+        self.assertEqual(self.server.state.hits['zeptomail_send'], 1)
+
+    def test_html_alternative_is_sent_as_htmlbody(self):
+        message = EmailMultiAlternatives('Hi', 'plain', 'noreply@example.com', ['artist@example.com'])
+        message.attach_alternative('<p>rich</p>', 'text/html')
+
+        ZeptoMailAPIBackend().send_messages([message])
+
+        _route, payload = self.server.state.received[-1]
+        self.assertEqual(payload['textbody'], 'plain')
+        self.assertEqual(payload['htmlbody'], '<p>rich</p>')
+
+    @override_settings(ZEPTOMAIL_MAX_CONCURRENCY=1)
+    def test_connections_are_reused(self):
+        messages = [self.announcement('artist@example.com', subject=f'Update {i}') for i in range(10)]
+
+        ZeptoMailAPIBackend().send_messages(messages)
+        ZeptoMailAPIBackend().send_messages(messages)
+
+        self.assertEqual(self.server.state.hits['zeptomail_send'], 20)
+        self.assertEqual(self.server.state.connections, 1)
+
+    def test_dispatch_is_concurrent_and_bounded(self):
+        self.server.state.latency = 0.05
+        messages = [self.announcement('artist@example.com', subject=f'Update {i}') for i in range(12)]
+
+        started = time.monotonic()
+        ZeptoMailAPIBackend().send_messages(messages)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 12 * 0.05)
+        self.assertGreater(self.server.state.max_in_flight, 1)
+        self.assertLessEqual(self.server.state.max_in_flight, 4)
+        self.assertLessEqual(self.server.state.connections, 4)
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; records connections and deliveries on the class."""
+    instances = 0
+    delivered = []
+    refuse = set()
+    disconnect_next = False
+
+    def __init__(self, host, port, local_hostname=None, timeout=None):
+        type(self).instances += 1
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if type(self).disconnect_next:
+            type(self).disconnect_next = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        refused = set(to_addrs) & type(self).refuse
+        if refused:
+            raise smtplib.SMTPRecipientsRefused({address: (550, b'No such user') for address in refused})
+        type(self).delivered.extend(to_addrs)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@override_settings(EMAIL_HOST='smtp.example.com', EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+                   EMAIL_FAILOVER_THRESHOLD=2, EMAIL_FAILOVER_COOLDOWN=60)
+class HybridEmailBackendTests(ZeptoMailStubMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_provider_health()
+        close_smtp_connection()
+        FakeSMTP.instances = 0
+        FakeSMTP.delivered = []
+        FakeSMTP.refuse = set()
+        FakeSMTP.disconnect_next = False
+        patcher = mock.patch('smtplib.SMTP', FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_smtp_connection)
+
+    def test_only_failed_messages_fall_back_to_smtp(self):
+        self.server.state.fail_addresses = {'middle@example.com'}
+        messages = [
+            self.announcement('first@example.com', subject='One'),
+            self.announcement('middle@example.com', subject='Two'),
+            self.announcement('last@example.com', subject='Three'),
+        ]
+
+        results = HybridEmailBackend().send_messages_detailed(messages)
+
+        self.assertEqual([result.provider for result in results], ['zeptomail', 'smtp', 'zeptomail'])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(FakeSMTP.delivered, ['middle@example.com'])
+        self.assertEqual(self.server.state.hits['zeptomail_send'], 3)
+
+    def test_smtp_connection_is_kept_across_sends(self):
+        self.server.state.error_rate = 1
+
+        with override_settings(EMAIL_FAILOVER_THRESHOLD=100):
+            for subject in ('One', 'Two', 'Three'):
+                sent = HybridEmailBackend().send_messages([
+                    self.announcement('a@example.com', subject=subject),
+                    self.announcement('b@example.com', subject=subject),
+                ])
+                self.assertEqual(sent, 2)
+
+        self.assertEqual(len(FakeSMTP.delivered), 6)
+        self.assertEqual(FakeSMTP.instances, 1)
+
+    def test_stale_smtp_connection_is_replaced(self):
+        self.server.state.error_rate = 1
+        HybridEmailBackend().send_messages([self.announcement('a@example.com')])
+        FakeSMTP.disconnect_next = True
+
+        sent = HybridEmailBackend().send_messages([self.announcement('b@example.com', subject='Later')])
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(FakeSMTP.delivered, ['a@example.com', 'b@example.com'])
+        self.assertEqual(FakeSMTP.instances, 2)
+
+    def test_unhealthy_api_is_bypassed_until_cooldown(self):
+        self.server.state.error_rate = 1
+
+        for index in range(4):
+            HybridEmailBackend().send_messages([self.announcement('a@example.com', subject=f'Try {index}')])
+
+        # Two failures open the circuit; the next two go straight to SMTP
+        self.assertEqual(self.server.state.hits['zeptomail_send'], 2)
+        self.assertEqual(len(FakeSMTP.delivered), 4)
+
+        # After the cooldown one trial request goes to the API again
+        self.server.state.error_rate = 0
+        get_provider_health('zeptomail').opened_at -= 60
+        results = HybridEmailBackend().send_messages_detailed([self.announcement('a@example.com', subject='Trial')])
+        self.assertEqual(results[0].provider, 'zeptomail')
+        self.assertFalse(get_provider_health('zeptomail').is_open)
+
+    @override_settings(ZEPTOMAIL_TIMEOUT=0.05)
+    def test_unanswered_api_calls_do_not_fail_over(self):
+        self.server.state.latency = 0.3
+
+        results = HybridEmailBackend(fail_silently=True).send_messages_detailed([self.announcement('a@example.com')])
+
+        self.assertFalse(results[0].success)
+        self.assertTrue(results[0].unknown)
+        self.assertEqual(results[0].provider, 'zeptomail')
+        self.assertEqual(FakeSMTP.delivered, [])
+
+    def test_unreachable_api_fails_over(self):
+        with override_settings(ZEPTOMAIL_API_URL='http://127.0.0.1:9/v1.1/email', ZEPTOMAIL_MAX_RETRIES=0):
+            results = HybridEmailBackend().send_messages_detailed([self.announcement('a@example.com')])
+
+        self.assertEqual(results[0].provider, 'smtp')
+        self.assertTrue(results[0].success)
+        self.assertEqual(FakeSMTP.delivered, ['a@example.com'])
+
+    def test_rejections_do_not_trip_the_breaker(self):
+        self.server.state.fail_addresses = {'bounce@example.com'}
+        FakeSMTP.refuse = {'bounce@example.com'}
+
+        for index in range(3):
+            results = HybridEmailBackend(fail_silently=True).send_messages_detailed(
+                [self.announcement('bounce@example.com', subject=f'Try {index}')]
+            )
+            self.assertFalse(results[0].success)
+
+        self.assertFalse(get_provider_health('zeptomail').is_open)
+        self.assertFalse(get_provider_health('smtp').is_open)
+        with self.assertRaises(ZeptoMailError):
+            HybridEmailBackend().send_messages([self.announcement('bounce@example.com')])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_refill_rate(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+
+        started = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(5):
+            bucket.acquire()
+        total = time.monotonic() - started
+
+        self.assertLess(burst, 0.05)
+        # five more tokens at 50/s take ~100ms
+        self.assertGreaterEqual(total, 0.08)
+
+    def test_zero_rate_disables_limiting(self):
+        bucket = TokenBucket(rate=0, capacity=0)
+        started = time.monotonic()
+        for _ in range(1000):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.1)
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+
+        with mock.patch('src.apps.notifications.cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+
+
+class FormatTemplateTests(SimpleTestCase):
+    def test_plain_variables_use_the_format_path_with_template_output(self):
+        context = {'user': {'name': '<Ada & Bo>'}, 'count': 3, 'songs': ['One', 'Two']}
+        for source in ('Hi {{ user.name }}, {{ count }} {songs}: {{ songs.1 }}{{ missing }}', 'No variables {'):
+            compiled = parse_template(source)
+            self.assertIsInstance(compiled, FormatTemplate)
+            self.assertEqual(compiled.render(context), Template(source).render(Context(context)))
+
+    def test_tags_and_filters_fall_back_to_django(self):
+        for source in ('{% if count %}yes{% endif %}', '{{ count|add:1 }}', '{# note #}{{ count }}'):
+            self.assertIsInstance(parse_template(source), Template)
+
+
+class NotificationTemplateCacheTests(TestCase):
+    def setUp(self):
+        self.template = NotificationTemplate.objects.create(
+            name='song_live', notification_type='admin_alert',
+            title_template='{{ song }} is live', message_template='{% if song %}Listen to {{ song }}{% endif %}',
+        )
+
+    def test_rows_and_compiled_fields_are_reused_across_recipients(self):
+        service = RealtimeNotificationService()
+        with self.assertNumQueries(1):
+            # One lookup and one parse per field, however many recipients
+            for _ in range(3):
+                fields = service.render_template('song_live', {'song': 'Blue'}, None, None, None, None, 'normal', 60)
+        self.assertEqual(fields[:2], ('Blue is live', 'Listen to Blue'))
+        self.assertEqual(compiled_templates.misses, 2)
+        self.assertEqual(compiled_templates.hits, 4)
+
+        self.template.title_template = 'Out now: {{ song }}'
+        self.template.save()
+        fields = service.render_template('song_live', {'song': 'Blue'}, None, None, None, None, 'normal', 60)
+        self.assertEqual(fields[0], 'Out now: Blue')
+
+
+class EmailTemplateCacheTests(TestCase):
+    def setUp(self):
+        compiled_templates.clear()
+        invalidate_email_templates()
+        self.template = EmailTemplate.objects.create(
+            name='song_approved',
+            template_type='transactional',
+            subject_template='{{ title }} is live',
+            html_template='<p>Hi {{ name }}</p>',
+        )
+
+    def test_template_is_compiled_once(self):
+        for name in ('Ada', 'Bo', 'Cy'):
+            html = render_email_template(self.template, 'html_template', {'name': name})
+
+        self.assertEqual(html, '<p>Hi Cy</p>')
+        self.assertEqual(compiled_templates.misses, 1)
+        self.assertEqual(compiled_templates.hits, 2)
+
+    def test_edited_template_gets_a_new_entry(self):
+        render_email_template(self.template, 'subject_template', {'title': 'Song'})
+        self.template.subject_template = 'Now live: {{ title }}'
+        self.template.save()
+
+        subject = render_email_template(self.template, 'subject_template', {'title': 'Song'})
+
+        self.assertEqual(subject, 'Now live: Song')
+        self.assertEqual(compiled_templates.misses, 2)
+
+    def test_lookups_are_cached_until_save(self):
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertEqual(get_active_email_template('song_approved'), self.template)
+                self.assertIsNone(get_active_email_template('missing'))
+
+        self.template.is_active = False
+        self.template.save()
+
+        self.assertIsNone(get_active_email_template('song_approved'))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class AdminNotificationFanOutTests(TestCase):
+    def setUp(self):
+        cache.delete(ADMIN_AUDIENCE_CACHE_KEY)
+        self.addCleanup(cache.delete, ADMIN_AUDIENCE_CACHE_KEY)
+        self.alert_type = NotificationType.objects.create(name='admin_alert', category='admin')
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([
+            User(email='staff@example.com', username='staff', is_staff=True),
+            User(email='quiet@example.com', username='quiet', role='admin'),
+            User(email='muted@example.com', username='muted', is_superuser=True),
+            User(email='former@example.com', username='former', is_staff=True, is_active=False),
+            User(email='artist@example.com', username='artist', role='artist'),
+        ])
+        UserNotificationPreference.objects.create(
+            user=User.objects.get(username='quiet'), notification_type=self.alert_type, email_enabled=False
+        )
+        UserNotificationPreference.objects.create(
+            user=User.objects.get(username='muted'), notification_type=self.alert_type, frequency='never'
+        )
+        patcher = mock.patch('src.apps.notifications.services.send_admin_notification_email')
+        self.email_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_admins_are_notified_in_a_fixed_number_of_queries(self):
+        NotificationService.get_admin_user_ids()
+
+        # type, cached admin ids, admins + preferences, bulk insert, unread counters
+        with self.assertNumQueries(5), self.captureOnCommitCallbacks() as callbacks:
+            NotificationService.send_admin_notification('New upload', 'Review it', {'song_id': '1'})
+        # Nothing is enqueued until the transaction commits
+        self.email_task.delay.assert_not_called()
+        for callback in callbacks:
+            callback()
+
+        recipients = set(Notification.objects.values_list('recipient__username', flat=True))
+        self.assertEqual(recipients, {'staff', 'quiet'})
+        self.email_task.delay.assert_called_once()
+        kwargs = self.email_task.delay.call_args.kwargs
+        self.assertEqual(kwargs['recipient_emails'], ['staff@example.com'])
+        self.assertEqual(kwargs['notification_ids'],
+                         [str(Notification.objects.get(recipient__username='staff').id)])
+
+    def test_admin_list_is_invalidated_on_flag_change(self):
+        NotificationService.send_admin_notification('First', 'Message')
+        artist = User.objects.get(username='artist')
+        artist.is_staff = True
+        artist.save()
+
+        NotificationService.send_admin_notification('Second', 'Message')
+
+        self.assertTrue(Notification.objects.filter(recipient=artist, title='Second').exists())
+        self.assertIn(artist.pk, cache.get(ADMIN_AUDIENCE_CACHE_KEY))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationPreferenceCacheTests(TestCase):
+    def setUp(self):
+        call_command('setup_realtime_notifications', stdout=StringIO())
+        self.welcome = NotificationType.objects.create(name='user_welcome', category='system')
+        self.login = NotificationType.objects.create(name='user_login', category='system', default_email_enabled=False)
+        self.user = User.objects.create_user(
+            email='pref@example.com', username='pref', first_name='Pref', last_name='User', password='Testpass123!'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_registration_stores_no_preference_rows(self):
+        self.assertFalse(UserNotificationPreference.objects.filter(user=self.user).exists())
+        self.assertTrue(Notification.objects.filter(recipient=self.user, notification_type=self.welcome).exists())
+
+    def test_sending_on_a_warm_cache_only_inserts(self):
+        NotificationService.send_user_notification(self.user, 'user_login', 'Login', 'New login')
+
+        # The insert and its unread counter bump
+        with self.assertNumQueries(2):
+            notification = NotificationService.send_user_notification(self.user, 'user_login', 'Login', 'Again')
+
+        self.assertFalse(notification.send_email)
+
+    def test_registry_and_preferences_are_invalidated_on_save(self):
+        NotificationService.send_user_notification(self.user, 'user_login', 'Login', 'New login')
+        self.login.is_active = False
+        self.login.save()
+        self.assertIsNone(get_notification_type('user_login'))
+
+        UserNotificationPreference.objects.create(user=self.user, notification_type=self.welcome, frequency='never')
+
+        self.assertIsNone(NotificationService.send_user_notification(self.user, 'user_welcome', 'Hi', 'Hello'))
+        self.assertEqual(set(get_user_preferences(self.user.pk)), {self.welcome.pk})
+
+    def test_unknown_types_reload_the_registry_once(self):
+        get_notification_type('user_login')
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_notification_type('never_seeded'))
+            self.assertIsNone(get_notification_type('never_seeded'))
+            self.assertIsNotNone(get_notification_type('user_login'))
+
+        # A save clears the negative entry along with the registry
+        NotificationType.objects.create(name='never_seeded', category='system')
+        self.assertIsNotNone(get_notification_type('never_seeded'))
+
+    def test_defaults_are_listed_without_materializing_rows(self):
+        response = self.client.get('/api/notifications/preferences/defaults/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([pref['notification_type']['name'] for pref in response.data], ['user_login', 'user_welcome'])
+        self.assertIsNone(response.data[0]['id'])
+        self.assertFalse(response.data[0]['email_enabled'])
+        self.assertFalse(UserNotificationPreference.objects.exists())
+
+    def test_bulk_update_stores_only_changed_types(self):
+        response = self.client.post('/api/notifications/preferences/bulk_update/', {'preferences': [
+            {'notification_type_id': str(self.login.pk), 'email_enabled': False, 'frequency': 'immediate'},
+            {'notification_type_id': str(self.welcome.pk), 'email_enabled': False},
+        ]}, format='json')
+
+        self.assertEqual(response.data, {'updated': 1})
+        stored = UserNotificationPreference.objects.get(user=self.user)
+        self.assertEqual((stored.notification_type, stored.email_enabled), (self.welcome, False))
+
+
+class NotificationEmailOutboxTests(TestCase):
+    def setUp(self):
+        conf = celery_app.conf
+        self.addCleanup(conf.update, task_always_eager=conf.task_always_eager,
+                        task_eager_propagates=conf.task_eager_propagates)
+        conf.update(task_always_eager=True, task_eager_propagates=True)
+
+        NotificationType.objects.create(name='song_approved', category='music', email_template_name='song_approved')
+        NotificationType.objects.create(name='song_submitted', category='music', email_template_name='song_submitted')
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([User(email='outbox@example.com', username='outbox', first_name='Out')])
+        self.user = User.objects.get(username='outbox')
+
+    def notify(self, name='song_approved', **kwargs):
+        return NotificationService.send_user_notification(
+            self.user, name, 'Approved', 'Your song is live', context_data={'song_title': 'Song'}, **kwargs
+        )
+
+    def test_email_is_enqueued_after_commit_not_sent_inline(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            notification = self.notify()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(notification.email_status, 'queued')
+        self.assertEqual(mail.outbox, [])
+
+        callbacks[0]()
+
+        notification.refresh_from_db()
+        self.assertEqual((notification.email_status, notification.status), ('sent', 'sent'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['outbox@example.com'])
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertTrue(NotificationLog.objects.filter(notification=notification, status='sent').exists())
+
+    def test_digest_notifications_are_not_queued(self):
+        song_submitted = NotificationType.objects.get(name='song_submitted')
+        UserNotificationPreference.objects.create(user=self.user, notification_type=song_submitted, frequency='daily')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            notification = self.notify('song_submitted')
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(notification.email_status, '')
+
+    def test_duplicate_deliveries_send_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = self.notify()
+
+        send_notification_email.delay(str(notification.id))
+
+        self.assertEqual(len(mail.outbox), 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.email_attempts, 1)
+
+    def test_failures_are_retried_then_marked_failed(self):
+        # Eager retries run inline; the outermost attempt still reports Retry
+        celery_app.conf.update(task_eager_propagates=False)
+        with mock.patch('src.apps.notifications.tasks.build_notification_email', side_effect=OSError('provider down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = self.notify()
+
+        notification.refresh_from_db()
+        self.assertEqual((notification.email_status, notification.status), ('failed', 'failed'))
+        self.assertEqual(notification.email_attempts, send_notification_email.max_retries + 1)
+
+    def test_unknown_deliveries_are_not_retried(self):
+        celery_app.conf.update(task_eager_propagates=False)
+        message = EmailMessage('Approved', 'Your song is live', 'noreply@example.com', ['outbox@example.com'])
+        unknown = ZeptoMailError('timed out', results=[SendResult(message, False, error='Delivery unknown', unknown=True)])
+        with mock.patch('src.apps.notifications.tasks.build_notification_email', side_effect=unknown):
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = self.notify()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.email_status, 'failed')
+        self.assertEqual(notification.email_attempts, 1)
+
+    def test_sweep_requeues_stale_outbox_rows(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            notification = self.notify()
+        Notification.objects.filter(id=notification.id).update(
+            email_queued_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(requeue_stale_notification_emails(), 1)
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.email_status, 'sent')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.song_submitted = NotificationType.objects.create(name='song_submitted', category='music')
+        self.song_approved = NotificationType.objects.create(name='song_approved', category='music')
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([
+            User(email=f'digest{i}@example.com', username=f'digest{i}', first_name='Digest', last_name=str(i))
+            for i in range(3)
+        ])
+        self.users = list(User.objects.order_by('username'))
+        for user in self.users[:2]:
+            UserNotificationPreference.objects.create(
+                user=user, notification_type=self.song_submitted, frequency='daily'
+            )
+        self.now = timezone.now()
+
+    def notify(self, user, notification_type, title, age=timedelta(hours=1)):
+        notification = Notification.objects.create(
+            recipient=user, notification_type=notification_type, title=title, message='Details'
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - age)
+
+    def test_one_digest_per_user_with_only_digest_types(self):
+        first, second, third = self.users
+        self.notify(first, self.song_submitted, 'Submitted one')
+        self.notify(first, self.song_submitted, 'Submitted two')
+        self.notify(first, self.song_approved, 'Approved')
+        self.notify(first, self.song_submitted, 'Too old', age=timedelta(days=2))
+        self.notify(second, self.song_submitted, 'Submitted three')
+        self.notify(third, self.song_submitted, 'No digest')
+
+        with self.assertNumQueries(5):
+            self.assertEqual(send_digests('daily', now=self.now), 2)
+
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(messages), {'digest0@example.com', 'digest1@example.com'})
+        body = messages['digest0@example.com'].body
+        self.assertIn('Submitted one', body)
+        self.assertIn('Submitted two', body)
+        self.assertNotIn('Approved', body)
+        self.assertNotIn('Too old', body)
+        self.assertEqual(messages['digest0@example.com'].alternatives[0][1], 'text/html')
+        self.assertEqual(NotificationDigestState.objects.filter(frequency='daily', last_sent_at=self.now).count(), 2)
+
+    def test_watermark_prevents_resending_and_waits_for_the_next_period(self):
+        first = self.users[0]
+        self.notify(first, self.song_submitted, 'Old news')
+        send_digests('daily', now=self.now)
+        mail.outbox = []
+
+        self.notify(first, self.song_submitted, 'Fresh news', age=-timedelta(minutes=30))
+        self.assertEqual(send_digests('daily', now=self.now + timedelta(hours=2)), 0)
+
+        self.assertEqual(send_digests('daily', now=self.now + timedelta(days=1)), 1)
+        self.assertIn('Fresh news', mail.outbox[0].body)
+        self.assertNotIn('Old news', mail.outbox[0].body)
+
+    def test_failed_send_keeps_watermark(self):
+        self.notify(self.users[0], self.song_submitted, 'Retry me')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_digests('daily', now=self.now), 0)
+
+        self.assertFalse(NotificationDigestState.objects.filter(user=self.users[0]).exists())
+        # The second user had nothing to send, so their scan moves on
+        self.assertTrue(NotificationDigestState.objects.filter(user=self.users[1], last_sent_at=None).exists())
+        self.assertEqual(send_digests('daily', now=self.now + timedelta(minutes=5)), 1)
+        self.assertIn('Retry me', mail.outbox[0].body)
+
+
+@override_settings(RETENTION_BATCH_PAUSE=0, NOTIFICATION_RETENTION_DAYS=30)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.short_lived = NotificationType.objects.create(name='song_submitted', category='music', retention_days=7)
+        self.default = NotificationType.objects.create(name='song_approved', category='music')
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([User(email='retention@example.com', username='retention', first_name='Old')])
+        self.user = User.objects.get(username='retention')
+        self.now = timezone.now()
+
+    def notify(self, notification_type, title, age):
+        notification = Notification.objects.create(
+            recipient=self.user, notification_type=notification_type, title=title, message='Details'
+        )
+        Notification.objects.filter(pk=notification.pk).update(created_at=self.now - age)
+        return notification
+
+    def test_notifications_are_pruned_per_type_in_batches(self):
+        for i in range(5):
+            self.notify(self.short_lived, f'Submitted {i}', timedelta(days=10))
+        self.notify(self.short_lived, 'Recent submission', timedelta(days=1))
+        kept = self.notify(self.default, 'Approved', timedelta(days=10))
+        self.notify(self.default, 'Old approval', timedelta(days=40))
+        old_log = NotificationLog.objects.create(notification=kept, channel='email', status='sent')
+        NotificationLog.objects.filter(pk=old_log.pk).update(created_at=self.now - timedelta(days=100))
+
+        deleted = prune_notifications(now=self.now, batch_size=2)
+
+        self.assertEqual(deleted['notifications'], 6)
+        self.assertEqual(deleted['notification_logs'], 1)
+        self.assertEqual(
+            set(Notification.objects.values_list('title', flat=True)), {'Recent submission', 'Approved'}
+        )
+
+    def test_pruning_adjusts_unread_counters_once_per_batch(self):
+        for i in range(4):
+            old = self.notify(self.default, f'Old approval {i}', timedelta(days=40))
+        Notification.objects.filter(pk=old.pk).update(status='read')
+        NotificationLog.objects.create(notification=old, channel='email', status='sent')
+        self.notify(self.default, 'Approved', timedelta(days=1))
+        self.assertEqual(counters.get_unread_count(self.user.id), 4)
+
+        batch = Notification.objects.filter(created_at__lt=self.now - timedelta(days=30))
+        # Select ids, then in a savepoint: aggregate, one counter UPDATE, delete logs, delete rows
+        with self.assertNumQueries(7):
+            self.assertEqual(delete_in_batches(batch, batch_size=10), 4)
+
+        self.assertEqual(counters.get_unread_count(self.user.id), 1)
+        self.assertFalse(NotificationLog.objects.exists())
+
+    def test_pruned_rows_are_archived_as_ndjson(self):
+        old = self.notify(self.default, 'Old approval', timedelta(days=40))
+
+        with tempfile.TemporaryDirectory() as directory:
+            prune_notifications(now=self.now, archive_dir=directory)
+            [path] = glob.glob(os.path.join(directory, 'notifications', '*.ndjson.gz'))
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual([(row['id'], row['title']) for row in rows], [(str(old.pk), 'Old approval')])
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.notification_type = NotificationType.objects.create(name='song_approved', category='music')
+        # bulk_create skips the welcome-notification signals
+        User.objects.bulk_create([User(email='badge@example.com', username='badge', first_name='Badge')])
+        self.user = User.objects.get(username='badge')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(
+            recipient=self.user, notification_type=self.notification_type, title='Approved', message='Live', **kwargs
+        )
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        self.notify(status='read')
+        first = self.notify()
+        # No counter row yet: the first read recounts
+        self.assertEqual(counters.get_unread_count(self.user.id), 1)
+
+        second = self.notify()
+        self.notify(status='sent')
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.get_unread_count(self.user.id), 3)
+
+        first.mark_as_read()
+        first.mark_as_read()
+        Notification.objects.get(pk=second.pk).delete()
+        self.assertEqual(counters.get_unread_count(self.user.id), 1)
+
+    def test_mark_all_as_read_and_bulk_create(self):
+        self.notify()
+        self.assertEqual(self.client.get('/api/notifications/notifications/unread_count/').data['unread_count'], 1)
+
+        notifications = [
+            Notification(recipient=self.user, notification_type=self.notification_type, title='Hi', message='All')
+            for _ in range(3)
+        ]
+        Notification.objects.bulk_create(notifications)
+        counters.count_new_notifications(notifications)
+        self.assertEqual(counters.get_unread_count(self.user.id), 4)
+
+        self.client.post('/api/notifications/notifications/mark_all_as_read/')
+        self.assertEqual(self.client.get('/api/notifications/notifications/unread_count/').data['unread_count'], 0)
+
+    def test_reconcile_corrects_drift(self):
+        self.notify()
+        counters.get_unread_count(self.user.id)
+        # Raw updates bypass the counter
+        Notification.objects.update(status='read')
+
+        self.assertEqual(counters.reconcile_unread_counters(), 1)
+        self.assertEqual(counters.get_unread_count(self.user.id), 0)
+
+    def test_realtime_stream_is_counted_separately(self):
+        self.notify()
+        RealtimeNotification.objects.create(recipient=self.user, notification_type='admin_alert', title='A', message='B')
+        RealtimeNotification.objects.create(
+            recipient=self.user, notification_type='admin_alert', title='C', message='D', status='delivered'
+        )
+
+        self.assertEqual(counters.get_unread_count(self.user.id, counters.REALTIME), 2)
+        self.assertEqual(self.client.get('/api/realtime/notifications/unread_count/').data['unread_count'], 2)
+        self.client.post('/api/realtime/notifications/mark_all_as_read/')
+        self.assertEqual(counters.get_unread_count(self.user.id, counters.REALTIME), 0)
+        self.assertEqual(counters.get_unread_count(self.user.id), 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BroadcastTests(TestCase):
+    def setUp(self):
+        self.notification_type = NotificationType.objects.create(name='song_approved', category='music')
+        now = timezone.now()
+        User.objects.bulk_create([
+            User(email='root@example.com', username='root', is_staff=True, date_joined=now - timedelta(days=2)),
+            User(email='old@example.com', username='old', date_joined=now - timedelta(days=2)),
+        ])
+        self.admin = User.objects.get(username='root')
+        self.user = User.objects.get(username='old')
+        self.client = APIClient()
+
+    def notify(self, minutes_ago):
+        notification = Notification.objects.create(
+            recipient=self.user, notification_type=self.notification_type, title=f'{minutes_ago}', message='Hi'
+        )
+        Notification.objects.filter(pk=notification.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+
+    def broadcast(self, minutes_ago=0):
+        broadcast = broadcasts.create_broadcast(f'Broadcast {minutes_ago}', 'Maintenance tonight')
+        BroadcastNotification.objects.filter(pk=broadcast.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return broadcast
+
+    def test_broadcast_is_one_row_and_one_message(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)('system_announcements', channel)
+        self.client.force_authenticate(self.admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/notifications/notifications/broadcast/', {'title': 'Hello', 'message': 'Everyone'}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BroadcastNotification.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['announcement']['title'], 'Hello')
+
+    def test_feed_merges_broadcasts_by_date(self):
+        for minutes_ago in (10, 30, 50):
+            self.notify(minutes_ago)
+        self.broadcast(20)
+        self.broadcast(60)
+        feed = broadcasts.NotificationFeed(
+            Notification.objects.filter(recipient=self.user), broadcasts.visible_broadcasts(self.user)
+        )
+        titles = ['10', 'Broadcast 20', '30', '50', 'Broadcast 60']
+
+        self.assertEqual(len(feed), 5)
+        self.assertEqual([item.title for item in feed[:]], titles)
+        for start in range(5):
+            self.assertEqual([item.title for item in feed[start:start + 2]], titles[start:start + 2])
+
+        self.client.force_authenticate(self.user)
+        results = self.client.get('/api/notifications/notifications/').data['results']
+        self.assertEqual([item['title'] for item in results], titles)
+        self.assertTrue(results[1]['is_broadcast'])
+
+    @override_settings(BROADCAST_FEED_LIMIT=1)
+    def test_feed_merges_only_the_newest_broadcasts(self):
+        for minutes_ago in (10, 30, 50):
+            self.notify(minutes_ago)
+        self.broadcast(20)
+        self.broadcast(60)
+        feed = broadcasts.NotificationFeed(
+            Notification.objects.filter(recipient=self.user), broadcasts.visible_broadcasts(self.user)
+        )
+
+        self.assertEqual(len(feed), 4)
+        self.assertEqual([item.title for item in feed[:]], ['10', 'Broadcast 20', '30', '50'])
+        # The badge only counts the broadcasts the feed can show
+        self.assertEqual(broadcasts.unread_broadcast_count(self.user), 1)
+
+    def test_read_state_is_per_user_and_lazy(self):
+        self.notify(5)
+        broadcast = self.broadcast()
+        # Users who join later don't inherit earlier announcements
+        User.objects.bulk_create([User(email='new@example.com', username='new')])
+        newcomer = User.objects.get(username='new')
+        self.assertFalse(broadcasts.visible_broadcasts(newcomer).exists())
+
+        self.client.force_authenticate(self.user)
+        unread_count = lambda: self.client.get('/api/notifications/notifications/unread_count/').data['unread_count']
+        self.assertEqual(unread_count(), 2)
+        self.assertFalse(BroadcastReceipt.objects.exists())
+
+        self.client.post(f'/api/notifications/notifications/{broadcast.pk}/mark_as_read/')
+        self.assertEqual(unread_count(), 1)
+        self.assertEqual(broadcasts.unread_broadcast_count(self.admin), 1)
+
+        self.broadcast()
+        self.assertEqual(self.client.post('/api/notifications/notifications/mark_all_as_read/').data['marked_as_read'], 2)
+        self.assertEqual(unread_count(), 0)
+        self.assertEqual(BroadcastReceipt.objects.count(), 2)
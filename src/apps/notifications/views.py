@@ -1,10 +1,13 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.core.exceptions import ValidationError
 from django.db import models
-from .models import Notification, NotificationType, UserNotificationPreference, EmailTemplate
+from . import broadcasts, counters
+from .cache import get_notification_types
+from .models import BroadcastNotification, Notification, NotificationType, UserNotificationPreference, EmailTemplate
 from .serializers import (
-    NotificationSerializer, NotificationTypeSerializer,
+    BroadcastNotificationSerializer, NotificationSerializer, NotificationTypeSerializer,
     UserNotificationPreferenceSerializer, EmailTemplateSerializer
 )
 from .services import NotificationService
@@ -12,7 +15,8 @@ from .services import NotificationService
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    ViewSet for user notifications
+    ViewSet for user notifications. Listings include the broadcasts the user
+    can see (see broadcasts.py), flagged with ``is_broadcast``
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -22,6 +26,25 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             recipient=self.request.user
         ).select_related('notification_type').order_by('-created_at')
     
+    def serialize_feed(self, items):
+        context = self.get_serializer_context()
+        return [
+            (BroadcastNotificationSerializer if isinstance(item, BroadcastNotification) else NotificationSerializer)(
+                item, context=context
+            ).data
+            for item in items
+        ]
+    
+    def list(self, request, *args, **kwargs):
+        feed = broadcasts.NotificationFeed(
+            self.filter_queryset(self.get_queryset()),
+            broadcasts.visible_broadcasts(request.user),
+        )
+        page = self.paginate_queryset(feed)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_feed(page))
+        return Response(self.serialize_feed(feed[:]))
+    
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications"""
@@ -36,13 +59,19 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             limit=20, 
             unread_only=True
         )
-        serializer = self.get_serializer(notifications, many=True)
-        return Response(serializer.data)
+        feed = sorted(
+            [*notifications, *broadcasts.unread_broadcasts(request.user)[:20]],
+            key=lambda item: item.created_at, reverse=True,
+        )
+        return Response(self.serialize_feed(feed[:20]))
     
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """Mark a notification as read"""
-        success = NotificationService.mark_notification_as_read(pk, request.user)
+        success = (
+            NotificationService.mark_notification_as_read(pk, request.user)
+            or broadcasts.mark_broadcast_read(pk, request.user)
+        )
         if success:
             return Response({'status': 'marked as read'})
         else:
@@ -61,11 +90,13 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             status='read',
             read_at=models.functions.Now()
         )
+        counters.reset_unread_count(request.user.id)
+        updated += broadcasts.mark_all_broadcasts_read(request.user)
         return Response({'marked_as_read': updated})
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def broadcast(self, request):
-        """Broadcast notification to all users (Admin only)"""
+        """Broadcast notification to all users (Admin only): one row and one WebSocket message"""
         from .notification_utils import create_admin_broadcast
         
         title = request.data.get('title')
@@ -78,11 +109,16 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        notifications = create_admin_broadcast(title, message, priority, request.user)
+        broadcast = create_admin_broadcast(title, message, priority, request.user)
+        if broadcast is None:
+            return Response(
+                {'error': 'Failed to send broadcast'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         
         return Response({
-            'message': f'Broadcast sent to {len(notifications)} users',
-            'notifications_created': len(notifications)
+            'message': 'Broadcast sent to all users',
+            'broadcast_id': str(broadcast.id),
         })
 
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
@@ -179,58 +215,65 @@ class UserNotificationPreferenceViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk_update(self, request):
-        """Bulk update notification preferences"""
+        """
+        Bulk update notification preferences. Entries carry either the
+        preference ``id`` or, for types still on their defaults (no id yet),
+        the ``notification_type_id``
+        """
         preferences_data = request.data.get('preferences', [])
+        fields = ['email_enabled', 'push_enabled', 'in_app_enabled', 'frequency']
         updated_count = 0
         
         for pref_data in preferences_data:
+            changes = {field: pref_data[field] for field in fields if field in pref_data}
             try:
-                preference = UserNotificationPreference.objects.get(
-                    id=pref_data['id'],
-                    user=request.user
-                )
-                
-                # Update fields
-                for field in ['email_enabled', 'push_enabled', 'in_app_enabled', 'frequency']:
-                    if field in pref_data:
-                        setattr(preference, field, pref_data[field])
-                
-                preference.save()
-                updated_count += 1
-                
-            except UserNotificationPreference.DoesNotExist:
+                if pref_data.get('id'):
+                    preference = UserNotificationPreference.objects.get(
+                        id=pref_data['id'],
+                        user=request.user
+                    )
+                elif pref_data.get('notification_type_id'):
+                    notification_type = NotificationType.objects.get(id=pref_data['notification_type_id'])
+                    preference = UserNotificationPreference.objects.filter(
+                        user=request.user,
+                        notification_type=notification_type
+                    ).first() or NotificationService.default_preference(request.user, notification_type)
+                else:
+                    continue
+            except (UserNotificationPreference.DoesNotExist, NotificationType.DoesNotExist, ValidationError):
                 continue
+            
+            for field, value in changes.items():
+                setattr(preference, field, value)
+            
+            # Leave types that still match their defaults unstored
+            if preference.pk is None and all(
+                getattr(preference, field) == getattr(preference.notification_type, f'default_{field}')
+                for field in ['email_enabled', 'push_enabled', 'in_app_enabled']
+            ) and preference.frequency == 'immediate':
+                continue
+            
+            preference.save()
+            updated_count += 1
         
         return Response({'updated': updated_count})
     
     @action(detail=False, methods=['get'])
     def defaults(self, request):
-        """Get default preferences for all notification types"""
-        notification_types = NotificationType.objects.filter(is_active=True)
-        defaults = []
-        
-        for nt in notification_types:
-            # Get existing preference or create default
-            try:
-                pref = UserNotificationPreference.objects.get(
-                    user=request.user,
-                    notification_type=nt
-                )
-                serializer = self.get_serializer(pref)
-                defaults.append(serializer.data)
-            except UserNotificationPreference.DoesNotExist:
-                # Create default preference
-                pref = UserNotificationPreference.objects.create(
-                    user=request.user,
-                    notification_type=nt,
-                    email_enabled=nt.default_email_enabled,
-                    push_enabled=nt.default_push_enabled,
-                    in_app_enabled=nt.default_in_app_enabled
-                )
-                serializer = self.get_serializer(pref)
-                defaults.append(serializer.data)
-        
-        return Response(defaults)
+        """
+        Effective preferences for every active notification type: the user's
+        stored row where there is one, otherwise the type defaults (unsaved)
+        """
+        stored = {pref.notification_type_id: pref for pref in self.get_queryset()}
+        notification_types = sorted(
+            (nt for nt in get_notification_types().values() if nt.is_active),
+            key=lambda nt: nt.name
+        )
+        preferences = [
+            stored.get(nt.pk) or NotificationService.default_preference(request.user, nt)
+            for nt in notification_types
+        ]
+        return Response(self.get_serializer(preferences, many=True).data)
 
 
 class EmailTemplateViewSet(viewsets.ReadOnlyModelViewSet):
@@ -262,10 +305,10 @@ class EmailTemplateViewSet(viewsets.ReadOnlyModelViewSet):
         }
         
         # Render template
-        from .tasks import render_to_string_from_template
+        from .cache import render_email_template
         try:
-            rendered_html = render_to_string_from_template(template.html_template, context)
-            rendered_subject = render_to_string_from_template(template.subject_template, context)
+            rendered_html = render_email_template(template, 'html_template', context)
+            rendered_subject = render_email_template(template, 'subject_template', context)
             
             return Response({
                 'subject': rendered_subject,
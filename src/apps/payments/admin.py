@@ -1,3 +1,4 @@
+import json
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
@@ -103,7 +104,7 @@ class TransactionAdmin(admin.ModelAdmin):
     list_display = ['user', 'transaction_type', 'status', 'amount', 'paystack_reference', 'initiated_at', 'completed_at']
     list_filter = ['transaction_type', 'status', 'currency', 'initiated_at']
     search_fields = ['user__email', 'user__first_name', 'user__last_name', 'paystack_reference', 'description']
-    readonly_fields = ['id', 'initiated_at', 'completed_at']
+    readonly_fields = ['id', 'initiated_at', 'completed_at', 'raw_gateway_response']
     date_hierarchy = 'initiated_at'
     
     fieldsets = (
@@ -116,8 +117,11 @@ class TransactionAdmin(admin.ModelAdmin):
         ('Related Objects', {
             'fields': ('subscription', 'payment_method')
         }),
+        ('Gateway Details', {
+            'fields': ('channel', 'paid_at', 'card_brand', 'card_last_four', 'bank_name')
+        }),
         ('Paystack Data', {
-            'fields': ('paystack_reference', 'paystack_access_code', 'gateway_response'),
+            'fields': ('paystack_reference', 'paystack_access_code', 'raw_gateway_response'),
             'classes': ('collapse',)
         }),
         ('Metadata', {
@@ -133,6 +137,13 @@ class TransactionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user', 'subscription', 'payment_method')
     
+    def raw_gateway_response(self, obj):
+        # Loaded from the compressed side table only on the change page
+        if not obj.pk:
+            return '-'
+        return format_html('<pre>{}</pre>', json.dumps(obj.gateway_response, indent=2))
+    raw_gateway_response.short_description = 'Gateway response'
+    
     actions = ['mark_as_completed', 'mark_as_failed']
     
     def mark_as_completed(self, request, queryset):
@@ -0,0 +1,74 @@
+"""
+Helpers for Paystack gateway payloads.
+
+Only a handful of fields from a verify/charge response are ever queried, so
+those are copied onto typed ``Transaction`` columns and the raw payload is
+stored zlib-compressed in ``TransactionGatewayPayload``. These helpers are
+plain functions so the data migration can reuse them.
+"""
+import json
+import zlib
+from decimal import Decimal, InvalidOperation
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_payload(payload):
+    """Serialize a JSON-safe payload and compress it for storage."""
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def decompress_payload(blob):
+    if not blob:
+        return {}
+    return json.loads(zlib.decompress(bytes(blob)).decode('utf-8'))
+
+
+def _kobo_to_naira(value):
+    try:
+        return (Decimal(str(value)) / 100).quantize(Decimal('0.01'))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def extract_gateway_fields(payload):
+    """
+    Pull the queryable fields out of a Paystack transaction payload.
+
+    Returns a dict of ``Transaction`` column values; keys are only present
+    when the payload carries the value.
+    """
+    if not isinstance(payload, dict):
+        return {}
+
+    fields = {}
+    channel = payload.get('channel')
+    if channel:
+        fields['channel'] = str(channel)[:30]
+
+    paid_at = payload.get('paid_at') or payload.get('paidAt')
+    if isinstance(paid_at, str):
+        paid_at = parse_datetime(paid_at)
+    if paid_at:
+        fields['paid_at'] = paid_at
+
+    if payload.get('fees') is not None:
+        fees = _kobo_to_naira(payload['fees'])
+        if fees is not None:
+            fields['fees'] = fees
+
+    authorization = payload.get('authorization')
+    if isinstance(authorization, dict):
+        brand = authorization.get('brand') or authorization.get('card_type')
+        if brand:
+            fields['card_brand'] = str(brand).strip()[:20]
+        if authorization.get('last4'):
+            fields['card_last_four'] = str(authorization['last4'])[:4]
+        if authorization.get('bank'):
+            fields['bank_name'] = str(authorization['bank'])[:100]
+
+    return fields
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionGatewayPayload',
+            fields=[
+                ('transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='gateway_payload', serialize=False, to='payments.transaction')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'transaction_gateway_payloads',
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='bank_name',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='card_brand',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='card_last_four',
+            field=models.CharField(blank=True, max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='channel',
+            field=models.CharField(blank=True, max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
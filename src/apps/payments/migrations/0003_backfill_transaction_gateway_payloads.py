@@ -0,0 +1,72 @@
+"""
+Move Transaction.gateway_response into the compressed side table and copy the
+queryable fields onto the new columns.
+
+Rows are processed in primary-key chunks, each in its own transaction, so the
+migration never holds more than one chunk in memory or locks the whole table.
+"""
+from django.db import migrations, transaction
+
+from src.apps.payments.gateway import compress_payload, extract_gateway_fields
+
+BATCH_SIZE = 1000
+EXTRACTED_FIELDS = ['channel', 'paid_at', 'fees', 'card_brand', 'card_last_four', 'bank_name']
+
+
+def backfill_gateway_payloads(apps, schema_editor):
+    Transaction = apps.get_model('payments', 'Transaction')
+    TransactionGatewayPayload = apps.get_model('payments', 'TransactionGatewayPayload')
+    db_alias = schema_editor.connection.alias
+
+    last_pk = None
+    while True:
+        # bulk_update reads every field it writes, so none of them may be deferred
+        queryset = Transaction.objects.using(db_alias).order_by('pk').only('pk', 'gateway_response', *EXTRACTED_FIELDS)
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        batch = list(queryset[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        to_update = []
+        payloads = []
+        for txn in batch:
+            payload = txn.gateway_response
+            if not payload:
+                continue
+            for field, value in extract_gateway_fields(payload).items():
+                setattr(txn, field, value)
+            to_update.append(txn)
+            payloads.append(TransactionGatewayPayload(transaction_id=txn.pk, data=compress_payload(payload)))
+
+        with transaction.atomic(using=db_alias):
+            if to_update:
+                Transaction.objects.using(db_alias).bulk_update(to_update, EXTRACTED_FIELDS)
+            TransactionGatewayPayload.objects.using(db_alias).bulk_create(payloads, ignore_conflicts=True)
+
+
+def restore_gateway_responses(apps, schema_editor):
+    from src.apps.payments.gateway import decompress_payload
+
+    Transaction = apps.get_model('payments', 'Transaction')
+    TransactionGatewayPayload = apps.get_model('payments', 'TransactionGatewayPayload')
+    db_alias = schema_editor.connection.alias
+
+    payloads = TransactionGatewayPayload.objects.using(db_alias).order_by('pk')
+    for stored in payloads.iterator(chunk_size=BATCH_SIZE):
+        Transaction.objects.using(db_alias).filter(pk=stored.transaction_id).update(
+            gateway_response=decompress_payload(stored.data)
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('payments', '0002_transaction_gateway_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_gateway_payloads, restore_gateway_responses),
+    ]
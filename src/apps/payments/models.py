@@ -4,6 +4,8 @@ from django.utils import timezone
 from decimal import Decimal
 import uuid
 
+from .gateway import compress_payload, decompress_payload, extract_gateway_fields
+
 User = get_user_model()
 
 
@@ -187,7 +189,14 @@ class Transaction(models.Model):
     # External payment processor data
     paystack_reference = models.CharField(max_length=255, unique=True)
     paystack_access_code = models.CharField(max_length=255, blank=True, null=True)
-    gateway_response = models.JSONField(default=dict, blank=True)
+    
+    # Fields extracted from the gateway response. The raw payload lives in
+    # TransactionGatewayPayload and is only loaded on demand.
+    channel = models.CharField(max_length=30, blank=True, null=True)  # card, bank, ussd, etc
+    paid_at = models.DateTimeField(blank=True, null=True)
+    card_brand = models.CharField(max_length=20, blank=True, null=True)
+    card_last_four = models.CharField(max_length=4, blank=True, null=True)
+    bank_name = models.CharField(max_length=100, blank=True, null=True)
     
     # Metadata
     description = models.TextField(blank=True, null=True)
@@ -208,6 +217,34 @@ class Transaction(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.get_transaction_type_display()} - ₦{self.amount}"
     
+    @property
+    def gateway_response(self):
+        """Raw gateway payload, decompressed from the side table on first access"""
+        if not hasattr(self, '_gateway_response'):
+            try:
+                self._gateway_response = self.gateway_payload.payload
+            except TransactionGatewayPayload.DoesNotExist:
+                self._gateway_response = {}
+        return self._gateway_response
+    
+    @gateway_response.setter
+    def gateway_response(self, payload):
+        """Copy the queryable fields onto columns; the payload is stored on save()"""
+        payload = payload or {}
+        for field, value in extract_gateway_fields(payload).items():
+            setattr(self, field, value)
+        self._gateway_response = payload
+        self._gateway_response_dirty = True
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if getattr(self, '_gateway_response_dirty', False):
+            TransactionGatewayPayload.objects.update_or_create(
+                transaction=self,
+                defaults={'data': compress_payload(self._gateway_response)}
+            )
+            self._gateway_response_dirty = False
+    
     def mark_as_completed(self):
         """Mark transaction as completed"""
         self.status = 'success'
@@ -220,3 +257,26 @@ class Transaction(models.Model):
         if reason:
             self.metadata['failure_reason'] = reason
         self.save()
+
+
+class TransactionGatewayPayload(models.Model):
+    """Compressed raw gateway response for a transaction, kept out of the hot table"""
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='gateway_payload'
+    )
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'transaction_gateway_payloads'
+    
+    def __str__(self):
+        return f"Gateway payload for {self.transaction_id}"
+    
+    @property
+    def payload(self):
+        return decompress_payload(self.data)
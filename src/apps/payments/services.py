@@ -1,18 +1,23 @@
 import os
 import uuid
 import logging
+from datetime import date, datetime
 from decimal import Decimal
+from enum import Enum
 from typing import Dict, Optional, Tuple
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from pypaystack2 import PaystackClient
+from pypaystack2.enums import Country
 from .models import PaymentMethod, Subscription, Transaction
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+_JSON_SCALARS = (str, int, float, bool)
+
 
 class PaymentService:
     """Service for handling payments via Paystack"""
@@ -20,6 +25,13 @@ class PaymentService:
     def __init__(self):
         self.paystack = PaystackClient(secret_key=settings.PAYSTACK_SECRET_KEY)
         self.public_key = settings.PAYSTACK_PUBLIC_KEY
+        
+        base_url = getattr(settings, 'PAYSTACK_BASE_URL', '')
+        if base_url:
+            # pypaystack2 hardcodes the API host on every sub client
+            for client in [self.paystack, *vars(self.paystack).values()]:
+                if hasattr(client, '_full_url'):
+                    client._BASE_URL = base_url.rstrip('/')
     
     def create_customer(self, user) -> Optional[str]:
         """Create or get Paystack customer"""
@@ -132,7 +144,7 @@ class PaymentService:
             
             if response.status_code == 200 and response.data:
                 # Convert response data to JSON-safe format
-                payment_data = self._make_json_safe(response.data.__dict__)
+                payment_data = self._make_json_safe(response.data)
                 return True, payment_data
             else:
                 logger.error(f"Failed to verify payment: {getattr(response, 'message', 'Unknown error')}")
@@ -441,7 +453,7 @@ class PaymentService:
             
             if response.status_code == 200 and response.data:
                 # Convert response data to JSON-safe format
-                payment_data = self._make_json_safe(response.data.__dict__)
+                payment_data = self._make_json_safe(response.data)
                 return True, payment_data
             else:
                 logger.error(f"Failed to charge authorization: {getattr(response, 'message', 'Unknown error')}")
@@ -454,10 +466,10 @@ class PaymentService:
     def get_banks(self) -> Tuple[bool, list]:
         """Get list of supported banks"""
         try:
-            response = self.paystack.miscellaneous.list_banks()
+            response = self.paystack.miscellaneous.get_banks(country=Country.NIGERIA)
             
             if response.status_code == 200 and response.data:
-                return True, [bank.__dict__ for bank in response.data]
+                return True, self._make_json_safe(response.data)
             else:
                 logger.error(f"Failed to get banks: {getattr(response, 'message', 'Unknown error')}")
                 return False, []
@@ -467,25 +479,25 @@ class PaymentService:
             return False, []
 
     def _make_json_safe(self, data):
-        """Convert data to JSON-safe format by handling datetime objects"""
-        import json
-        from datetime import datetime, date
-        
+        """Convert gateway response data to JSON-safe native types"""
+        # pypaystack2 returns pydantic models which can dump themselves in one pass
+        if hasattr(data, 'model_dump'):
+            return data.model_dump(mode='json')
+        if data is None or isinstance(data, _JSON_SCALARS):
+            return data
         if isinstance(data, dict):
             return {key: self._make_json_safe(value) for key, value in data.items()}
-        elif isinstance(data, list):
+        if isinstance(data, (list, tuple)):
             return [self._make_json_safe(item) for item in data]
-        elif isinstance(data, (datetime, date)):
+        if isinstance(data, (datetime, date)):
             return data.isoformat()
-        elif hasattr(data, '__dict__'):
+        if isinstance(data, Enum):
+            return data.value
+        if isinstance(data, Decimal):
+            return str(data)
+        if hasattr(data, '__dict__'):
             return self._make_json_safe(data.__dict__)
-        else:
-            # Try to JSON serialize to check if it's safe
-            try:
-                json.dumps(data)
-                return data
-            except (TypeError, ValueError):
-                return str(data)
+        return str(data)
 
 
 # Pricing configurations
@@ -1,8 +1,17 @@
-from django.test import TestCase
+import csv
+import json
+from decimal import Decimal
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from src.apps.payments.models import Subscription
+from src.apps.payments.exports import aiter_lines
+from src.apps.payments.models import Subscription, Transaction, TransactionGatewayPayload
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 User = get_user_model()
 
@@ -59,3 +68,149 @@ class PayPerSongFlowTests(TestCase):
         # After consuming the only credit, user role should revert
         self.user.refresh_from_db()
         self.assertEqual(self.user.role, 'user')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        call_command('setup_realtime_notifications', stdout=StringIO())
+        self.admin = User.objects.create_user(
+            email='finance@example.com', username='finance', first_name='Fin', last_name='Ance',
+            password='Testpass123!', is_staff=True
+        )
+        self.user = User.objects.create_user(
+            email='buyer@example.com', username='buyer', first_name='Buy', last_name='Er', password='Testpass123!'
+        )
+        for i in range(3):
+            Transaction.objects.create(
+                user=self.user,
+                transaction_type='credit_purchase',
+                status='success' if i else 'failed',
+                amount=Decimal('5000.00'),
+                paystack_reference=f'ref-{i}',
+                metadata={'raw': 'x' * 100},
+            )
+        self.client = APIClient()
+
+    def test_csv_export_streams_default_columns(self):
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get('/api/payments/export/', {'dataset': 'transactions'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        rows = list(csv.reader(io_lines(resp)))
+        self.assertEqual(len(rows), 4)
+        self.assertIn('paystack_reference', rows[0])
+        self.assertNotIn('metadata', rows[0])
+
+    def test_ndjson_export_with_field_selection_and_filter(self):
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get('/api/payments/export/', {
+            'dataset': 'transactions', 'output': 'ndjson',
+            'fields': 'paystack_reference,status,metadata', 'status': 'success',
+        })
+        self.assertEqual(resp.status_code, 200)
+        records = [json.loads(line) for line in io_lines(resp)]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(set(records[0]), {'paystack_reference', 'status', 'metadata'})
+
+    def test_asgi_export_streams_an_async_iterator(self):
+        token = AccessToken.for_user(self.admin)
+        resp = async_to_sync(AsyncClient().get)(
+            '/api/payments/export/', {'dataset': 'transactions'}, headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_async)
+
+        async def read():
+            return b''.join([chunk async for chunk in resp.streaming_content])
+
+        self.assertEqual(len(list(csv.reader(async_to_sync(read)().decode().splitlines()))), 4)
+
+    def test_async_lines_are_read_one_chunk_at_a_time(self):
+        read = []
+
+        def lines():
+            for number in range(10):
+                read.append(number)
+                yield f'{number}\n'
+
+        async def first_chunk():
+            chunks = aiter_lines(lines(), chunk_size=3)
+            chunk = await chunks.__anext__()
+            await chunks.aclose()
+            return chunk
+
+        self.assertEqual(async_to_sync(first_chunk)(), '0\n1\n2\n')
+        self.assertEqual(read, [0, 1, 2])
+
+    def test_transaction_list_still_renders(self):
+        self.client.force_authenticate(self.user)
+        resp = self.client.get('/api/payments/transactions/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 3)
+
+    def test_unknown_field_rejected(self):
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get('/api/payments/export/', {'dataset': 'subscriptions', 'fields': 'password'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_non_admin_forbidden(self):
+        self.client.force_authenticate(self.user)
+        resp = self.client.get('/api/payments/export/')
+        self.assertEqual(resp.status_code, 403)
+
+    def test_management_command_writes_rows(self):
+        out = StringIO()
+        call_command('export_ledger', 'referral_credits', stdout=out)
+        self.assertTrue(out.getvalue().startswith('id,user_id,user__email'))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class GatewayPayloadTests(TestCase):
+    payload = {
+        'status': 'success',
+        'channel': 'card',
+        'paid_at': '2024-05-01T10:00:00Z',
+        'fees': 7500,
+        'authorization': {'brand': 'visa', 'last4': '4081', 'bank': 'TEST BANK', 'authorization_code': 'AUTH_x'},
+        'log': {'history': [{'type': 'action', 'message': 'Attempted to pay'}] * 20},
+    }
+
+    def setUp(self):
+        call_command('setup_realtime_notifications', stdout=StringIO())
+        self.user = User.objects.create_user(
+            email='gw@example.com', username='gw', first_name='Gate', last_name='Way', password='Testpass123!'
+        )
+
+    def test_fields_extracted_and_payload_stored_compressed(self):
+        txn = Transaction.objects.create(
+            user=self.user, transaction_type='subscription', amount=Decimal('39900.00'),
+            paystack_reference='gw-1', gateway_response=self.payload,
+        )
+        txn = Transaction.objects.get(pk=txn.pk)
+        self.assertEqual(txn.channel, 'card')
+        self.assertEqual(txn.fees, Decimal('75.00'))
+        self.assertEqual(txn.card_brand, 'visa')
+        self.assertEqual(txn.card_last_four, '4081')
+        self.assertEqual(txn.bank_name, 'TEST BANK')
+        self.assertEqual(txn.paid_at.year, 2024)
+
+        stored = TransactionGatewayPayload.objects.get(pk=txn.pk)
+        self.assertLess(len(stored.data), len(json.dumps(self.payload)))
+        with self.assertNumQueries(1):
+            self.assertEqual(txn.gateway_response, self.payload)
+
+    @override_settings(PAYSTACK_SECRET_KEY='sk_test_dummy')
+    def test_make_json_safe_dumps_pydantic_models(self):
+        from pypaystack2.models import Authorization
+        from src.apps.payments.services import PaymentService
+
+        auth = Authorization(authorization_code='AUTH_x', last4='4081', reusable=True)
+        data = PaymentService()._make_json_safe({'authorization': auth, 'amount': Decimal('1.50')})
+        self.assertEqual(data['authorization']['last4'], '4081')
+        self.assertEqual(data['amount'], '1.50')
+        json.dumps(data)
+
+
+def io_lines(response):
+    return b''.join(response.streaming_content).decode().splitlines()
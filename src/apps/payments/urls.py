@@ -18,6 +18,7 @@ urlpatterns = [
     
     # Transactions
     path('transactions/', views.TransactionListView.as_view(), name='transactions'),
+    path('export/', views.LedgerExportView.as_view(), name='ledger_export'),
     
     # Payment Processing
     path('initialize/', views.PaymentInitiationView.as_view(), name='payment_initialize'),
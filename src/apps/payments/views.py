@@ -3,7 +3,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction as db_transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from .models import PaymentMethod, Subscription, Transaction
@@ -13,6 +16,7 @@ from .serializers import (
     CardPaymentSerializer, BankTransferSerializer
 )
 from .services import PaymentService, get_pricing_for_subscription, get_pricing_for_credits
+from .exports import ExportError, aiter_lines, stream_export
 import logging
 
 logger = logging.getLogger(__name__)
@@ -86,7 +90,51 @@ class TransactionListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        # The serializer never reads metadata, so don't load it.
+        return (
+            Transaction.objects.filter(user=self.request.user)
+            .select_related('payment_method')
+            .defer('metadata')
+        )
+
+
+class LedgerExportView(APIView):
+    """
+    Stream a platform-wide export of transactions, subscriptions or referral credits.
+
+    Query params: dataset, output (csv|ndjson), fields (comma separated),
+    start, end (ISO date/datetime) and status. Under ASGI the response streams
+    an async iterator.
+    """
+    
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        params = request.query_params
+        dataset = params.get('dataset', 'transactions')
+        export_format = params.get('output', 'csv')
+        fields = [f.strip() for f in params.get('fields', '').split(',') if f.strip()]
+        
+        try:
+            lines = stream_export(
+                dataset,
+                export_format=export_format,
+                fields=fields or None,
+                start=params.get('start'),
+                end=params.get('end'),
+                status=params.get('status'),
+            )
+        except ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        content_type = 'application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+        filename = f"{dataset}-{timezone.now():%Y%m%d%H%M%S}.{export_format}"
+        if isinstance(request._request, ASGIRequest):
+            # ASGI would buffer a sync iterator in full
+            lines = aiter_lines(lines)
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class PaymentInitiationView(APIView):
@@ -1,57 +1,203 @@
 """
-WebSocket consumer for real-time notifications
-Enhanced version with comprehensive real-time features
+WebSocket consumers for notifications.
+
+NotificationHubConsumer (``ws/hub/``) is the one socket a browser tab needs:
+it serves both notification streams (see streams.py) and multiplexes topics
+over the connection. ``ws/realtime-notifications/`` and ``ws/notifications/``
+remain as aliases that serve a single stream each.
 """
+import asyncio
 import json
 import logging
+import time
+import uuid
+from datetime import timedelta
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from src.apps.metrics.consumers import ConsumerMetricsMixin
+from src.apps.notifications.counters import NOTIFICATIONS, REALTIME
+from .delivery import AckBuffer, inflight_window, mark_delivered
+from .presence import get_presence, presence_ttl
+from .publisher import ADMIN_FEED_GROUP, ANNOUNCEMENTS_GROUP, Coalescer, job_group, user_group
+from .streams import STREAMS
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
+def make_cursor(notification):
+    """The resume cursor just past ``notification``: ``<created_at>|<id>``"""
+    return f"{notification.created_at.isoformat()}|{notification.pk}"
+
+
+def parse_cursor(cursor):
+    """``(created_at, id)`` from a resume cursor; the id is None for a bare timestamp"""
+    if not cursor:
+        return None, None
+    # "+" in an unencoded query string arrives as a space
+    created_at, _, notification_id = cursor.replace(' ', '+').partition('|')
+    try:
+        notification_id = uuid.UUID(notification_id) if notification_id else None
+    except ValueError:
+        notification_id = None
+    return parse_datetime(created_at), notification_id
+
+
+class NotificationHubConsumer(ConsumerMetricsMixin, AsyncWebsocketConsumer):
     """
-    Enhanced WebSocket consumer for real-time notifications
+    Multiplexed notification socket.
+
+    Clients pick topics with ``?topics=notifications,jobs`` (default
+    ``default_topics``) and change them later with ``subscribe`` /
+    ``unsubscribe`` messages carrying a ``topics`` list. Each topic is one
+    channel-layer group, joined only while subscribed:
+
+    * ``notifications``: the user's notifications from every stream in ``streams``
+    * ``announcements``: broadcasts and system announcements
+    * ``admin``: the admin activity feed, for active admin users only (checked
+      against the User row, not the token's claims)
+    * ``jobs``: progress of the user's background jobs
+
+    Pushed frames carry their ``topic``. On connect the client gets a single ``connection_snapshot`` frame holding
+    the unread count and either the latest unread notifications or, when the
+    URL carries ``?since=<cursor>``, every notification after it (up to
+    REALTIME_SNAPSHOT_LIMIT, oldest first, with ``has_more``). A cursor is
+    ``<created_at ISO timestamp>|<id>``, compared as a ``(created_at, id)``
+    keyset; a bare timestamp is accepted too. Rows can commit after a newer
+    row has been seen, so the frame also replays the notifications from the
+    REALTIME_RESUME_OVERLAP seconds before the cursor, and the client drops
+    ids it already has. The frame's ``cursor`` is the value to pass as
+    ``since`` on the next reconnect; a ``sync`` message with ``since``
+    requests the same frame on a live socket. The snapshot is only sent while
+    ``notifications`` is subscribed.
+    
+    While subscribed to ``notifications`` the socket is registered in the
+    presence registry (presence.py), so publishers only push to users who are
+    connected. Notifications queued while the user was offline are marked
+    sent just before the snapshot; they become delivered once acked.
+    
+    Acknowledgements are opt-in: a client that connects with ``?ack=1`` or
+    sends ``{"type": "hello", "ack": true}`` gets RealtimeNotification frames
+    with ``"ack": true`` and answers ``{"type": "ack", "ids": [...]}``; see
+    delivery.py. Such a socket has at most REALTIME_INFLIGHT_WINDOW of them
+    unacked at a time, the rest wait for redelivery. Other clients get plain
+    frames, and the socket acks each one itself once it is sent, so only
+    rows awaiting a client's ack are ever redelivered. What was queued while
+    the user was offline is pushed right after the snapshot.
     """
+    streams = (NOTIFICATIONS, REALTIME)
+    default_topics = ('notifications', 'announcements')
     
     async def connect(self):
         """Handle WebSocket connection"""
         self.user = self.scope["user"]
+        self.topics = set()
+        # Bursts of unread-count events reach the client as one frame
+        self.unread_counts = Coalescer(self.send_unread_count_frame)
+        self.acks = AckBuffer(self.write_acks)
+        self.in_flight = set()
+        self.ack_enabled = self.get_query_param('ack') in ('1', 'true')
         
         if self.user.is_anonymous:
             logger.warning("Anonymous user attempted WebSocket connection")
             await self.close(code=4001)
             return
         
-        # Create user-specific group
-        self.group_name = f"notifications_{self.user.id}"
+        requested = self.get_query_param('topics')
+        await self.subscribe(requested.split(',') if requested else self.default_topics)
         
-        # Join the group
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        await self.accept(subprotocol=self.scope.get('auth_subprotocol'))
+        logger.info(f"WebSocket connected: User {self.user.email} subscribed to {sorted(self.topics)}")
+        self.keepalive = asyncio.ensure_future(self.refresh_presence())
         
-        await self.accept()
-        logger.info(f"WebSocket connected: User {self.user.email} joined group {self.group_name}")
-        
-        # Send connection confirmation and initial data
-        await self.send_connection_confirmation()
-        await self.send_unread_count()
-        await self.send_recent_notifications()
+        if 'notifications' in self.topics:
+            queued = await self.deliver_queued()
+            await self.send_initial_state(self.get_query_param('since'))
+            await self.push_queued(queued)
+    
+    async def send_initial_state(self, since):
+        """The first frame after connecting"""
+        await self.send_connection_snapshot(since)
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        if hasattr(self, 'group_name'):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
-            logger.info(f"WebSocket disconnected: User {self.user.email} left group {self.group_name} (code: {close_code})")
+        if hasattr(self, 'unread_counts'):
+            self.unread_counts.cancel()
+        if hasattr(self, 'keepalive'):
+            self.keepalive.cancel()
+        if hasattr(self, 'acks'):
+            await self.acks.flush()
+        if getattr(self, 'topics', None):
+            await self.unsubscribe(list(self.topics))
+            logger.info(f"WebSocket disconnected: User {self.user.email} (code: {close_code})")
+    
+    def topic_group(self, topic):
+        """The group behind ``topic``, or None if there is no such topic"""
+        if topic == 'notifications':
+            return user_group(self.user.id)
+        if topic == 'announcements':
+            return ANNOUNCEMENTS_GROUP
+        if topic == 'admin':
+            return ADMIN_FEED_GROUP
+        if topic == 'jobs':
+            return job_group(self.user.id)
+        return None
+    
+    async def subscribe(self, topics):
+        """Join the groups of ``topics``; returns the topics that were rejected"""
+        rejected = []
+        for topic in topics:
+            group = self.topic_group(topic)
+            if group is None or (topic == 'admin' and not await self.is_admin()):
+                rejected.append(topic)
+            elif topic not in self.topics:
+                await self.channel_layer.group_add(group, self.channel_name)
+                self.topics.add(topic)
+                if topic == 'notifications':
+                    await sync_to_async(get_presence().connect)(self.user.id, self.channel_name)
+        return rejected
+    
+    async def is_admin(self):
+        """Token claims can be stale, so the admin feed checks the User row"""
+        try:
+            user = await self.user.aget_user() if hasattr(self.user, 'aget_user') else self.user
+        except User.DoesNotExist:
+            return False
+        return user.is_active and user.is_admin_user
+    
+    async def unsubscribe(self, topics):
+        for topic in topics:
+            if topic in self.topics:
+                await self.channel_layer.group_discard(self.topic_group(topic), self.channel_name)
+                self.topics.discard(topic)
+                if topic == 'notifications':
+                    await sync_to_async(get_presence().disconnect)(self.user.id, self.channel_name)
+    
+    async def touch_presence(self):
+        if 'notifications' in self.topics:
+            await sync_to_async(get_presence().touch)(self.user.id, self.channel_name)
+    
+    async def refresh_presence(self):
+        """
+        Keep the presence entry alive for clients that never ping, and re-join
+        the topic groups before CHANNEL_GROUP_EXPIRY drops the membership
+        """
+        rejoin_every = getattr(settings, 'CHANNEL_GROUP_EXPIRY', 86400) / 2
+        joined = time.monotonic()
+        while True:
+            await asyncio.sleep(presence_ttl() / 3)
+            await self.touch_presence()
+            if time.monotonic() - joined >= rejoin_every:
+                for topic in list(self.topics):
+                    await self.channel_layer.group_add(self.topic_group(topic), self.channel_name)
+                joined = time.monotonic()
     
     async def receive(self, text_data):
         """Handle messages from WebSocket client"""
@@ -68,6 +214,11 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
                 'get_unread_count': self.handle_get_unread_count,
                 'get_notifications': self.handle_get_notifications,
                 'ping': self.handle_ping,
+                'hello': self.handle_hello,
+                'ack': self.handle_ack,
+                'sync': self.handle_sync,
+                'subscribe': self.handle_subscribe,
+                'unsubscribe': self.handle_unsubscribe,
                 'subscribe_to_type': self.handle_subscribe_to_type,
                 'unsubscribe_from_type': self.handle_unsubscribe_from_type,
             }
@@ -93,6 +244,8 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
             return
         
         success = await self.mark_notification_as_read(notification_id)
+        # Reading implies delivery
+        self.in_flight.discard(str(notification_id))
         await self.send(text_data=json.dumps({
             'type': 'mark_as_read_response',
             'notification_id': notification_id,
@@ -105,6 +258,7 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
     async def handle_mark_all_as_read(self, data):
         """Mark all notifications as read"""
         count = await self.mark_all_notifications_as_read()
+        self.in_flight.clear()
         await self.send(text_data=json.dumps({
             'type': 'mark_all_as_read_response',
             'marked_count': count,
@@ -132,11 +286,57 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
     
     async def handle_ping(self, data):
         """Handle ping/pong for connection health"""
+        await self.touch_presence()
         await self.send(text_data=json.dumps({
             'type': 'pong',
             'timestamp': timezone.now().isoformat()
         }))
     
+    async def handle_hello(self, data):
+        """Opt in to (or out of) acknowledged delivery"""
+        self.ack_enabled = bool(data.get('ack'))
+        if not self.ack_enabled:
+            self.in_flight.clear()
+        await self.send(text_data=json.dumps({
+            'type': 'hello',
+            'ack': self.ack_enabled
+        }))
+    
+    async def handle_ack(self, data):
+        """Client received these notifications; written in batches by the AckBuffer"""
+        ids = data.get('ids') or [data.get('notification_id')]
+        ids = [str(notification_id) for notification_id in ids if notification_id]
+        self.in_flight.difference_update(ids)
+        await self.acks.add(ids)
+    
+    async def write_acks(self, ids):
+        await database_sync_to_async(mark_delivered)(self.user.id, ids)
+    
+    async def handle_sync(self, data):
+        """Resend the connection snapshot from the client's cursor"""
+        await self.send_connection_snapshot(data.get('since'))
+    
+    async def handle_subscribe(self, data):
+        """Add topics; subscribing to notifications also sends the snapshot"""
+        had_notifications = 'notifications' in self.topics
+        rejected = await self.subscribe(data.get('topics') or [])
+        await self.send_subscriptions(rejected)
+        if not had_notifications and 'notifications' in self.topics:
+            queued = await self.deliver_queued()
+            await self.send_connection_snapshot(data.get('since'))
+            await self.push_queued(queued)
+    
+    async def handle_unsubscribe(self, data):
+        await self.unsubscribe(data.get('topics') or [])
+        await self.send_subscriptions()
+    
+    async def send_subscriptions(self, rejected=()):
+        await self.send(text_data=json.dumps({
+            'type': 'subscriptions',
+            'topics': sorted(self.topics),
+            'rejected': list(rejected)
+        }))
+    
     async def handle_subscribe_to_type(self, data):
         """Subscribe to specific notification types"""
         notification_type = data.get('notification_type')
@@ -159,13 +359,20 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
                 'subscribed': not success
             }))
     
-    async def send_connection_confirmation(self):
-        """Send connection confirmation to client"""
+    def get_query_param(self, name):
+        values = parse_qs(self.scope.get('query_string', b'').decode()).get(name)
+        return values[0] if values else None
+    
+    async def send_connection_snapshot(self, since=None):
+        """Connection confirmation, unread count and notifications in one frame"""
+        snapshot = await self.get_connection_snapshot(since)
         await self.send(text_data=json.dumps({
-            'type': 'connection_confirmed',
+            'type': 'connection_snapshot',
             'user_id': self.user.id,
             'user_email': self.user.email,
-            'timestamp': timezone.now().isoformat()
+            'timestamp': timezone.now().isoformat(),
+            'topics': sorted(self.topics),
+            **snapshot
         }))
     
     async def send_unread_count(self):
@@ -176,14 +383,6 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
             'count': unread_count
         }))
     
-    async def send_recent_notifications(self, limit=5):
-        """Send recent unread notifications"""
-        notifications = await self.get_user_notifications(limit=limit, status='unread')
-        await self.send(text_data=json.dumps({
-            'type': 'recent_notifications',
-            'notifications': notifications
-        }))
-    
     async def send_error(self, message):
         """Send error message to client"""
         await self.send(text_data=json.dumps({
@@ -195,79 +394,176 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
     # Channel layer message handlers
     async def notification_message(self, event):
         """Handle new notification from channel layer"""
-        await self.send(text_data=json.dumps({
+        # Events without a stream come from the Notification senders
+        stream = event.get('stream', NOTIFICATIONS)
+        if stream not in self.streams:
+            return
+        await self.push_notification(stream, event['notification'])
+    
+    # notification_utils.send_realtime_notification still uses this event type
+    send_notification = notification_message
+    
+    async def push_notification(self, stream, notification):
+        """A ``new_notification`` frame, acked by the client on sockets that opted in"""
+        frame = {
             'type': 'new_notification',
-            'notification': event['notification']
-        }))
+            'topic': 'notifications',
+            'notification': notification
+        }
+        if stream == REALTIME and self.ack_enabled:
+            notification_id = notification['id']
+            if notification_id not in self.in_flight and len(self.in_flight) >= inflight_window():
+                # Stays unacked; redelivered once the client catches up
+                return
+            self.in_flight.add(notification_id)
+            frame['ack'] = True
+        await self.send(text_data=json.dumps(frame))
+        if stream == REALTIME and not self.ack_enabled:
+            # The client never acks, so the push itself counts as delivery
+            await self.acks.add([notification['id']])
+    
+    async def push_queued(self, queued):
+        """Push what deliver_queued returned"""
+        for stream, notification in queued:
+            await self.push_notification(stream, notification)
     
     async def unread_count_update(self, event):
         """Handle unread count update from channel layer"""
+        stream = event.get('stream')
+        if stream and stream not in self.streams:
+            return
+        # The pushed count covers one stream; other sockets recount when the burst ends
+        self.unread_counts.push('unread_count', event['count'] if (stream,) == tuple(self.streams) else None)
+    
+    async def send_unread_count_frame(self, key, count):
+        if count is None:
+            count = await self.get_unread_count()
         await self.send(text_data=json.dumps({
             'type': 'unread_count',
-            'count': event['count']
+            'topic': 'notifications',
+            'count': count
         }))
     
     async def system_announcement(self, event):
         """Handle system-wide announcements"""
         await self.send(text_data=json.dumps({
             'type': 'system_announcement',
+            'topic': 'announcements',
             'announcement': event['announcement']
         }))
     
+    async def admin_event(self, event):
+        """Handle an admin activity feed event"""
+        await self.send(text_data=json.dumps({
+            'type': 'admin_event',
+            'topic': 'admin',
+            'event': event['event'],
+            'data': event['data']
+        }))
+    
+    async def job_progress(self, event):
+        """Handle progress of one of the user's background jobs"""
+        await self.send(text_data=json.dumps({
+            'type': 'job_progress',
+            'topic': 'jobs',
+            **{key: value for key, value in event.items() if key != 'type'}
+        }))
+    
     # Database operations
+    @database_sync_to_async
+    def deliver_queued(self):
+        """
+        Mark what was queued while the user was offline as sent; returns
+        ``(stream, notification)`` pairs for push_queued
+        """
+        return [
+            (name, STREAMS[name].serialize(notification))
+            for name in self.streams
+            for notification in STREAMS[name].deliver_queued(self.user)
+        ]
+    
     @database_sync_to_async
     def get_unread_count(self):
-        """Get unread notification count"""
-        from .models import RealtimeNotification
-        return RealtimeNotification.objects.filter(
-            recipient=self.user,
-            status__in=['pending', 'sent', 'delivered']
-        ).count()
+        """Get unread notification count across the socket's streams"""
+        return sum(STREAMS[name].unread_count(self.user) for name in self.streams)
+    
+    @database_sync_to_async
+    def get_connection_snapshot(self, since=None):
+        """
+        Unread counts (from the counter rows) plus notifications from every
+        stream: those created after ``since``, else the latest unread ones
+        """
+        streams = [STREAMS[name] for name in self.streams]
+        since_at, since_id = parse_cursor(since)
+        if since_at:
+            limit = getattr(settings, 'REALTIME_SNAPSHOT_LIMIT', 50)
+            overlap = timedelta(seconds=getattr(settings, 'REALTIME_RESUME_OVERLAP', 5))
+            after = Q(created_at__gt=since_at)
+            if since_id:
+                after |= Q(created_at=since_at, id__gt=since_id)
+            replayed, items = [], []
+            for stream in streams:
+                queryset = stream.queryset(self.user.id).order_by('created_at', 'id')
+                if overlap:
+                    window = queryset.filter(created_at__gte=since_at - overlap).exclude(after).exclude(id=since_id)
+                    replayed.extend((notification, stream) for notification in window[:limit])
+                items.extend((notification, stream) for notification in queryset.filter(after)[:limit + 1])
+            items.sort(key=lambda item: (item[0].created_at, item[0].pk))
+            has_more = len(items) > limit
+            items = items[:limit]
+            cursor = make_cursor(items[-1][0]) if items else since
+            replayed.sort(key=lambda item: (item[0].created_at, item[0].pk))
+            items = replayed + items
+        else:
+            items = sorted(
+                (
+                    (notification, stream) for stream in streams
+                    for notification in stream.unread(stream.queryset(self.user.id)).order_by('-created_at')[:5]
+                ),
+                key=lambda item: (item[0].created_at, item[0].pk),
+                reverse=True,
+            )[:5]
+            has_more = False
+            cursor = make_cursor(items[0][0]) if items else timezone.now().isoformat()
+        
+        unread_counts = {stream.name: stream.unread_count(self.user) for stream in streams}
+        return {
+            'unread_count': sum(unread_counts.values()),
+            'unread_counts': unread_counts,
+            'notifications': [stream.serialize(notification) for notification, stream in items],
+            'since': since if since_at else None,
+            'cursor': cursor,
+            'has_more': has_more,
+        }
     
     @database_sync_to_async
     def mark_notification_as_read(self, notification_id):
         """Mark specific notification as read"""
-        try:
-            from .models import RealtimeNotification
-            notification = RealtimeNotification.objects.get(
-                id=notification_id,
-                recipient=self.user
-            )
-            notification.mark_as_read()
+        if any(STREAMS[name].mark_read(notification_id, self.user) for name in self.streams):
             return True
-        except RealtimeNotification.DoesNotExist:
-            logger.error(f"Notification {notification_id} not found for user {self.user.id}")
-            return False
+        logger.error(f"Notification {notification_id} not found for user {self.user.id}")
+        return False
     
     @database_sync_to_async
     def mark_all_notifications_as_read(self):
         """Mark all user's notifications as read"""
-        from .models import RealtimeNotification
-        notifications = RealtimeNotification.objects.filter(
-            recipient=self.user,
-            status__in=['pending', 'sent', 'delivered']
-        )
-        count = notifications.count()
-        notifications.update(
-            status='read',
-            read_at=timezone.now()
-        )
-        return count
+        return sum(STREAMS[name].mark_all_read(self.user) for name in self.streams)
     
     @database_sync_to_async
     def get_user_notifications(self, limit=20, offset=0, status=None):
-        """Get user's notifications"""
-        from .models import RealtimeNotification
+        """Get user's notifications, newest first across the socket's streams"""
+        items = []
+        for name in self.streams:
+            stream = STREAMS[name]
+            queryset = stream.queryset(self.user.id)
+            if status == 'unread':
+                queryset = stream.unread(queryset)
+            elif status:
+                queryset = queryset.filter(status=status)
+            items.extend((notification, stream) for notification in queryset.order_by('-created_at')[:offset + limit])
         
-        queryset = RealtimeNotification.objects.filter(recipient=self.user)
-        
-        if status == 'unread':
-            queryset = queryset.filter(status__in=['pending', 'sent', 'delivered'])
-        elif status:
-            queryset = queryset.filter(status=status)
-        
-        notifications = queryset[offset:offset + limit]
-        return [notification.to_dict() for notification in notifications]
+        items.sort(key=lambda item: item[0].created_at, reverse=True)
+        return [stream.serialize(notification) for notification, stream in items[offset:offset + limit]]
     
     @database_sync_to_async
     def update_notification_preference(self, notification_type, enabled):
@@ -275,7 +571,7 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
         try:
             from .models import UserNotificationSettings
             settings, created = UserNotificationSettings.objects.get_or_create(
-                user=self.user,
+                user_id=self.user.id,
                 defaults={'enable_websocket': True}
             )
             
@@ -303,20 +599,25 @@ class RealtimeNotificationConsumer(AsyncWebsocketConsumer):
             return False
 
 
-class SystemAnnouncementConsumer(AsyncWebsocketConsumer):
+class RealtimeNotificationConsumer(NotificationHubConsumer):
+    """``ws/realtime-notifications/``: the hub restricted to RealtimeNotification"""
+    streams = (REALTIME,)
+
+
+class SystemAnnouncementConsumer(ConsumerMetricsMixin, AsyncWebsocketConsumer):
     """
     Consumer for system-wide announcements
     """
     
     async def connect(self):
         """Handle connection to system announcements"""
-        await self.channel_layer.group_add("system_announcements", self.channel_name)
-        await self.accept()
+        await self.channel_layer.group_add(ANNOUNCEMENTS_GROUP, self.channel_name)
+        await self.accept(subprotocol=self.scope.get('auth_subprotocol'))
         logger.info("Client connected to system announcements")
     
     async def disconnect(self, close_code):
         """Handle disconnection from system announcements"""
-        await self.channel_layer.group_discard("system_announcements", self.channel_name)
+        await self.channel_layer.group_discard(ANNOUNCEMENTS_GROUP, self.channel_name)
         logger.info(f"Client disconnected from system announcements (code: {close_code})")
     
     async def system_announcement(self, event):
@@ -0,0 +1,150 @@
+"""
+At-least-once delivery for real-time notifications.
+
+Frames pushed for RealtimeNotification rows to sockets that opted in (``?ack=1``
+or a ``hello`` message) carry ``"ack": true``; the client answers with
+``{"type": "ack", "ids": [...]}``. Sockets that didn't opt in ack each frame
+themselves once it is sent, so every row that reached a socket leaves
+``sent`` and redelivery only sees rows still waiting for a client's ack (or
+that never reached one). mark_delivered is the only writer of
+``delivered``. Each consumer collects acks in
+an AckBuffer and writes them as one UPDATE (``sent`` -> ``delivered``) every
+REALTIME_ACK_FLUSH_INTERVAL seconds, or sooner once REALTIME_ACK_BATCH_SIZE
+are waiting.
+
+Rows still ``sent`` after a backoff of REALTIME_REDELIVERY_BACKOFF * 2^retries
+seconds are pushed again by redeliver_unacked (the
+redeliver_unacked_notifications task), up to each row's max_retries. Rows for
+users who went offline go back to ``pending`` and are delivered on their next
+connect. At most REALTIME_INFLIGHT_WINDOW unacked notifications per user are
+outstanding on a socket or redelivered per run, which bounds what the
+consumer tracks and what a slow client is sent.
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from src.apps.notifications import counters
+from .models import RealtimeNotification
+from .presence import online_users
+from .publisher import publish, user_group
+
+logger = logging.getLogger(__name__)
+
+# Past this many attempts the backoff stops doubling
+MAX_BACKOFF_STEPS = 6
+
+
+def inflight_window():
+    return getattr(settings, 'REALTIME_INFLIGHT_WINDOW', 100)
+
+
+def clean_ids(ids):
+    """Drop anything that isn't a notification UUID"""
+    cleaned = set()
+    for value in ids:
+        try:
+            cleaned.add(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return cleaned
+
+
+def mark_delivered(user_id, ids):
+    """One UPDATE for a batch of acks; returns the rows that became delivered"""
+    ids = clean_ids(ids)
+    if not ids:
+        return 0
+    now = timezone.now()
+    return RealtimeNotification.objects.filter(
+        recipient_id=user_id, pk__in=ids, status__in=['pending', 'sent']
+    ).update(status='delivered', delivered_at=now)
+
+
+class AckBuffer:
+    """Collects a socket's acks and flushes them with ``await flush(ids)``"""
+
+    def __init__(self, flush, interval=None, batch_size=None):
+        self.write = flush
+        self.interval = getattr(settings, 'REALTIME_ACK_FLUSH_INTERVAL', 0.5) if interval is None else interval
+        self.batch_size = batch_size or getattr(settings, 'REALTIME_ACK_BATCH_SIZE', 500)
+        self.ids = set()
+        self.task = None
+
+    async def add(self, ids):
+        self.ids.update(ids)
+        if len(self.ids) >= self.batch_size:
+            await self.flush()
+        elif self.task is None:
+            self.task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self.task = None
+        await self.flush()
+
+    async def flush(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        ids, self.ids = self.ids, set()
+        if ids:
+            await self.write(ids)
+
+
+def due_for_redelivery(now):
+    """Unacked rows whose backoff has passed"""
+    base = getattr(settings, 'REALTIME_REDELIVERY_BACKOFF', 30)
+    due = Q(retry_count__gte=MAX_BACKOFF_STEPS, sent_at__lte=now - timedelta(seconds=base * 2 ** MAX_BACKOFF_STEPS))
+    for step in range(MAX_BACKOFF_STEPS):
+        due |= Q(retry_count=step, sent_at__lte=now - timedelta(seconds=base * 2 ** step))
+    return due
+
+
+def redeliver_unacked(limit=None):
+    """
+    Push unacked notifications again, at most REALTIME_INFLIGHT_WINDOW per
+    user; requeue those of offline users. Returns the number pushed
+    """
+    now = timezone.now()
+    limit = limit or getattr(settings, 'REALTIME_PUBLISH_BATCH_SIZE', 1000)
+    candidates = RealtimeNotification.objects.filter(
+        due_for_redelivery(now), status='sent', retry_count__lt=F('max_retries'),
+    ).exclude(expires_at__lte=now).select_related('sender').order_by('sent_at')[:limit]
+
+    per_user = defaultdict(list)
+    for notification in candidates:
+        if len(per_user[notification.recipient_id]) < inflight_window():
+            per_user[notification.recipient_id].append(notification)
+
+    online = online_users(per_user)
+    offline = [n.pk for user_id, rows in per_user.items() if user_id not in online for n in rows]
+    if offline:
+        RealtimeNotification.objects.filter(pk__in=offline, status='sent').update(status='pending')
+
+    notifications = [n for user_id, rows in per_user.items() if user_id in online for n in rows]
+    errors = publish(
+        (
+            user_group(notification.recipient_id),
+            {
+                'type': 'notification_message',
+                'stream': counters.REALTIME,
+                'notification': notification.to_dict(),
+                'redelivery': True,
+            },
+        )
+        for notification in notifications
+    )
+    pushed = [notification.pk for notification, error in zip(notifications, errors) if error is None]
+    if pushed:
+        RealtimeNotification.objects.filter(pk__in=pushed, status='sent').update(
+            sent_at=now, retry_count=F('retry_count') + 1
+        )
+    logger.info(f"Redelivered {len(pushed)} unacked notifications, requeued {len(offline)} for offline users")
+    return len(pushed)
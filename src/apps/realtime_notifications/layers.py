@@ -0,0 +1,82 @@
+"""
+Channel layers that shard CHANNEL_REDIS_HOSTS over a consistent-hash ring.
+
+channels_redis picks a host by cutting CRC32(name) & 0xFFF into len(hosts)
+equal ranges, so adding a host moves most groups to another Redis and drops
+their membership there. HashRing puts RING_REPLICAS points per host on a ring
+keyed by the host's address, and a name goes to the next point clockwise:
+adding or removing one of n hosts only moves about 1/n of the channels and
+groups, and the host order no longer matters.
+"""
+import asyncio
+import bisect
+import hashlib
+
+from channels_redis.core import RedisChannelLayer
+from channels_redis.pubsub import RedisPubSubChannelLayer, RedisPubSubLoopLayer
+from channels_redis.utils import _wrap_close, decode_hosts
+
+# Points per host; keeps each host's share within about 10% of even
+RING_REPLICAS = 256
+
+
+def ring_hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf8')
+    return int.from_bytes(hashlib.md5(value).digest()[:8], 'big')
+
+
+def host_key(host):
+    """A stable name for a decoded host entry"""
+    return str(host.get('address') or sorted(host.items()))
+
+
+class HashRing:
+    """Maps names to host indexes"""
+
+    def __init__(self, hosts, replicas=RING_REPLICAS):
+        points = sorted(
+            (ring_hash(f'{host_key(host)}#{replica}'), index)
+            for index, host in enumerate(hosts)
+            for replica in range(replicas)
+        )
+        self.size = len(hosts)
+        self.points = [point for point, _ in points]
+        self.indexes = [index for _, index in points]
+
+    def index(self, name):
+        if self.size <= 1:
+            return 0
+        position = bisect.bisect(self.points, ring_hash(name)) % len(self.points)
+        return self.indexes[position]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ring = HashRing(self.hosts)
+
+    def consistent_hash(self, value):
+        return self.ring.index(value)
+
+
+class ShardedRedisPubSubLoopLayer(RedisPubSubLoopLayer):
+    def __init__(self, hosts=None, *args, **kwargs):
+        super().__init__(hosts, *args, **kwargs)
+        self.ring = HashRing(decode_hosts(hosts))
+
+    def _get_shard(self, channel_or_group_name):
+        return self._shards[self.ring.index(channel_or_group_name)]
+
+
+class ShardedRedisPubSubChannelLayer(RedisPubSubChannelLayer):
+    def _get_layer(self):
+        # RedisPubSubChannelLayer._get_layer with the sharded per-loop layer
+        loop = asyncio.get_running_loop()
+        try:
+            layer = self._layers[loop]
+        except KeyError:
+            layer = ShardedRedisPubSubLoopLayer(*self._args, **self._kwargs, channel_layer=self)
+            self._layers[loop] = layer
+            _wrap_close(self, loop)
+        return layer
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime_notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='realtimenotification',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sent', 'delivered'])), fields=['recipient'], name='realtime_notif_unread_idx'),
+        ),
+    ]
@@ -76,6 +76,11 @@ class RealtimeNotification(models.Model):
             models.Index(fields=['recipient', 'status']),
             models.Index(fields=['notification_type', 'priority']),
             models.Index(fields=['created_at']),
+            # Unread recounts; see notifications/counters.py
+            models.Index(
+                fields=['recipient'], name='realtime_notif_unread_idx',
+                condition=models.Q(status__in=['pending', 'sent', 'delivered']),
+            ),
         ]
     
     def __str__(self):
@@ -105,6 +110,18 @@ class RealtimeNotification(models.Model):
         self.retry_count += 1
         self.save(update_fields=['status', 'retry_count'])
     
+    async def amark_as_sent(self):
+        """Async version of mark_as_sent"""
+        self.status = 'sent'
+        self.sent_at = timezone.now()
+        await self.asave(update_fields=['status', 'sent_at'])
+    
+    async def amark_as_failed(self):
+        """Async version of mark_as_failed"""
+        self.status = 'failed'
+        self.retry_count += 1
+        await self.asave(update_fields=['status', 'retry_count'])
+    
     def can_retry(self):
         """Check if notification can be retried"""
         return self.retry_count < self.max_retries and self.status == 'failed'
@@ -159,15 +176,22 @@ class NotificationTemplate(models.Model):
         return f"{self.name} ({self.notification_type})"
     
     def render(self, context):
-        """Render template with context data"""
-        from django.template import Template, Context
+        """
+        Render template with context data. Each field is parsed once per
+        (template, updated_at); see notifications/cache.py
+        """
+        from django.template import Context
+        from src.apps.notifications.cache import compile_template
+        
+        context = Context(context)
         
-        title = Template(self.title_template).render(Context(context))
-        message = Template(self.message_template).render(Context(context))
-        action_url = None
+        def render_field(field):
+            source = getattr(self, field)
+            return compile_template(source, ('notification_template', self.pk, field, self.updated_at)).render(context)
         
-        if self.action_url_template:
-            action_url = Template(self.action_url_template).render(Context(context))
+        title = render_field('title_template')
+        message = render_field('message_template')
+        action_url = render_field('action_url_template') if self.action_url_template else None
         
         return {
             'title': title,
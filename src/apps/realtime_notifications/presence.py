@@ -0,0 +1,152 @@
+"""
+Which users have a notification socket open.
+
+Every NotificationHubConsumer registers its channel under the user on
+connect, refreshes it on ``ping`` and every REALTIME_PRESENCE_TTL / 3 seconds
+while connected, and removes it on disconnect. A channel that stops being
+refreshed (a worker that died without disconnecting) drops out after
+REALTIME_PRESENCE_TTL seconds.
+
+Publishers ask online_users() before fanning out and leave notifications for
+offline users ``pending``; the consumer marks them ``sent`` when the user
+next connects, and they only become ``delivered`` once the client acks them
+(see delivery.py). Presence fails open: if Redis can't be reached every user
+counts as online and notifications are sent as before.
+
+REALTIME_PRESENCE_URL points at Redis (``presence:user:<id>`` sorted sets of
+channel -> last seen, plus ``presence:online`` of user -> last seen). Leave it
+empty for the in-process backend, which only suits a single process, like the
+in-memory channel layer.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ONLINE_KEY = 'presence:online'
+
+
+def presence_ttl():
+    return getattr(settings, 'REALTIME_PRESENCE_TTL', 90)
+
+
+def user_key(user_id):
+    return f'presence:user:{user_id}'
+
+
+class RedisPresence:
+    def __init__(self, url):
+        import redis
+
+        self.error = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+
+    def connect(self, user_id, channel_name):
+        now = time.time()
+        ttl = presence_ttl()
+        try:
+            pipe = self.client.pipeline()
+            pipe.zadd(user_key(user_id), {channel_name: now})
+            pipe.zremrangebyscore(user_key(user_id), '-inf', now - ttl)
+            pipe.expire(user_key(user_id), ttl)
+            pipe.zadd(ONLINE_KEY, {str(user_id): now})
+            pipe.execute()
+        except self.error as e:
+            logger.warning(f"Presence update failed for user {user_id}: {e}")
+
+    touch = connect
+
+    def disconnect(self, user_id, channel_name):
+        try:
+            pipe = self.client.pipeline()
+            pipe.zrem(user_key(user_id), channel_name)
+            pipe.zcount(user_key(user_id), time.time() - presence_ttl(), '+inf')
+            _, remaining = pipe.execute()
+            if not remaining:
+                self.client.zrem(ONLINE_KEY, str(user_id))
+        except self.error as e:
+            logger.warning(f"Presence update failed for user {user_id}: {e}")
+
+    def online_users(self, user_ids):
+        user_ids = list(dict.fromkeys(user_ids))
+        since = time.time() - presence_ttl()
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.zcount(user_key(user_id), since, '+inf')
+            counts = pipe.execute()
+        except self.error as e:
+            logger.warning(f"Presence lookup failed, treating {len(user_ids)} users as online: {e}")
+            return set(user_ids)
+        return {user_id for user_id, count in zip(user_ids, counts) if count}
+
+    def online_count(self):
+        """Users with a live socket, or None when Redis can't be reached"""
+        try:
+            pipe = self.client.pipeline()
+            pipe.zremrangebyscore(ONLINE_KEY, '-inf', time.time() - presence_ttl())
+            pipe.zcard(ONLINE_KEY)
+            return pipe.execute()[1]
+        except self.error as e:
+            logger.warning(f"Presence count failed: {e}")
+            return None
+
+
+class MemoryPresence:
+    """Per-process presence for development and tests"""
+
+    def __init__(self):
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def connect(self, user_id, channel_name):
+        with self.lock:
+            self.channels.setdefault(user_id, {})[channel_name] = time.time()
+
+    touch = connect
+
+    def disconnect(self, user_id, channel_name):
+        with self.lock:
+            channels = self.channels.get(user_id, {})
+            channels.pop(channel_name, None)
+            if not channels:
+                self.channels.pop(user_id, None)
+
+    def is_live(self, user_id, since):
+        return any(seen >= since for seen in self.channels.get(user_id, {}).values())
+
+    def online_users(self, user_ids):
+        since = time.time() - presence_ttl()
+        with self.lock:
+            return {user_id for user_id in user_ids if self.is_live(user_id, since)}
+
+    def online_count(self):
+        since = time.time() - presence_ttl()
+        with self.lock:
+            return sum(1 for user_id in self.channels if self.is_live(user_id, since))
+
+    def clear(self):
+        with self.lock:
+            self.channels.clear()
+
+
+_backends = {}
+
+
+def get_presence():
+    """The backend for the current REALTIME_PRESENCE_URL"""
+    url = getattr(settings, 'REALTIME_PRESENCE_URL', '')
+    if url not in _backends:
+        _backends[url] = RedisPresence(url) if url else MemoryPresence()
+    return _backends[url]
+
+
+def online_users(user_ids):
+    return get_presence().online_users(user_ids)
+
+
+def is_online(user_id):
+    return user_id in online_users([user_id])
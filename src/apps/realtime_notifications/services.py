@@ -3,29 +3,58 @@ Real-time notification service for WebSocket notifications
 """
 import json
 import logging
+from collections import Counter
 from datetime import timedelta
 from typing import Dict, List, Optional
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
 from django.utils import timezone
 from django.db import transaction
 
-from .models import RealtimeNotification, NotificationTemplate, UserNotificationSettings
+from src.apps.notifications import counters
+from src.apps.notifications.cache import get_active_notification_template
+from .models import RealtimeNotification, UserNotificationSettings
+from .presence import is_online, online_users
+from .publisher import apublish, log_failures, user_group
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Presence lookups are plain Redis calls, safe to run off the ORM's thread
+ais_online = sync_to_async(is_online, thread_sensitive=False)
+aonline_users = sync_to_async(online_users, thread_sensitive=False)
+
 
 class RealtimeNotificationService:
     """
-    Service for managing real-time WebSocket notifications
+    Service for managing real-time WebSocket notifications.
+    
+    The async methods (acreate_notification, asend, asend_now, abulk_send,
+    apublish_notifications) do the work and await the channel layer directly,
+    so consumers and async views can call them from their own event loop. The
+    sync methods of the same name wrap them for signals, tasks and sync views.
     """
     
     def __init__(self):
         self.channel_layer = get_channel_layer()
     
     def create_notification(
+        self,
+        recipient: User,
+        notification_type: str,
+        title: str = None,
+        message: str = None,
+        **kwargs
+    ) -> Optional[RealtimeNotification]:
+        """
+        Create a new real-time notification
+        """
+        return async_to_sync(self.acreate_notification)(recipient, notification_type, title, message, **kwargs)
+    
+    async def acreate_notification(
         self,
         recipient: User,
         notification_type: str,
@@ -39,97 +68,134 @@ class RealtimeNotificationService:
         action_text: str = None,
         metadata: Dict = None,
         expires_in_minutes: int = 1440
-    ) -> RealtimeNotification:
+    ) -> Optional[RealtimeNotification]:
         """
-        Create a new real-time notification
+        Create a new real-time notification, or None when the recipient's
+        settings filter it out
         """
-        with transaction.atomic():
-            # Check user notification preferences
-            settings, created = UserNotificationSettings.objects.get_or_create(
-                user=recipient,
-                defaults={'enable_websocket': True}
-            )
-            
-            if not settings.enable_websocket:
-                logger.info(f"WebSocket notifications disabled for user {recipient.email}")
-                return None
-            
-            if not settings.is_notification_type_enabled(notification_type):
-                logger.info(f"Notification type '{notification_type}' disabled for user {recipient.email}")
-                return None
-            
-            # Check quiet hours
-            if settings.is_in_quiet_hours() and priority not in ['high', 'urgent']:
-                logger.info(f"User {recipient.email} is in quiet hours, skipping notification")
-                return None
-            
-            # Use template if specified
-            if template_name:
-                try:
-                    template = NotificationTemplate.objects.get(
-                        name=template_name,
-                        is_active=True
-                    )
-                    rendered = template.render(context or {})
-                    title = rendered['title']
-                    message = rendered['message']
-                    action_url = rendered['action_url'] or action_url
-                    action_text = rendered['action_text'] or action_text
-                    priority = rendered['priority']
-                    expires_in_minutes = rendered['expires_in_minutes']
-                except NotificationTemplate.DoesNotExist:
-                    logger.error(f"Template '{template_name}' not found")
-                    if not title or not message:
-                        raise ValueError("Template not found and no title/message provided")
-            
-            # Create notification
-            expires_at = timezone.now() + timedelta(minutes=expires_in_minutes)
-            
-            notification = RealtimeNotification.objects.create(
-                recipient=recipient,
-                sender=sender,
-                notification_type=notification_type,
-                priority=priority,
-                title=title,
-                message=message,
-                action_url=action_url,
-                action_text=action_text,
-                metadata=metadata or {},
-                expires_at=expires_at
-            )
-            
-            logger.info(f"Created real-time notification {notification.id} for {recipient.email}")
-            return notification
+        # Check user notification preferences
+        settings, created = await UserNotificationSettings.objects.aget_or_create(
+            user_id=recipient.id,
+            defaults={'enable_websocket': True}
+        )
+        
+        if not self.accepts(settings, recipient, notification_type, priority):
+            return None
+        
+        # Use template if specified
+        if template_name:
+            title, message, action_url, action_text, priority, expires_in_minutes = await sync_to_async(
+                self.render_template
+            )(template_name, context, title, message, action_url, action_text, priority, expires_in_minutes)
+        
+        # Create notification
+        expires_at = timezone.now() + timedelta(minutes=expires_in_minutes)
+        
+        notification = await RealtimeNotification.objects.acreate(
+            recipient=recipient,
+            sender=sender,
+            notification_type=notification_type,
+            priority=priority,
+            title=title,
+            message=message,
+            action_url=action_url,
+            action_text=action_text,
+            metadata=metadata or {},
+            expires_at=expires_at
+        )
+        
+        logger.info(f"Created real-time notification {notification.id} for {recipient.email}")
+        return notification
+    
+    def accepts(self, settings, recipient: User, notification_type: str, priority: str) -> bool:
+        """Whether the recipient's settings let this notification through"""
+        if not settings.enable_websocket:
+            logger.info(f"WebSocket notifications disabled for user {recipient.email}")
+            return False
+        
+        if not settings.is_notification_type_enabled(notification_type):
+            logger.info(f"Notification type '{notification_type}' disabled for user {recipient.email}")
+            return False
+        
+        # Check quiet hours
+        if settings.is_in_quiet_hours() and priority not in ['high', 'urgent']:
+            logger.info(f"User {recipient.email} is in quiet hours, skipping notification")
+            return False
+        
+        return True
+    
+    def render_template(self, template_name, context, title, message, action_url, action_text, priority,
+                        expires_in_minutes):
+        """
+        Render a NotificationTemplate, returning (title, message, action_url,
+        action_text, priority, expires_in_minutes)
+        """
+        template = get_active_notification_template(template_name)
+        if template is None:
+            logger.error(f"Template '{template_name}' not found")
+            if not title or not message:
+                raise ValueError("Template not found and no title/message provided")
+            return title, message, action_url, action_text, priority, expires_in_minutes
+        
+        rendered = template.render(context or {})
+        return (
+            rendered['title'],
+            rendered['message'],
+            rendered['action_url'] or action_url,
+            rendered['action_text'] or action_text,
+            rendered['priority'],
+            rendered['expires_in_minutes'],
+        )
+    
+    async def aget_user_settings(self, recipients: List[User]) -> Dict[int, UserNotificationSettings]:
+        """Settings for each recipient by user id, creating the missing rows in one insert"""
+        user_ids = [recipient.id for recipient in recipients]
+        found = {
+            settings.user_id: settings
+            async for settings in UserNotificationSettings.objects.filter(user_id__in=user_ids)
+        }
+        missing = [
+            UserNotificationSettings(user_id=user_id, enable_websocket=True)
+            for user_id in dict.fromkeys(user_ids) if user_id not in found
+        ]
+        if missing:
+            await UserNotificationSettings.objects.abulk_create(missing, ignore_conflicts=True)
+            found.update((settings.user_id, settings) for settings in missing)
+        return found
     
     def send_notification(self, notification: RealtimeNotification) -> bool:
         """
-        Send notification via WebSocket
+        Send notification via WebSocket. Left pending when the recipient has no
+        socket open; it is delivered on their next connect
+        """
+        return async_to_sync(self.asend)(notification)
+    
+    async def asend(self, notification: RealtimeNotification) -> bool:
+        """
+        Async version of send_notification
         """
         if notification.is_expired():
             logger.warning(f"Notification {notification.id} has expired, not sending")
-            notification.mark_as_failed()
+            await notification.amark_as_failed()
             return False
         
-        try:
-            group_name = f"notifications_{notification.recipient.id}"
-            
-            # Send to WebSocket group
-            async_to_sync(self.channel_layer.group_send)(
-                group_name,
-                {
-                    'type': 'notification_message',
-                    'notification': notification.to_dict()
-                }
-            )
-            
-            notification.mark_as_sent()
-            logger.info(f"Sent notification {notification.id} to WebSocket group {group_name}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send notification {notification.id}: {str(e)}")
-            notification.mark_as_failed()
+        if not await ais_online(notification.recipient_id):
+            logger.debug(f"Recipient of notification {notification.id} is offline, queued for next connect")
+            return False
+        
+        group_name = user_group(notification.recipient_id)
+        error, = await apublish(
+            [(group_name, {'type': 'notification_message', 'stream': counters.REALTIME, 'notification': notification.to_dict()})],
+            self.channel_layer,
+        )
+        if error is not None:
+            logger.error(f"Failed to send notification {notification.id}: {str(error)}")
+            await notification.amark_as_failed()
             return False
+        
+        await notification.amark_as_sent()
+        logger.info(f"Sent notification {notification.id} to WebSocket group {group_name}")
+        return True
     
     def send_notification_now(
         self,
@@ -142,7 +208,20 @@ class RealtimeNotificationService:
         """
         Create and immediately send a notification
         """
-        notification = self.create_notification(
+        return async_to_sync(self.asend_now)(recipient, notification_type, title, message, **kwargs)
+    
+    async def asend_now(
+        self,
+        recipient: User,
+        notification_type: str,
+        title: str = None,
+        message: str = None,
+        **kwargs
+    ) -> Optional[RealtimeNotification]:
+        """
+        Async version of send_notification_now
+        """
+        notification = await self.acreate_notification(
             recipient=recipient,
             notification_type=notification_type,
             title=title,
@@ -151,7 +230,7 @@ class RealtimeNotificationService:
         )
         
         if notification:
-            self.send_notification(notification)
+            await self.asend(notification)
         
         return notification
     
@@ -166,22 +245,164 @@ class RealtimeNotificationService:
         """
         Send notification to multiple users
         """
+        return async_to_sync(self.abulk_send)(recipients, notification_type, title, message, **kwargs)
+    
+    async def abulk_send(
+        self,
+        recipients: List[User],
+        notification_type: str,
+        title: str,
+        message: str,
+        **kwargs
+    ) -> List[RealtimeNotification]:
+        """
+        Send notification to multiple users.
+        
+        Recipients are handled REALTIME_PUBLISH_BATCH_SIZE at a time: one
+        settings query, one bulk insert, a concurrent publish of the whole
+        batch and one status update per outcome.
+        """
+        batch_size = getattr(django_settings, 'REALTIME_PUBLISH_BATCH_SIZE', 1000)
+        if isinstance(recipients, QuerySet):
+            recipients = [recipient async for recipient in recipients]
+        else:
+            recipients = list(recipients)
+        fields = None
+        priority = kwargs.get('priority', 'normal')
         notifications = []
         
-        for recipient in recipients:
-            notification = self.send_notification_now(
-                recipient=recipient,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                **kwargs
-            )
-            if notification:
-                notifications.append(notification)
+        for start in range(0, len(recipients), batch_size):
+            batch = recipients[start:start + batch_size]
+            settings_by_user = await self.aget_user_settings(batch)
+            batch = [
+                recipient for recipient in batch
+                if self.accepts(settings_by_user[recipient.id], recipient, notification_type, priority)
+            ]
+            if not batch:
+                continue
+            
+            # Rendered once, and only when someone will receive it
+            if fields is None:
+                if kwargs.get('template_name'):
+                    fields = await sync_to_async(self.build_bulk_fields)(title, message, **kwargs)
+                else:
+                    fields = self.build_bulk_fields(title, message, **kwargs)
+            
+            created = [
+                RealtimeNotification(recipient=recipient, notification_type=notification_type, **fields)
+                for recipient in batch
+            ]
+            await sync_to_async(self.insert_notifications)(created)
+            await self.apublish_notifications(created)
+            notifications.extend(created)
         
         logger.info(f"Sent bulk notification to {len(notifications)} users")
         return notifications
     
+    def insert_notifications(self, notifications: List[RealtimeNotification]):
+        """Insert a batch and count it unread in the same transaction"""
+        with transaction.atomic():
+            RealtimeNotification.objects.bulk_create(notifications)
+            counters.count_new_notifications(notifications, counters.REALTIME)
+    
+    def build_bulk_fields(
+        self,
+        title: str,
+        message: str,
+        sender: User = None,
+        template_name: str = None,
+        context: Dict = None,
+        priority: str = 'normal',
+        action_url: str = None,
+        action_text: str = None,
+        metadata: Dict = None,
+        expires_in_minutes: int = 1440
+    ) -> Dict:
+        """Model fields shared by every row of a bulk notification"""
+        if template_name:
+            title, message, action_url, action_text, priority, expires_in_minutes = self.render_template(
+                template_name, context, title, message, action_url, action_text, priority, expires_in_minutes
+            )
+        return {
+            'sender': sender,
+            'priority': priority,
+            'title': title,
+            'message': message,
+            'action_url': action_url,
+            'action_text': action_text,
+            'metadata': metadata or {},
+            'expires_at': timezone.now() + timedelta(minutes=expires_in_minutes),
+        }
+    
+    def publish_notifications(self, notifications: List[RealtimeNotification]) -> int:
+        """
+        Push notifications to their recipients' groups in one event loop and
+        record the outcome with one UPDATE per status; returns the number sent.
+        Notifications for offline recipients skip the channel layer and stay
+        (or go back to) pending until the recipient connects
+        """
+        return async_to_sync(self.apublish_notifications)(notifications)
+    
+    async def apublish_notifications(self, notifications: List[RealtimeNotification]) -> int:
+        """
+        Async version of publish_notifications
+        """
+        online = await aonline_users([notification.recipient_id for notification in notifications])
+        queued = [notification for notification in notifications if notification.recipient_id not in online]
+        notifications = [notification for notification in notifications if notification.recipient_id in online]
+        
+        errors = await apublish(
+            [
+                (
+                    user_group(notification.recipient_id),
+                    {'type': 'notification_message', 'stream': counters.REALTIME, 'notification': notification.to_dict()},
+                )
+                for notification in notifications
+            ],
+            self.channel_layer,
+        )
+        log_failures(errors)
+        return await sync_to_async(self.record_outcomes)(notifications, errors, queued)
+    
+    def record_outcomes(self, notifications, errors, queued) -> int:
+        """Status updates and counter adjustments for one publish"""
+        now = timezone.now()
+        sent = [notification for notification, error in zip(notifications, errors) if error is None]
+        failed = [notification for notification, error in zip(notifications, errors) if error is not None]
+        
+        if sent:
+            RealtimeNotification.objects.filter(pk__in=[n.pk for n in sent]).update(status='sent', sent_at=now)
+            # Rows that left the unread set (failed -> sent) count again
+            counters.adjust_unread_counts(
+                Counter(n.recipient_id for n in sent if n.status == 'failed'), counters.REALTIME
+            )
+        if failed:
+            RealtimeNotification.objects.filter(pk__in=[n.pk for n in failed]).update(
+                status='failed', retry_count=F('retry_count') + 1
+            )
+            counters.adjust_unread_counts(
+                {recipient_id: -count for recipient_id, count in
+                 Counter(n.recipient_id for n in failed if n.status != 'failed').items()},
+                counters.REALTIME,
+            )
+        
+        requeued = [notification for notification in queued if notification.status != 'pending']
+        if requeued:
+            RealtimeNotification.objects.filter(pk__in=[n.pk for n in requeued]).update(status='pending')
+            counters.adjust_unread_counts(
+                Counter(n.recipient_id for n in requeued if n.status == 'failed'), counters.REALTIME
+            )
+        
+        for notification in requeued:
+            notification.status = notification._loaded_status = 'pending'
+        for notification in sent:
+            notification.status = notification._loaded_status = 'sent'
+            notification.sent_at = now
+        for notification in failed:
+            notification.status = notification._loaded_status = 'failed'
+            notification.retry_count += 1
+        return len(sent)
+    
     def send_admin_notification(
         self,
         title: str,
@@ -208,10 +429,7 @@ class RealtimeNotificationService:
         Send updated unread count to user's WebSocket
         """
         try:
-            unread_count = RealtimeNotification.objects.filter(
-                recipient=user,
-                status__in=['pending', 'sent', 'delivered']
-            ).count()
+            unread_count = counters.get_unread_count(user.id, counters.REALTIME)
             
             group_name = f"notifications_{user.id}"
             
@@ -219,6 +437,7 @@ class RealtimeNotificationService:
                 group_name,
                 {
                     'type': 'unread_count_update',
+                    'stream': counters.REALTIME,
                     'count': unread_count
                 }
             )
@@ -265,9 +484,11 @@ class RealtimeNotificationService:
         """
         Remove expired notifications
         """
-        expired_count = RealtimeNotification.objects.filter(
-            expires_at__lt=timezone.now()
-        ).delete()[0]
+        from src.apps.notifications.retention import delete_in_batches
+
+        expired_count = delete_in_batches(
+            RealtimeNotification.objects.filter(expires_at__lt=timezone.now())
+        )
         
         logger.info(f"Cleaned up {expired_count} expired notifications")
         return expired_count
@@ -276,17 +497,16 @@ class RealtimeNotificationService:
         """
         Retry failed notifications that can be retried
         """
-        from django.db.models import F
         failed_notifications = RealtimeNotification.objects.filter(
             status='failed',
             retry_count__lt=F('max_retries')
-        )
+        ).select_related('sender')
         
-        retry_count = 0
-        for notification in failed_notifications:
-            if notification.can_retry() and not notification.is_expired():
-                if self.send_notification(notification):
-                    retry_count += 1
+        retryable = [
+            notification for notification in failed_notifications
+            if notification.can_retry() and not notification.is_expired()
+        ]
+        retry_count = self.publish_notifications(retryable)
         
         logger.info(f"Retried {retry_count} failed notifications")
         return retry_count
@@ -1,14 +1,18 @@
 """
 Signals for real-time notifications integration
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
 
+from src.apps.notifications import counters
+from src.apps.notifications.cache import invalidate_notification_templates
 from src.apps.support.models import ContactMessage
+from .publisher import publish_admin_event
 from .services import RealtimeNotificationService, send_admin_alert
-from .models import UserNotificationSettings
+from .models import NotificationTemplate, RealtimeNotification, UserNotificationSettings
 
 User = get_user_model()
 
@@ -23,22 +27,28 @@ def handle_contact_message_notifications(sender, instance, created, **kwargs):
     if created:
         # Notify admins about new contact message
         admin_users = User.objects.filter(is_staff=True, is_active=True)
-        for admin in admin_users:
-            service.send_notification_now(
-                recipient=admin,
-                notification_type='contact_received',
-                template_name='contact_received_template',
-                context={
-                    'contact': {
-                        'name': instance.name,
-                        'category': instance.get_category_display(),
-                        'subject': instance.subject,
-                        'id': instance.id
-                    }
-                },
-                sender=None,  # System notification
-                metadata={'contact_id': str(instance.id)}
-            )
+        service.send_bulk_notification(
+            recipients=admin_users,
+            notification_type='contact_received',
+            title=None,
+            message=None,
+            template_name='contact_received_template',
+            context={
+                'contact': {
+                    'name': instance.name,
+                    'category': instance.get_category_display(),
+                    'subject': instance.subject,
+                    'id': instance.id
+                }
+            },
+            sender=None,  # System notification
+            metadata={'contact_id': str(instance.id)}
+        )
+        transaction.on_commit(lambda: publish_admin_event('contact_received', {
+            'contact_id': str(instance.id),
+            'name': instance.name,
+            'subject': instance.subject,
+        }))
     
     # Check if status changed to 'responded' and notify the user
     if hasattr(instance, '_original_status') and instance._original_status != 'responded' and instance.status == 'responded':
@@ -102,20 +112,25 @@ def handle_user_registration_notifications(sender, instance, created, **kwargs):
         
         # Notify admins about new user registration
         admin_users = User.objects.filter(is_staff=True, is_active=True).exclude(id=instance.id)
-        for admin in admin_users:
-            service.send_notification_now(
-                recipient=admin,
-                notification_type='user_registered',
-                template_name='user_registered_template',
-                context={
-                    'user': {
-                        'email': instance.email,
-                        'get_full_name': instance.get_full_name(),
-                        'id': instance.id
-                    }
-                },
-                metadata={'new_user_id': instance.id}
-            )
+        service.send_bulk_notification(
+            recipients=admin_users,
+            notification_type='user_registered',
+            title=None,
+            message=None,
+            template_name='user_registered_template',
+            context={
+                'user': {
+                    'email': instance.email,
+                    'get_full_name': instance.get_full_name(),
+                    'id': instance.id
+                }
+            },
+            metadata={'new_user_id': instance.id}
+        )
+        transaction.on_commit(lambda: publish_admin_event('user_registered', {
+            'user_id': instance.id,
+            'email': instance.email,
+        }))
 
 
 @receiver(user_logged_in)
@@ -130,6 +145,27 @@ def handle_user_login_notifications(sender, request, user, **kwargs):
     pass
 
 
+@receiver(post_save, sender=NotificationTemplate)
+@receiver(post_delete, sender=NotificationTemplate)
+def invalidate_notification_template_cache(sender, instance, **kwargs):
+    invalidate_notification_templates()
+
+
+@receiver(post_init, sender=RealtimeNotification)
+def remember_realtime_notification_status(sender, instance, **kwargs):
+    counters.remember_status(instance)
+
+
+@receiver(post_save, sender=RealtimeNotification)
+def count_unread_realtime_notification(sender, instance, created, **kwargs):
+    counters.track_status_change(instance, counters.REALTIME, created=created)
+
+
+@receiver(post_delete, sender=RealtimeNotification)
+def uncount_deleted_realtime_notification(sender, instance, **kwargs):
+    counters.track_status_change(instance, counters.REALTIME, deleted=True)
+
+
 # Example signal for song upload (when you implement songs)
 # @receiver(post_save, sender='songs.Song')
 # def handle_song_upload_notifications(sender, instance, created, **kwargs):
@@ -55,6 +55,7 @@ def simple_demo(request):
     
     <script>
         let ws = null;
+        let cursor = null;
         
         function updateStatus(connected, message) {
             const statusEl = document.getElementById('status');
@@ -90,7 +91,9 @@ def simple_demo(request):
             
             updateStatus(false, '🔄 Connecting...');
             
-            ws = new WebSocket('ws://localhost:8000/ws/realtime-notifications/');
+            // Reconnects pick up only what was missed since the last snapshot
+            const query = cursor ? '?since=' + encodeURIComponent(cursor) : '';
+            ws = new WebSocket('ws://localhost:8000/ws/realtime-notifications/' + query);
             
             ws.onopen = function(event) {
                 updateStatus(true, '✅ Connected');
@@ -101,7 +104,11 @@ def simple_demo(request):
                 try {
                     const data = JSON.parse(event.data);
                     
-                    if (data.type === 'new_notification') {
+                    if (data.type === 'connection_snapshot') {
+                        cursor = data.cursor;
+                        addMessage('📸 SNAPSHOT', 'Unread: ' + data.unread_count + ', notifications: ' + data.notifications.length + (data.has_more ? ' (more available)' : ''));
+                    } else if (data.type === 'new_notification') {
+                        cursor = data.notification.created_at || cursor;
                         addMessage('🔔 NEW NOTIFICATION', data.notification.title + ': ' + data.notification.message);
                     } else if (data.type === 'unread_count') {
                         addMessage('📊 UNREAD COUNT', 'Unread notifications: ' + data.count);
@@ -0,0 +1,109 @@
+"""
+The two notification streams behind the WebSocket hub.
+
+``notifications`` is the Notification model (plus broadcasts) served by the
+REST API under /api/notifications/, ``realtime`` is RealtimeNotification.
+Both push to the same ``notifications_<user id>`` group; a Stream wraps what
+NotificationHubConsumer needs to read, serialize and mark each of them, so
+one socket can serve either or both.
+"""
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from src.apps.notifications import counters
+from .delivery import inflight_window
+
+
+class Stream:
+    name = None
+
+    def queryset(self, user_id):
+        raise NotImplementedError
+
+    def unread(self, queryset):
+        return queryset.filter(status__in=counters.unread_statuses(self.name))
+
+    def serialize(self, notification):
+        raise NotImplementedError
+
+    def unread_count(self, user):
+        return counters.get_unread_count(user.id, self.name)
+
+    def mark_read(self, notification_id, user):
+        """False when the id is not one of the user's notifications in this stream"""
+        try:
+            notification = self.queryset(user.id).get(id=notification_id)
+        except (self.model.DoesNotExist, ValidationError):
+            return False
+        notification.mark_as_read()
+        return True
+
+    def deliver_queued(self, user):
+        """
+        Streams that queue for offline users mark the queue sent on connect and
+        return the rows to push
+        """
+        return []
+
+    def mark_all_read(self, user):
+        count = self.unread(self.queryset(user.id)).update(status='read', read_at=timezone.now())
+        counters.reset_unread_count(user.id, self.name)
+        return count
+
+
+class RealtimeStream(Stream):
+    name = counters.REALTIME
+
+    @property
+    def model(self):
+        from .models import RealtimeNotification
+        return RealtimeNotification
+
+    def queryset(self, user_id):
+        return self.model.objects.filter(recipient_id=user_id).select_related('sender')
+
+    def serialize(self, notification):
+        return dict(notification.to_dict(), stream=self.name)
+
+    def deliver_queued(self, user):
+        now = timezone.now()
+        queued = self.model.objects.filter(recipient_id=user.id, status='pending').exclude(expires_at__lte=now)
+        # The oldest in-flight window is pushed now, the rest by redeliver_unacked
+        push = list(queued.select_related('sender').order_by('created_at', 'id')[:inflight_window()])
+        # delivered_at is left to the client's ack (delivery.mark_delivered)
+        queued.update(status='sent', sent_at=now)
+        return push
+
+
+class NotificationsStream(Stream):
+    name = counters.NOTIFICATIONS
+
+    @property
+    def model(self):
+        from src.apps.notifications.models import Notification
+        return Notification
+
+    def queryset(self, user_id):
+        return self.model.objects.filter(recipient_id=user_id).select_related('notification_type')
+
+    def serialize(self, notification):
+        from src.apps.notifications.realtime import serialize_notification
+        return dict(serialize_notification(notification), status=notification.status, stream=self.name)
+
+    def unread_count(self, user):
+        from src.apps.notifications.broadcasts import unread_broadcast_count
+        return super().unread_count(user) + unread_broadcast_count(user)
+
+    def mark_read(self, notification_id, user):
+        from src.apps.notifications.broadcasts import mark_broadcast_read
+        return super().mark_read(notification_id, user) or mark_broadcast_read(notification_id, user)
+
+    def mark_all_read(self, user):
+        from src.apps.notifications.broadcasts import mark_all_broadcasts_read
+        return super().mark_all_read(user) + mark_all_broadcasts_read(user)
+
+
+STREAMS = {
+    counters.NOTIFICATIONS: NotificationsStream(),
+    counters.REALTIME: RealtimeStream(),
+}
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .delivery import redeliver_unacked
+
+
+@shared_task
+def redeliver_unacked_notifications():
+    """Schedule every REALTIME_REDELIVERY_BACKOFF seconds or so"""
+    return redeliver_unacked()
@@ -0,0 +1,491 @@
+import asyncio
+import json
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from src.apps.notifications import counters
+from src.apps.notifications.consumers import NotificationConsumer
+from src.apps.notifications.models import Notification, NotificationType
+from src.apps.realtime_notifications import delivery
+from src.apps.realtime_notifications.consumers import NotificationHubConsumer, RealtimeNotificationConsumer, make_cursor
+from src.apps.realtime_notifications.layers import HashRing, ShardedRedisChannelLayer
+from src.apps.realtime_notifications.models import RealtimeNotification, UserNotificationSettings
+from src.apps.realtime_notifications.presence import get_presence
+from src.apps.realtime_notifications.publisher import Coalescer
+from src.apps.realtime_notifications.services import RealtimeNotificationService
+from src.apps.users.websocket_auth import WebSocketUser
+
+User = get_user_model()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ConnectionSnapshotTests(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(email='socket@example.com', username='socket', first_name='Socket')])
+        self.user = User.objects.get(username='socket')
+        self.consumer = RealtimeNotificationConsumer()
+        self.consumer.user = self.user
+        self.now = timezone.now()
+        self.notifications = []
+        for minutes in (30, 20, 10):
+            notification = RealtimeNotification.objects.create(
+                recipient=self.user, sender=self.user, notification_type='admin_alert',
+                title=f'{minutes} minutes ago', message='Hi',
+            )
+            RealtimeNotification.objects.filter(pk=notification.pk).update(
+                created_at=self.now - timedelta(minutes=minutes)
+            )
+            self.notifications.append(RealtimeNotification.objects.get(pk=notification.pk))
+        counters.get_unread_count(self.user.id, counters.REALTIME)
+
+    def snapshot(self, since=None):
+        return async_to_sync(self.consumer.get_connection_snapshot)(since)
+
+    def test_first_connect_sends_recent_unread(self):
+        # The counter row and one joined query, whatever the number of senders
+        with self.assertNumQueries(2):
+            snapshot = self.snapshot()
+
+        self.assertEqual(snapshot['unread_count'], 3)
+        self.assertEqual(
+            [n['title'] for n in snapshot['notifications']],
+            ['10 minutes ago', '20 minutes ago', '30 minutes ago'],
+        )
+        self.assertEqual(snapshot['cursor'], make_cursor(self.notifications[-1]))
+        self.assertFalse(snapshot['has_more'])
+
+    @override_settings(REALTIME_SNAPSHOT_LIMIT=1, REALTIME_RESUME_OVERLAP=0)
+    def test_reconnect_replays_only_what_was_missed(self):
+        # Query strings may carry the offset's "+" unencoded
+        since = make_cursor(self.notifications[0]).replace('+', ' ')
+        snapshot = self.snapshot(since)
+
+        self.assertEqual([n['title'] for n in snapshot['notifications']], ['20 minutes ago'])
+        self.assertTrue(snapshot['has_more'])
+
+        snapshot = self.snapshot(snapshot['cursor'])
+        self.assertEqual([n['title'] for n in snapshot['notifications']], ['10 minutes ago'])
+        self.assertFalse(snapshot['has_more'])
+
+        snapshot = self.snapshot(snapshot['cursor'])
+        self.assertEqual(snapshot['notifications'], [])
+        self.assertEqual(snapshot['cursor'], make_cursor(self.notifications[-1]))
+
+    @override_settings(REALTIME_SNAPSHOT_LIMIT=1, REALTIME_RESUME_OVERLAP=0)
+    def test_rows_sharing_a_timestamp_are_not_skipped(self):
+        RealtimeNotification.objects.filter(pk__in=[n.pk for n in self.notifications[1:]]).update(
+            created_at=self.notifications[-1].created_at
+        )
+
+        first = self.snapshot(make_cursor(self.notifications[0]))
+        second = self.snapshot(first['cursor'])
+
+        self.assertEqual(
+            {n['title'] for n in first['notifications'] + second['notifications']},
+            {'20 minutes ago', '10 minutes ago'},
+        )
+        self.assertFalse(second['has_more'])
+
+    @override_settings(REALTIME_RESUME_OVERLAP=5)
+    def test_late_commits_inside_the_overlap_are_replayed(self):
+        cursor = make_cursor(self.notifications[-1])
+        late = RealtimeNotification.objects.create(
+            recipient=self.user, notification_type='admin_alert', title='Committed late', message='Hi',
+        )
+        RealtimeNotification.objects.filter(pk=late.pk).update(
+            created_at=self.notifications[-1].created_at - timedelta(seconds=2)
+        )
+
+        snapshot = self.snapshot(cursor)
+
+        self.assertEqual([n['title'] for n in snapshot['notifications']], ['Committed late'])
+        self.assertEqual(snapshot['cursor'], cursor)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    REALTIME_PRESENCE_URL='',
+)
+class NotificationHubTests(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(email='hub@example.com', username='hub')])
+        self.user = User.objects.get(username='hub')
+        self.consumer = NotificationHubConsumer()
+        self.consumer.user = self.user
+        self.consumer.topics = set()
+
+    def test_topics_join_groups_and_admin_feed_needs_admin(self):
+        layer = self.consumer.channel_layer = get_channel_layer()
+        self.consumer.channel_name = 'hub-test'
+
+        rejected = async_to_sync(self.consumer.subscribe)(['notifications', 'jobs', 'admin', 'bogus'])
+        self.assertEqual(rejected, ['admin', 'bogus'])
+        self.assertEqual(self.consumer.topics, {'notifications', 'jobs'})
+        self.assertIn('hub-test', layer.groups[f'notifications_{self.user.id}'])
+        self.assertNotIn('admin_feed', layer.groups)
+        self.addCleanup(get_presence().clear)
+        self.assertEqual(get_presence().online_users([self.user.id]), {self.user.id})
+
+        async_to_sync(self.consumer.unsubscribe)(['jobs'])
+        self.assertEqual(self.consumer.topics, {'notifications'})
+        self.assertNotIn(f'jobs_{self.user.id}', layer.groups)
+
+        async_to_sync(self.consumer.unsubscribe)(['notifications'])
+        self.assertEqual(get_presence().online_users([self.user.id]), set())
+
+    def test_admin_feed_checks_the_user_row(self):
+        token = AccessToken.for_user(self.user)
+        token['is_admin'] = True
+        self.addCleanup(async_to_sync(get_channel_layer().flush))
+
+        def subscribe_admin():
+            consumer = NotificationHubConsumer()
+            consumer.user = WebSocketUser(token)
+            consumer.topics = set()
+            consumer.channel_layer = get_channel_layer()
+            consumer.channel_name = 'hub-admin'
+            return async_to_sync(consumer.subscribe)(['admin'])
+
+        # A stale is_admin claim is not enough
+        self.assertEqual(subscribe_admin(), ['admin'])
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertEqual(subscribe_admin(), [])
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(subscribe_admin(), ['admin'])
+
+    def test_notification_alias_keeps_its_first_frame_and_stream(self):
+        consumer = NotificationConsumer()
+        consumer.user = self.user
+        consumer.in_flight = set()
+        frames = []
+
+        async def send(text_data):
+            frames.append(json.loads(text_data))
+
+        consumer.send = send
+        async_to_sync(consumer.send_initial_state)(None)
+        async_to_sync(consumer.notification_message)(
+            {'type': 'notification_message', 'stream': counters.REALTIME, 'notification': {'id': 'realtime'}}
+        )
+        async_to_sync(consumer.notification_message)(
+            {'type': 'notification_message', 'notification': {'id': 'notification'}}
+        )
+
+        self.assertEqual(frames[0], {'type': 'unread_count', 'count': 0})
+        self.assertEqual([frame['notification']['id'] for frame in frames[1:]], ['notification'])
+
+    def test_snapshot_merges_both_streams(self):
+        notification_type = NotificationType.objects.create(name='song_approved', category='music')
+        now = timezone.now()
+        realtime = RealtimeNotification.objects.create(
+            recipient=self.user, notification_type='admin_alert', title='Realtime', message='Hi',
+        )
+        RealtimeNotification.objects.filter(pk=realtime.pk).update(created_at=now - timedelta(minutes=5))
+        Notification.objects.create(
+            notification_type=notification_type, recipient=self.user, title='Approved', message='Hi',
+        )
+
+        snapshot = async_to_sync(self.consumer.get_connection_snapshot)(None)
+
+        self.assertEqual(snapshot['unread_counts'], {counters.NOTIFICATIONS: 1, counters.REALTIME: 1})
+        self.assertEqual(snapshot['unread_count'], 2)
+        self.assertEqual(
+            [(n['title'], n['stream']) for n in snapshot['notifications']],
+            [('Approved', counters.NOTIFICATIONS), ('Realtime', counters.REALTIME)],
+        )
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    REALTIME_PRESENCE_URL='',
+)
+class RealtimePublisherTests(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([
+            User(email=f'fan{number}@example.com', username=f'fan{number}') for number in range(6)
+        ])
+        self.users = list(User.objects.filter(username__startswith='fan').order_by('id'))
+        UserNotificationSettings.objects.create(user=self.users[0], enable_websocket=False)
+        self.service = RealtimeNotificationService()
+        self.presence = get_presence()
+        for user in self.users:
+            self.presence.connect(user.id, f'tab-{user.id}')
+        self.addCleanup(self.presence.clear)
+
+    def broadcast(self, **kwargs):
+        return self.service.send_bulk_notification(
+            recipients=self.users, notification_type='admin_alert', title='Maintenance', message='Tonight', **kwargs
+        )
+
+    @override_settings(REALTIME_PUBLISH_BATCH_SIZE=3)
+    def test_bulk_send_is_batched(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{self.users[1].id}', channel)
+
+        # Per batch of 3, whatever its size: settings read and insert, a savepoint
+        # around the rows insert and counter update, one status update
+        with self.assertNumQueries(14):
+            notifications = self.broadcast()
+
+        self.assertEqual(len(notifications), 5)
+        self.assertEqual(
+            set(RealtimeNotification.objects.values_list('status', flat=True)), {'sent'}
+        )
+        self.assertEqual(UserNotificationSettings.objects.count(), 6)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['notification']['title'], 'Maintenance')
+        self.assertEqual(counters.get_unread_count(self.users[1].id, counters.REALTIME), 1)
+
+    def test_failed_publishes_are_marked_failed_and_uncounted(self):
+        failing_group = f'notifications_{self.users[2].id}'
+        layer = get_channel_layer()
+        group_send = layer.group_send
+
+        async def flaky_group_send(group, message):
+            if group == failing_group:
+                raise ConnectionError('channel layer down')
+            await group_send(group, message)
+
+        counters.get_unread_count(self.users[2].id, counters.REALTIME)
+        with mock.patch.object(layer, 'group_send', flaky_group_send):
+            self.broadcast()
+
+        failed = RealtimeNotification.objects.get(recipient=self.users[2])
+        self.assertEqual((failed.status, failed.retry_count), ('failed', 1))
+        self.assertEqual(counters.get_unread_count(self.users[2].id, counters.REALTIME), 0)
+
+        self.assertEqual(self.service.retry_failed_notifications(), 1)
+        self.assertEqual(RealtimeNotification.objects.get(pk=failed.pk).status, 'sent')
+        self.assertEqual(counters.get_unread_count(self.users[2].id, counters.REALTIME), 1)
+
+    def test_offline_users_are_queued_until_they_connect(self):
+        offline = self.users[3]
+        self.presence.disconnect(offline.id, f'tab-{offline.id}')
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{offline.id}', channel)
+
+        self.broadcast()
+
+        queued = RealtimeNotification.objects.get(recipient=offline)
+        self.assertEqual(queued.status, 'pending')
+        self.assertEqual(counters.get_unread_count(offline.id, counters.REALTIME), 1)
+        self.assertEqual(self.presence.online_count(), 5)
+        # Nothing went through the channel layer for them
+        self.assertNotIn(channel, layer.channels)
+
+        consumer = RealtimeNotificationConsumer()
+        consumer.user = offline
+        self.assertEqual(async_to_sync(consumer.deliver_queued)(), [(counters.REALTIME, mock.ANY)])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+        self.assertIsNotNone(queued.sent_at)
+        self.assertIsNone(queued.delivered_at)
+        self.assertEqual(counters.get_unread_count(offline.id, counters.REALTIME), 1)
+
+    def test_async_api_from_an_event_loop(self):
+        layer = get_channel_layer()
+        recipient = self.users[1]
+
+        async def consumer_side():
+            channel = await layer.new_channel()
+            await layer.group_add(f'notifications_{recipient.id}', channel)
+            notification = await self.service.acreate_notification(
+                recipient, 'system_update', title='Hello', message='From an async view'
+            )
+            sent = await self.service.asend(notification)
+            bulk = await self.service.abulk_send(
+                User.objects.filter(username__startswith='fan'), 'admin_alert', 'Maintenance', 'Tonight'
+            )
+            return notification, sent, bulk, await layer.receive(channel)
+
+        notification, sent, bulk, message = async_to_sync(consumer_side)()
+
+        self.assertTrue(sent)
+        self.assertEqual(message['notification']['id'], str(notification.id))
+        self.assertEqual(RealtimeNotification.objects.get(pk=notification.pk).status, 'sent')
+        self.assertEqual(len(bulk), 5)
+        self.assertEqual(counters.get_unread_count(recipient.id, counters.REALTIME), 2)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    REALTIME_PRESENCE_URL='',
+    REALTIME_REDELIVERY_BACKOFF=30,
+)
+class AckDeliveryTests(TestCase):
+    def setUp(self):
+        User.objects.bulk_create([User(email=f'ack{number}@example.com', username=f'ack{number}') for number in range(2)])
+        self.online, self.offline = User.objects.filter(username__startswith='ack').order_by('id')
+        get_presence().connect(self.online.id, 'tab')
+        self.addCleanup(get_presence().clear)
+        sent_at = timezone.now() - timedelta(seconds=45)
+        self.notifications = [
+            RealtimeNotification.objects.create(
+                recipient=recipient, notification_type='admin_alert', title='Hi', message='Hi',
+                status='sent', sent_at=sent_at,
+            )
+            for recipient in (self.online, self.online, self.offline)
+        ]
+
+    def test_acks_are_written_in_one_update(self):
+        ids = [str(n.pk) for n in self.notifications[:2]] + ['not-a-uuid', str(self.notifications[2].pk)]
+        # The other user's id is ignored
+        with self.assertNumQueries(1):
+            self.assertEqual(delivery.mark_delivered(self.online.id, ids), 2)
+        self.assertEqual(
+            list(RealtimeNotification.objects.filter(recipient=self.online).values_list('status', flat=True)),
+            ['delivered', 'delivered'],
+        )
+
+    def test_unacked_are_redelivered_with_backoff(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{self.online.id}', channel)
+
+        with override_settings(REALTIME_INFLIGHT_WINDOW=1):
+            self.assertEqual(delivery.redeliver_unacked(), 1)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertTrue(message['redelivery'])
+        self.assertEqual(RealtimeNotification.objects.get(pk=self.notifications[2].pk).status, 'pending')
+
+        # The second attempt waits twice as long; the other row is due now
+        self.assertEqual(delivery.redeliver_unacked(), 1)
+        self.assertEqual(delivery.redeliver_unacked(), 0)
+        self.assertEqual(
+            sorted(RealtimeNotification.objects.filter(recipient=self.online).values_list('retry_count', flat=True)),
+            [1, 1],
+        )
+
+    def consumer(self, user, ack_enabled):
+        consumer = RealtimeNotificationConsumer()
+        consumer.user = user
+        consumer.in_flight = set()
+        consumer.ack_enabled = ack_enabled
+        consumer.acks = delivery.AckBuffer(consumer.write_acks, interval=0)
+        consumer.frames = []
+
+        async def send(text_data):
+            consumer.frames.append(json.loads(text_data))
+
+        consumer.send = send
+        return consumer
+
+    def test_clients_that_dont_opt_in_ack_their_own_frames(self):
+        consumer = self.consumer(self.online, ack_enabled=False)
+        plain, acked = self.notifications[:2]
+
+        async def push(notification):
+            await consumer.notification_message({
+                'type': 'notification_message', 'stream': counters.REALTIME, 'notification': notification.to_dict(),
+            })
+            await consumer.acks.flush()
+
+        async_to_sync(push)(plain)
+        self.assertNotIn('ack', consumer.frames[0])
+        self.assertEqual(consumer.in_flight, set())
+        plain.refresh_from_db()
+        self.assertEqual(plain.status, 'delivered')
+
+        async_to_sync(consumer.handle_hello)({'type': 'hello', 'ack': True})
+        async_to_sync(push)(acked)
+        self.assertEqual(consumer.frames[1], {'type': 'hello', 'ack': True})
+        self.assertTrue(consumer.frames[2]['ack'])
+        self.assertEqual(consumer.in_flight, {str(acked.pk)})
+        acked.refresh_from_db()
+        self.assertEqual(acked.status, 'sent')
+
+        # Only the row waiting for the client's ack is redelivered
+        self.assertEqual(delivery.redeliver_unacked(), 1)
+        self.assertEqual(RealtimeNotification.objects.get(pk=acked.pk).retry_count, 1)
+
+    def test_queued_rows_are_pushed_and_delivered_by_the_ack(self):
+        queued = self.notifications[2]
+        RealtimeNotification.objects.filter(pk=queued.pk).update(status='pending', sent_at=None)
+        consumer = self.consumer(self.offline, ack_enabled=True)
+
+        async_to_sync(consumer.push_queued)(async_to_sync(consumer.deliver_queued)())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+        self.assertIsNone(queued.delivered_at)
+        self.assertEqual([(frame['notification']['id'], frame['ack']) for frame in consumer.frames], [(str(queued.pk), True)])
+
+        async_to_sync(consumer.handle_ack)({'type': 'ack', 'ids': [str(queued.pk)]})
+        async_to_sync(consumer.acks.flush)()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'delivered')
+        self.assertIsNotNone(queued.delivered_at)
+        self.assertEqual(consumer.in_flight, set())
+
+    def test_ack_buffer_batches(self):
+        written = []
+
+        async def write(ids):
+            written.append(ids)
+
+        async def acks():
+            buffer = delivery.AckBuffer(write, interval=0.01, batch_size=3)
+            await buffer.add(['a'])
+            await buffer.add(['b'])
+            await asyncio.sleep(0.05)
+            await buffer.add(['c', 'd', 'e'])
+            await buffer.add(['f'])
+            await buffer.flush()
+
+        async_to_sync(acks)()
+        self.assertEqual(written, [{'a', 'b'}, {'c', 'd', 'e'}, {'f'}])
+
+
+class CoalescerTests(SimpleTestCase):
+    def test_bursts_deliver_only_the_latest_value(self):
+        delivered = []
+
+        async def deliver(key, value):
+            delivered.append((key, value))
+
+        async def burst():
+            coalescer = Coalescer(deliver, window=0.01)
+            for count in (1, 2, 3):
+                coalescer.push('unread_count', count)
+            await asyncio.sleep(0.05)
+            coalescer.push('unread_count', 4)
+            await asyncio.sleep(0.05)
+
+        async_to_sync(burst)()
+        self.assertEqual(delivered, [('unread_count', 3), ('unread_count', 4)])
+
+
+class HashRingTests(SimpleTestCase):
+    hosts = [{'address': f'redis://127.0.0.1:{port}/0'} for port in range(6379, 6384)]
+    names = [f'notifications_{user_id}' for user_id in range(5000)]
+
+    def test_adding_a_host_moves_about_its_share(self):
+        before, after = HashRing(self.hosts[:4]), HashRing(self.hosts)
+        moved = [name for name in self.names if before.index(name) != after.index(name)]
+        # Only to the new host, and about 1/5 of the names
+        self.assertEqual({after.index(name) for name in moved}, {4})
+        self.assertLess(len(moved), len(self.names) * 0.3)
+
+        shares = Counter(before.index(name) for name in self.names)
+        self.assertEqual(set(shares), {0, 1, 2, 3})
+        self.assertLess(max(shares.values()) / min(shares.values()), 1.5)
+
+    def test_layer_hashes_on_the_ring(self):
+        layer = ShardedRedisChannelLayer(hosts=[host['address'] for host in self.hosts])
+        ring = HashRing(self.hosts)
+        self.assertEqual(
+            [layer.consistent_hash(name) for name in self.names[:50]],
+            [ring.index(name) for name in self.names[:50]],
+        )
+        self.assertEqual(ShardedRedisChannelLayer(hosts=self.hosts[:1]).consistent_hash('any'), 0)
@@ -9,6 +9,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from django.db.models import Q
 
+from src.apps.notifications import counters
 from .models import RealtimeNotification, NotificationTemplate, UserNotificationSettings
 from .serializers import (
     RealtimeNotificationSerializer,
@@ -29,14 +30,12 @@ class RealtimeNotificationViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return notifications for the current user"""
-        return RealtimeNotification.objects.filter(recipient=self.request.user)
+        return RealtimeNotification.objects.filter(recipient=self.request.user).select_related('sender')
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get unread notification count"""
-        count = self.get_queryset().filter(
-            status__in=['pending', 'sent', 'delivered']
-        ).count()
+        count = counters.get_unread_count(request.user.id, counters.REALTIME)
         return Response({'unread_count': count})
     
     @action(detail=False, methods=['get'])
@@ -72,6 +71,7 @@ class RealtimeNotificationViewSet(viewsets.ModelViewSet):
             status='read',
             read_at=timezone.now()
         )
+        counters.reset_unread_count(request.user.id, counters.REALTIME)
         
         # Update unread count via WebSocket
         service = RealtimeNotificationService()
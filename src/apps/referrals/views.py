@@ -126,7 +126,7 @@ class ReferralCreditViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ReferralCredit.objects.filter(user=self.request.user)
+        return ReferralCredit.objects.filter(user=self.request.user).prefetch_related('earned_from_referrals')
     
     @action(detail=False, methods=['get'])
     def available(self, request):
@@ -53,7 +53,7 @@ class AlbumViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return albums for current user only"""
-        return Album.objects.filter(artist=self.request.user).select_related('artist')
+        return Album.objects.filter(artist=self.request.user).select_related('artist').prefetch_related('tracks')
     
     def perform_create(self, serializer):
         """Create album and set artist to current user"""
@@ -2,7 +2,9 @@ from rest_framework import generics, status, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Q
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from .models import Song, Genre, Platform, SongDistribution
@@ -46,7 +48,11 @@ class SongListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         """Return songs for current user only"""
         try:
-            return Song.objects.filter(artist=self.request.user)
+            return (
+                Song.objects.filter(artist=self.request.user)
+                .select_related('artist', 'genre')
+                .prefetch_related('distributions__platform')
+            )
         except Exception:
             return Song.objects.none()
     
@@ -56,23 +62,6 @@ class SongListCreateView(generics.ListCreateAPIView):
         logger = logging.getLogger(__name__)
         
         try:
-            user = request.user
-            logger.info(f"List request for user: {user.email if user.is_authenticated else 'Anonymous'}")
-            
-            # Debug: Check queryset
-            queryset = self.get_queryset()
-            logger.info(f"Queryset count: {queryset.count()}")
-            
-            # Debug: Check raw Song count for user
-            from .models import Song
-            total_songs = Song.objects.filter(artist=user).count()
-            logger.info(f"Total songs for user {user.id}: {total_songs}")
-            
-            if total_songs > 0:
-                songs = Song.objects.filter(artist=user)
-                for song in songs:
-                    logger.info(f"Song found: ID={song.id}, Title={song.title}, Status={song.status}")
-            
             response = super().list(request, *args, **kwargs)
             logger.info(f"Response data length: {len(response.data) if hasattr(response, 'data') else 'No data'}")
             return response
@@ -377,18 +366,20 @@ def user_music_stats(request):
         user = request.user
         songs = Song.objects.filter(artist=user)
         
-        stats = {
-            'total_songs': songs.count(),
-            'draft_songs': songs.filter(status='draft').count(),
-            'pending_songs': songs.filter(status='pending').count(),
-            'approved_songs': songs.filter(status='approved').count(),
-            'awaiting_review': songs.filter(status__in=['draft', 'pending']).count(),
-            'distributed_songs': songs.filter(status='distributed').count(),
-            'total_streams': sum(song.total_streams for song in songs),
-            'total_downloads': sum(song.total_downloads for song in songs),
-            'total_revenue': sum(song.total_revenue for song in songs),
-            'recent_songs': SongSerializer(songs[:5], many=True).data
-        }
+        # One aggregate query instead of a count per status plus a full scan for the sums
+        totals = songs.aggregate(
+            total_songs=Count('id'),
+            draft_songs=Count('id', filter=Q(status='draft')),
+            pending_songs=Count('id', filter=Q(status='pending')),
+            approved_songs=Count('id', filter=Q(status='approved')),
+            awaiting_review=Count('id', filter=Q(status__in=['draft', 'pending'])),
+            distributed_songs=Count('id', filter=Q(status='distributed')),
+            total_streams=Coalesce(Sum('total_streams'), 0),
+            total_downloads=Coalesce(Sum('total_downloads'), 0),
+            total_revenue=Coalesce(Sum('total_revenue'), Decimal('0.00')),
+        )
+        recent_songs = songs.select_related('artist', 'genre').prefetch_related('distributions__platform')[:5]
+        stats = {**totals, 'recent_songs': SongSerializer(recent_songs, many=True).data}
         
         return Response(stats)
     
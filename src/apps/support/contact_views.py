@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import ContactMessage, Ticket
 from .contact_serializers import (
     ContactMessageSerializer, 
@@ -262,42 +262,35 @@ class ContactMessageViewSet(viewsets.ModelViewSet):
         Get contact message statistics (admin only).
         """
         queryset = self.get_queryset()
-        
-        # Basic counts
-        total_messages = queryset.count()
-        new_messages = queryset.filter(status='new').count()
-        in_progress = queryset.filter(status='in_progress').count()
-        resolved = queryset.filter(status='resolved').count()
-        
-        # Category breakdown
-        categories = {}
-        for choice in ContactMessage.CATEGORY_CHOICES:
-            category_key = choice[0]
-            categories[category_key] = queryset.filter(category=category_key).count()
-        
-        # Priority breakdown
-        priorities = {}
-        for choice in ContactMessage.PRIORITY_CHOICES:
-            priority_key = choice[0]
-            priorities[priority_key] = queryset.filter(priority=priority_key).count()
-        
-        # Recent activity (last 7 days)
         recent_cutoff = timezone.now() - timezone.timedelta(days=7)
-        recent_messages = queryset.filter(created_at__gte=recent_cutoff).count()
+        
+        # Single aggregate over the table instead of one COUNT per bucket
+        aggregates = {
+            'total': Count('id'),
+            'recent': Count('id', filter=Q(created_at__gte=recent_cutoff)),
+        }
+        for key in ('new', 'in_progress', 'resolved', 'read', 'responded'):
+            aggregates[f'status_{key}'] = Count('id', filter=Q(status=key))
+        for key, _ in ContactMessage.CATEGORY_CHOICES:
+            aggregates[f'category_{key}'] = Count('id', filter=Q(category=key))
+        for key, _ in ContactMessage.PRIORITY_CHOICES:
+            aggregates[f'priority_{key}'] = Count('id', filter=Q(priority=key))
+        counts = queryset.aggregate(**aggregates)
         
         return Response({
-            'total_messages': total_messages,
+            'total_messages': counts['total'],
             'status_breakdown': {
-                'new': new_messages,
-                'in_progress': in_progress,
-                'resolved': resolved,
-                'read': queryset.filter(status='read').count(),
-                'responded': queryset.filter(status='responded').count(),
+                key: counts[f'status_{key}']
+                for key in ('new', 'in_progress', 'resolved', 'read', 'responded')
+            },
+            'category_breakdown': {
+                key: counts[f'category_{key}'] for key, _ in ContactMessage.CATEGORY_CHOICES
+            },
+            'priority_breakdown': {
+                key: counts[f'priority_{key}'] for key, _ in ContactMessage.PRIORITY_CHOICES
             },
-            'category_breakdown': categories,
-            'priority_breakdown': priorities,
             'recent_activity': {
-                'last_7_days': recent_messages
+                'last_7_days': counts['recent']
             }
         })
     
@@ -275,6 +275,10 @@ class Ticket(models.Model):
     
     @property
     def latest_response(self):
+        # Use prefetched responses when the queryset provided them
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('responses')
+        if prefetched is not None:
+            return max(prefetched, key=lambda response: response.created_at, default=None)
         return self.responses.order_by('-created_at').first()
 
 
@@ -193,43 +193,5 @@ def create_admin_broadcast(title, message, priority='normal', sender=None):
     """
     Create a broadcast notification to all users
     """
-    try:
-        # Get or create admin message notification type
-        notification_type, created = NotificationType.objects.get_or_create(
-            name='admin_broadcast',
-            defaults={
-                'category': 'admin',
-                'description': 'Admin broadcast message',
-                'email_subject_template': title,
-                'default_email_enabled': True,
-                'default_push_enabled': True,
-                'default_in_app_enabled': True,
-            }
-        )
-        
-        # Get all users
-        users = User.objects.filter(is_active=True)
-        notifications_created = []
-        
-        for user in users:
-            notification = Notification.objects.create(
-                notification_type=notification_type,
-                recipient=user,
-                title=title,
-                message=message,
-                priority=priority,
-                send_email=True,
-                send_push=True,
-                send_in_app=True,
-            )
-            notifications_created.append(notification)
-            
-            # Send real-time notification
-            send_realtime_notification(user, notification)
-        
-        logger.info(f"Created {len(notifications_created)} broadcast notifications")
-        return notifications_created
-        
-    except Exception as e:
-        logger.error(f"Failed to create admin broadcast: {str(e)}")
-        return []
\ No newline at end of file
+    from src.apps.notifications.notification_utils import create_admin_broadcast as create_broadcast
+    return create_broadcast(title, message, priority, sender)
\ No newline at end of file
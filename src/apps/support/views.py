@@ -2,7 +2,7 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
@@ -43,14 +43,28 @@ class TicketViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'updated_at', 'priority', 'status']
     ordering = ['-created_at']
     
+    def _ticket_queryset(self, detail=False):
+        responses = TicketResponse.objects.select_related('author')
+        if not detail:
+            # Lists only read the response count and latest response
+            return Ticket.objects.select_related('author', 'assignee').prefetch_related(
+                Prefetch('responses', queryset=responses),
+            )
+        attachments = TicketAttachment.objects.select_related('uploaded_by')
+        return Ticket.objects.select_related('author', 'assignee').prefetch_related(
+            Prefetch('responses', queryset=responses.prefetch_related(Prefetch('files', queryset=attachments))),
+            Prefetch('attachments', queryset=attachments),
+        )
+    
     def get_queryset(self):
         user = self.request.user
+        queryset = self._ticket_queryset(detail=self.action != 'list')
         if user.is_staff:
             # Staff can see all tickets
-            return Ticket.objects.select_related('author', 'assignee').prefetch_related('responses', 'attachments')
+            return queryset
         else:
             # Users can only see their own tickets
-            return Ticket.objects.filter(author=user).select_related('author', 'assignee').prefetch_related('responses', 'attachments')
+            return queryset.filter(author=user)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -163,7 +177,7 @@ class TicketViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_tickets(self, request):
         """Get current user's tickets"""
-        tickets = Ticket.objects.filter(author=request.user).order_by('-created_at')
+        tickets = self._ticket_queryset().filter(author=request.user).order_by('-created_at')
         serializer = TicketListSerializer(tickets, many=True)
         return Response(serializer.data)
     
@@ -176,7 +190,7 @@ class TicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        tickets = Ticket.objects.filter(assignee=request.user).order_by('-created_at')
+        tickets = self._ticket_queryset().filter(assignee=request.user).order_by('-created_at')
         serializer = TicketListSerializer(tickets, many=True)
         return Response(serializer.data)
 
@@ -188,14 +202,15 @@ class TicketResponseViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = TicketResponse.objects.select_related('ticket', 'author').prefetch_related('files__uploaded_by')
         if user.is_staff:
-            return TicketResponse.objects.select_related('ticket', 'author')
+            return queryset
         else:
             # Users can only see responses to their own tickets
-            return TicketResponse.objects.filter(
+            return queryset.filter(
                 ticket__author=user,
                 is_internal=False  # Hide internal staff notes from users
-            ).select_related('ticket', 'author')
+            )
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -1,8 +1,13 @@
+from asgiref.sync import async_to_sync
 from django.urls import reverse
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from src.apps.users.serializers import CustomTokenObtainPairSerializer
+from src.apps.users.websocket_auth import JWTAuthMiddlewareStack
+
 
 User = get_user_model()
 
@@ -50,3 +55,50 @@ class ProfileUpdateTests(APITestCase):
 		self.user.refresh_from_db()
 		# profile_image may be stored as a path string; ensure it's not None when uploaded
 		self.assertIsNotNone(self.user.profile_image)
+
+
+class WebSocketJWTAuthTests(TestCase):
+	def setUp(self):
+		# bulk_create skips the registration signals
+		User.objects.bulk_create([User(email='socket@example.com', username='socket', first_name='Web', last_name='Socket')])
+		self.user = User.objects.get(username='socket')
+		self.token = str(CustomTokenObtainPairSerializer.get_token(self.user).access_token)
+
+	def connect_scope(self, **scope):
+		captured = {}
+
+		async def app(scope, receive, send):
+			captured.update(scope)
+
+		scope = {'type': 'websocket', 'path': '/ws/notifications/', 'query_string': b'', 'headers': [], 'subprotocols': [], **scope}
+		async_to_sync(JWTAuthMiddlewareStack(app))(scope, None, None)
+		return captured
+
+	def test_query_string_token_needs_no_queries(self):
+		with self.assertNumQueries(0):
+			scope = self.connect_scope(query_string=f'token={self.token}'.encode())
+
+		user = scope['user']
+		self.assertTrue(user.is_authenticated)
+		self.assertEqual((user.id, user.email, user.get_full_name()), (self.user.id, 'socket@example.com', 'Web Socket'))
+		self.assertIsNone(scope['auth_subprotocol'])
+		self.assertEqual(async_to_sync(user.aget_user)(), self.user)
+
+	def test_header_and_subprotocol_tokens(self):
+		header_scope = self.connect_scope(headers=[(b'authorization', f'Bearer {self.token}'.encode())])
+		subprotocol_scope = self.connect_scope(subprotocols=['bearer', self.token])
+
+		self.assertEqual(header_scope['user'].id, self.user.id)
+		self.assertEqual(subprotocol_scope['user'].id, self.user.id)
+		self.assertEqual(subprotocol_scope['auth_subprotocol'], 'bearer')
+
+	def test_invalid_token_is_anonymous(self):
+		scope = self.connect_scope(query_string=b'token=not-a-jwt')
+
+		self.assertTrue(scope['user'].is_anonymous)
+
+	def test_without_token_falls_back_to_session(self):
+		self.assertTrue(self.connect_scope()['user'].is_anonymous)
+
+		with override_settings(WEBSOCKET_SESSION_AUTH=False):
+			self.assertTrue(self.connect_scope()['user'].is_anonymous)
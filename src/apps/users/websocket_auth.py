@@ -0,0 +1,115 @@
+"""
+Token authentication for the Channels WebSocket routes.
+
+JWTAuthMiddleware takes a SimpleJWT access token from the ``token`` query
+parameter, an ``Authorization: Bearer`` header, or the WebSocket subprotocols
+(``new WebSocket(url, ['bearer', token])``) and verifies its signature and
+expiry without touching the database. ``scope["user"]`` becomes a
+WebSocketUser built from the token claims; consumers that need the User row
+call ``await scope["user"].aget_user()``.
+
+Connections that carry no token fall back to Channels' session
+AuthMiddlewareStack while WEBSOCKET_SESSION_AUTH is on (the demo pages log in
+with a session). A token that fails verification is always anonymous.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+TOKEN_SUBPROTOCOL = 'bearer'
+
+
+class WebSocketUser(TokenUser):
+    """
+    Stateless user for a WebSocket connection, backed by the access token's
+    claims (see CustomTokenObtainPairSerializer.get_token)
+    """
+
+    _user = None
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', '')
+
+    @cached_property
+    def is_admin_user(self):
+        return self.token.get('is_admin', False)
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+    async def aget_user(self):
+        """The User row, fetched on first use"""
+        if self._user is None:
+            self._user = await get_user_model().objects.aget(pk=self.id)
+        return self._user
+
+
+def get_token_from_scope(scope):
+    """Return ``(token, subprotocol to accept)``; the subprotocol is None unless the token came that way"""
+    params = parse_qs(scope.get('query_string', b'').decode())
+    if params.get('token'):
+        return params['token'][0], None
+
+    headers = dict(scope.get('headers', []))
+    authorization = headers.get(b'authorization', b'').decode()
+    scheme, _, credentials = authorization.partition(' ')
+    if scheme.lower() == 'bearer' and credentials:
+        return credentials.strip(), None
+
+    subprotocols = scope.get('subprotocols') or []
+    if len(subprotocols) >= 2 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+        return subprotocols[1], TOKEN_SUBPROTOCOL
+    return None, None
+
+
+def authenticate_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return AnonymousUser()
+    if api_settings.USER_ID_CLAIM not in token:
+        return AnonymousUser()
+    return WebSocketUser(token)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.session_inner = AuthMiddlewareStack(inner)
+
+    async def __call__(self, scope, receive, send):
+        raw_token, subprotocol = get_token_from_scope(scope)
+        if raw_token is None and getattr(settings, 'WEBSOCKET_SESSION_AUTH', True):
+            return await self.session_inner(scope, receive, send)
+
+        scope = dict(scope)
+        scope['user'] = authenticate_token(raw_token) if raw_token else AnonymousUser()
+        # Browsers drop the connection unless the server echoes the subprotocol
+        scope['auth_subprotocol'] = subprotocol
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(inner)